@@ -45,7 +45,12 @@ class ServiceClient:
         """DELETE请求"""
         url = f"{self.base_url}{path}"
         return await self.client.delete(url, **kwargs)
-    
+
+    def stream(self, method: str, path: str, **kwargs):
+        """流式请求，返回 httpx 的异步上下文管理器"""
+        url = f"{self.base_url}{path}"
+        return self.client.stream(method, url, **kwargs)
+
     def __repr__(self):
         return f"ServiceClient(service={self.service_info.name}, url={self.base_url})"
 
@@ -139,6 +144,18 @@ class ExternalServiceConnector:
         
         return ServiceClient(service_info, client)
     
+    async def create_instance_client(self, service_info: ServiceInfo) -> ServiceClient:
+        """
+        为单个服务实例创建客户端（不缓存，由调用方负责关闭）
+
+        Args:
+            service_info: 服务实例信息
+
+        Returns:
+            ServiceClient: 服务客户端
+        """
+        return await self._create_service_client(service_info)
+
     async def _test_connection(self, service_info: ServiceInfo, client: httpx.AsyncClient):
         """
         测试服务连接
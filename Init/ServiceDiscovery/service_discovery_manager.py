@@ -204,19 +204,60 @@ class ServiceDiscoveryManager:
         except Exception as e:
             raise ServiceDiscoveryError(f"Failed to discover service {service_name}: {e}")
     
-    async def _check_service_health(self, service_info: ServiceInfo) -> bool:
+    async def discover_service_instances(self, service_name: str) -> List[ServiceInfo]:
+        """
+        发现某个服务的所有健康实例
+
+        Args:
+            service_name: Consul中的服务名称
+
+        Returns:
+            List[ServiceInfo]: 健康的服务实例列表，未找到时为空列表
+        """
+        try:
+            url = f"{self.consul_url}/v1/catalog/service/{service_name}"
+            response = await self.client.get(url)
+            response.raise_for_status()
+
+            candidates = [
+                ServiceInfo(
+                    name=service_name,
+                    address=service.get("ServiceAddress") or service.get("Address"),
+                    port=service.get("ServicePort"),
+                    tags=service.get("ServiceTags", [])
+                )
+                for service in response.json()
+            ]
+
+            # 并发检查各实例且不重试：该方法随后端池周期性刷新调用，
+            # 故障实例在下一轮刷新时自然会被再次检查，不应拖慢本轮刷新
+            healthy = await asyncio.gather(
+                *(self._check_service_health(service_info, retry_count=1) for service_info in candidates)
+            )
+            return [service_info for service_info, ok in zip(candidates, healthy) if ok]
+
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                return []
+            raise ServiceDiscoveryError(f"Consul API error for {service_name}: {e}")
+        except Exception as e:
+            raise ServiceDiscoveryError(f"Failed to discover instances of {service_name}: {e}")
+
+    async def _check_service_health(self, service_info: ServiceInfo, retry_count: Optional[int] = None) -> bool:
         """
         检查服务健康状态
         
         Args:
             service_info: 服务信息
+            retry_count: 尝试次数，不指定时使用配置值
             
         Returns:
             bool: 是否健康
         """
         health_config = self.config.get("health_check", {})
         timeout = health_config.get("timeout", 5)
-        retry_count = health_config.get("retry_count", 3)
+        if retry_count is None:
+            retry_count = health_config.get("retry_count", 3)
         retry_delay = health_config.get("retry_delay", 2)
         
         # 定义健康检查端点
@@ -14,12 +14,14 @@ import random
 import asyncio
 import json
 import shutil
+import aiofiles
 
 from typing import Dict, List, Any, Tuple, AsyncGenerator, Optional
 from fastapi import (
     FastAPI, Form, UploadFile, HTTPException, status, Body, Response,
-    File
+    File, Header
 )
+from fastapi.responses import StreamingResponse
 from dotenv import dotenv_values
 from pydantic import BaseModel
 from contextlib import asynccontextmanager
@@ -32,6 +34,8 @@ from langchain.schema.runnable import RunnableSerializable
 
 from Module.Utils.ConfigTools import load_config, validate_config
 from Module.Utils.Logger import setup_logger
+from Module.TTS.AudioTranscoder import AudioTranscoder
+from Module.Utils.ArtifactStore import get_artifact_store
 from Module.Utils.FastapiServiceTools import (
     get_service_instances,
     register_service_to_consul,
@@ -58,6 +62,7 @@ class ChatModule:
 
     class TextChatRequest(BaseModel):
         messages: List['ChatModule.Message']
+        audio_format: Optional[str] = None     # 语音回复格式：wav/opus/mp3
         
         
         
@@ -85,9 +90,23 @@ class ChatModule:
         self.image_save_dir: str = os.path.join(self.save_dir, self.config.get("image_save_dir", ""))
         self.video_save_dir: str = os.path.join(self.save_dir, self.config.get("video_save_dir", ""))
         
+        # 上传文件按目录限额，分片存放，处理中的文件不会被清理
+        upload_quota: Dict = self.config.get("upload_quota", {})
+        self.audio_store = get_artifact_store(os.path.expandvars(self.audio_save_dir), self.logger, upload_quota.get("audio", {}))
+        self.image_store = get_artifact_store(os.path.expandvars(self.image_save_dir), self.logger, upload_quota.get("image", {}))
+        self.video_store = get_artifact_store(os.path.expandvars(self.video_save_dir), self.logger, upload_quota.get("video", {}))
+        
+        # 语音输入直接以流式请求体转发给STT，不落盘；save_audio_uploads 为 true 时另存一份留档
+        self.save_audio_uploads: bool = self.config.get("save_audio_uploads", False)
+        self.audio_upload_chunk_size: int = self.config.get("audio_upload_chunk_size", 65536)
+        
         # 分隔符
         self.boundary: str = self.config.get("boundary","")
         
+        # 语音回复转码：按客户端偏好把WAV编码为 Opus/MP3 后流式返回
+        self.transcoder = AudioTranscoder(self.logger, self.config.get("audio_output", {}))
+        self.audio_read_chunk_size: int = self.config.get("audio_output", {}).get("read_chunk_size", 16384)
+        
         # 微服务本身地址
         self.host = self.config.get("host", "127.0.0.1")
         self.port = self.config.get("port", 20060)
@@ -186,84 +205,93 @@ class ChatModule:
         
         
         @self.app.api_route("/agent/chat/input/text", methods=["POST"], summary="用户文本输入接口")
-        async def user_input_text(chat_request: 'ChatModule.TextChatRequest'):
+        async def user_input_text(chat_request: 'ChatModule.TextChatRequest',
+                                  x_audio_format: Optional[str] = Header(None)):
             """处理用户的文本输入"""
             content = chat_request.messages[0].content
             self.logger.info(f"user input message:{content}")
-            return await self._user_input_text(content)
+            audio_format = self.transcoder.resolve_format(chat_request.audio_format or x_audio_format)
+            return await self._user_input_text(content, audio_format)
         
         
         @self.app.api_route("/agent/chat/input/audio", methods=["POST"], summary="用户语音输入接口")
-        async def user_input_audio(file: UploadFile = File(...)):
+        async def user_input_audio(file: UploadFile = File(...),
+                                   audio_format: Optional[str] = Form(None),
+                                   x_audio_format: Optional[str] = Header(None)):
             """处理用户的语音输入"""
             # 1. 获取客户端传来的原始文件名
             if not file.filename:
                 self.logger.warning(f"User post invalid file name")
                 raise
             
-            save_path = os.path.join(self.audio_save_dir, file.filename)
+            if self.save_audio_uploads:
+                await self._archive_upload(file, self.audio_store)
             
-            # 3. 一次性读取文件并写入本地（适合中小文件）
-            #    如果文件较大，可以考虑分块读取
-            contents = await file.read()
-            with open(save_path, "wb") as f:
-                f.write(contents)
-                
-            self.logger.info(f"Audio synthesis successful, saved as '{save_path}'")    
-            return await self._user_input_audio(save_path)
+            return await self._user_input_audio(file, self.transcoder.resolve_format(audio_format or x_audio_format))
         
         
         @self.app.api_route("/agent/chat/input/video", methods=["POST"], summary="用户视频输入接口")
-        async def user_input_video(file: UploadFile = File(...)):
+        async def user_input_video(file: UploadFile = File(...),
+                                   audio_format: Optional[str] = Form(None),
+                                   x_audio_format: Optional[str] = Header(None)):
             """处理用户的视频输入"""
             # 1. 获取客户端传来的原始文件名
             if not file.filename:
                 self.logger.warning(f"User post invalid file name")
                 raise
             
-            save_path = os.path.join(self.video_save_dir, file.filename)
+            save_path = self.video_store.new_path(file.filename)
             
             # 3. 一次性读取文件并写入本地（适合中小文件）
             #    如果文件较大，可以考虑分块读取
             contents = await file.read()
             with open(save_path, "wb") as f:
                 f.write(contents)
+            self.video_store.add(save_path)
                 
             self.logger.info(f"Video synthesis successful, saved as '{save_path}'")
-            return await self._user_input_video(file_path=save_path)
+            with self.video_store.ref(save_path):
+                return await self._user_input_video(file_path=save_path,
+                                                    audio_format=self.transcoder.resolve_format(audio_format or x_audio_format))
         
         
         @self.app.api_route("/agent/chat/input/image", methods=["POST"], summary="用户图片输入接口")
-        async def user_input_image(file: UploadFile = File(...)):
+        async def user_input_image(file: UploadFile = File(...),
+                                   audio_format: Optional[str] = Form(None),
+                                   x_audio_format: Optional[str] = Header(None)):
             """处理用户的图片输入"""
             # 1. 获取客户端传来的原始文件名
             if not file.filename:
                 self.logger.warning(f"User post invalid file name")
                 raise
-            save_path = os.path.join(self.image_save_dir, file.filename)
+            save_path = self.image_store.new_path(file.filename)
             
             # 3. 一次性读取文件并写入本地（适合中小文件）
             #    如果文件较大，可以考虑分块读取
             contents = await file.read()
             with open(save_path, "wb") as f:
                 f.write(contents)
+            self.image_store.add(save_path)
                 
             self.logger.info(f"Image synthesis successful, saved as '{save_path}'") 
-            return await self._user_input_image(save_path)
+            with self.image_store.ref(save_path):
+                return await self._user_input_image(save_path, self.transcoder.resolve_format(audio_format or x_audio_format))
         
     
     # --------------------------------
     # 功能函数
     # --------------------------------  
-    async def _user_input_text(self, content: str):
+    async def _user_input_text(self, content: str, audio_format: str = "wav"):
         """处理用户的文本输入"""
-        return await self._chat(content)
+        return await self._chat(content, audio_format)
         
         
-    async def _user_input_audio(self, audio_path: str):
+    async def _user_input_audio(self, file: UploadFile, audio_format: str = "wav"):
         """
         处理用户的语音输入.
         
+        上传的音频分块读取后作为请求体直接转发给STT(SenseVoiceAgent)，不经过磁盘。
+        
         SenseVoice返回的response的格式如下：
         respone = {
                 "result": [
@@ -278,19 +306,22 @@ class ChatModule:
         """
         # 将用户的语音输入发送给STT(SenseVoiceAgent)进行语音识别
         stt_instance = await self.pick_instance(service_name="SenseVoiceAgent")
-        stt_path = "/audio/recognize"
-        stt_payload = {
-            "audio_path": audio_path
-        }
-        response: Dict = await self.call_service_api(instance=stt_instance, path=stt_path, payload=stt_payload)
+        stt_path = "/audio/recognize/bytes"
+        
+        async def _audio_body() -> AsyncGenerator[bytes, None]:
+            while chunk := await file.read(self.audio_upload_chunk_size):
+                yield chunk
+        
+        response: Dict = await self.call_service_stream(instance=stt_instance, path=stt_path, content=_audio_body(),
+                                                        params={"filename": file.filename})
         # 获取clean_text
         recognize_result = response["result"][0]["clean_text"]
         self.logger.info(recognize_result)
         
-        return await self._chat(recognize_result)
+        return await self._chat(recognize_result, audio_format)
         
         
-    async def _user_input_video(self, file_path: str):
+    async def _user_input_video(self, file_path: str, audio_format: str = "wav"):
         """处理用户的视频输入"""
         # TODO 暂时未实现视觉Agent，待修改
         # 将视频发送给Vision进行识别
@@ -303,10 +334,10 @@ class ChatModule:
         # TODO 确定返回类型并处理
         vision_response = await self.call_service_api(instance=vision_instance, path=vision_path, payload=vision_payload)
         
-        return await self._chat(vision_response)
+        return await self._chat(vision_response, audio_format)
     
     
-    async def _user_input_image(self, file_path: str):
+    async def _user_input_image(self, file_path: str, audio_format: str = "wav"):
         """处理用户的图片输入"""
         # TODO 暂时未实现视觉Agent，待修改
         # 将图片发送给Vision进行识别
@@ -318,13 +349,13 @@ class ChatModule:
         # TODO 确定返回类型并处理
         vision_response = await self.call_service_api(instance=vision_instance, path=vision_path, payload=vision_payload)
         
-        return await self._chat(vision_response)
+        return await self._chat(vision_response, audio_format)
     
     
-    async def _chat(self, content: str):
+    async def _chat(self, content: str, audio_format: str = "wav"):
         """
         通用函数
-            返回Tuple(文本回复， 语音)
+            返回Tuple(文本回复， 语音)，语音按 audio_format 编码
         """
          # 将文本发送给PromptOptimizer进行优化
         po_instance = await self.pick_instance(service_name="PromptOptimizer")
@@ -356,19 +387,42 @@ class ChatModule:
         self.logger.info(f"audio path : {audio_path}")
         
         # 将文本回复语语音回复返回给客户端
-        return await self.return_response(content_response, audio_path)
+        return await self.return_response(content_response, audio_path, audio_format)
       
     
-    async def return_response(self, content: str, audio_path: str):
-        """返回文本+语音文件给客户端"""
+    async def return_response(self, content: str, audio_path: str, audio_format: str = "wav"):
+        """
+        返回文本+语音文件给客户端
+        
+        audio_format 为 opus/mp3 时先完成转码再开始响应：响应开始后无法再报告错误，
+        转码失败时回退为WAV原文件。
+        """
         # TODO 选取合适的分隔符
         # 分隔符 
         boundary = self.boundary
         
+        async def _read_audio() -> AsyncGenerator[bytes, None]:
+            async with aiofiles.open(audio_path, "rb") as f:
+                while chunk := await f.read(self.audio_read_chunk_size):
+                    yield chunk
+        
+        encoded_audio: Optional[bytearray] = None
+        if audio_format != "wav":
+            try:
+                encoded_audio = bytearray()
+                async for chunk in self.transcoder.transcode_stream(_read_audio(), audio_format):
+                    encoded_audio += chunk
+            except Exception as e:
+                self.logger.warning(f"音频转码为 {audio_format} 失败，回退为 wav: {e}")
+                encoded_audio = None
+                audio_format = "wav"
+        encoding = self.transcoder.encoding(audio_format)
+        
         # 文本JSON元数据
         metadata = {
             "user": "test",
-            "content": content
+            "content": content,
+            "audio_format": audio_format
         }
         metadata_bytes = json.dumps(metadata).encode("utf-8")
         
@@ -379,27 +433,29 @@ class ChatModule:
             f"Content-Type: application/json\r\n\r\n"
         ).encode("utf-8") + metadata_bytes + b"\r\n"
         
-        # Part 2: 文件（二进制）
-        with open(audio_path, "rb") as f:
-            file_content = f.read()
-            
-        # 构造 Part 2 的 HTTP 头部和内容
-        file_part = (
+        # Part 2: 文件（二进制），文件扩展名与实际格式一致
+        filename = f"{os.path.splitext(os.path.basename(audio_path))[0]}.{encoding.extension}"
+        file_header = (
             f"--{boundary}\r\n"
-            f"Content-Type: application/octet-stream\r\n"
-            f"Content-Disposition: attachment; filename={audio_path}\r\n\r\n"
-        ).encode("utf-8") + file_content + b"\r\n"
+            f"Content-Type: {encoding.content_type}\r\n"
+            f"Content-Disposition: attachment; filename={filename}\r\n\r\n"
+        ).encode("utf-8")
         
         # 结束标识
         end_part = f"--{boundary}--\r\n".encode("utf-8")
-
-        # 拼接最终响应体
-        body = metadata_part + file_part + end_part
         
-        return Response(
-            content=body,
+        async def _body() -> AsyncGenerator[bytes, None]:
+            yield metadata_part + file_header
+            if encoded_audio is not None:
+                yield bytes(encoded_audio)
+            else:
+                async for chunk in _read_audio():
+                    yield chunk
+            yield b"\r\n" + end_part
+        
+        return StreamingResponse(
+            _body(),
             media_type=f"multipart/mixed; boundary={boundary}",
-            # 在实际生产中，也可加上 Content-Length 等头部
         )
     
       
@@ -420,6 +476,39 @@ class ChatModule:
         return response.json()    
     
     
+    async def call_service_stream(self, instance: Dict, path: str, content: AsyncGenerator[bytes, None],
+                                  params: Optional[Dict] = None):
+        """
+        向指定微服务地址 instance 发起 POST 请求，请求体为分块传输的二进制数据。
+        :param instance: 形如 {"address": "192.168.1.100", "port": 20010}
+        :param path: 例如 "/some/endpoint"
+        :param content: 请求体数据块
+        :param params: 查询参数
+        :return: 返回的 JSON 数据
+        """
+        url = f"http://{instance['address']}:{instance['port']}{path}"
+        
+        response = await self.client.post(url, content=content, params=params,
+                                          headers={"Content-Type": "application/octet-stream"}, timeout=120.0)
+        response.raise_for_status()
+        return response.json()
+    
+    
+    async def _archive_upload(self, file: UploadFile, store):
+        """把上传文件另存到 store 留档（在线程中写入），之后把读取位置复位"""
+        save_path = store.new_path(file.filename)
+        contents = await file.read()
+        
+        def _write():
+            with open(save_path, "wb") as f:
+                f.write(contents)
+        
+        await asyncio.to_thread(_write)
+        store.add(save_path)
+        await file.seek(0)
+        self.logger.info(f"Upload archived as '{save_path}'")
+    
+    
     def run(self):
         uvicorn.run(self.app, host=self.host, port=self.port)
         
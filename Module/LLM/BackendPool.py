@@ -0,0 +1,324 @@
+"""
+LLM后端池
+
+管理多个 Ollama 后端实例：
+- 通过服务发现维护实例列表，实例增减时自动重平衡
+- 通过 /api/ps 跟踪各实例已加载（常驻显存）的模型
+- 路由：优先选择已加载目标模型的实例，其次选择负载最低的实例
+- 故障转移：连续失败的实例进入冷却期，请求转到其他实例
+"""
+
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, List, Set, Iterable, AsyncIterator
+from logging import Logger
+
+from Init.ServiceDiscovery import ServiceDiscoveryManager, ExternalServiceConnector
+from Init.ServiceDiscovery.service_connector import ServiceClient
+
+
+def normalize_model_name(name: str) -> str:
+    """Ollama 中未带标签的模型名等价于 ``:latest``"""
+    return name if ":" in name else f"{name}:latest"
+
+
+class LLMBackend:
+    """单个LLM后端实例的状态"""
+
+    def __init__(self, client: ServiceClient, owned: bool = True):
+        self.client = client
+        self.url: str = client.base_url
+        # 是否由后端池负责关闭客户端
+        self.owned = owned
+
+        self.resident_models: Set[str] = set()
+        self.in_flight = 0
+        self.total_requests = 0
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self.removed = False
+
+    @property
+    def healthy(self) -> bool:
+        return not self.removed and time.monotonic() >= self.unhealthy_until
+
+    def has_model(self, model: str) -> bool:
+        return normalize_model_name(model) in self.resident_models
+
+    @asynccontextmanager
+    async def track(self) -> AsyncIterator["LLMBackend"]:
+        """统计进行中的请求数"""
+        self.in_flight += 1
+        self.total_requests += 1
+        try:
+            yield self
+        finally:
+            self.in_flight -= 1
+
+    def __repr__(self):
+        return f"LLMBackend(url={self.url}, in_flight={self.in_flight}, models={sorted(self.resident_models)})"
+
+
+class LLMBackendPool:
+    """
+    LLM后端池
+
+    由 LLMProxy 持有，负责为每个请求选择后端实例。
+    """
+
+    def __init__(self, logger: Logger, config: Optional[Dict[str, Any]] = None):
+        """
+        初始化后端池
+
+        Args:
+            logger: 日志记录器
+            config: 后端池配置
+        """
+        self.logger = logger
+        config = config or {}
+
+        self.service_name: str = config.get("service_name", "ollama_server")
+        self.refresh_interval: float = config.get("refresh_interval", 15.0)
+        self.failure_threshold: int = config.get("failure_threshold", 2)
+        self.failure_cooldown: float = config.get("failure_cooldown", 10.0)
+
+        self.backends: Dict[str, LLMBackend] = {}
+
+        self.discovery_manager: Optional[ServiceDiscoveryManager] = None
+        self.service_connector: Optional[ExternalServiceConnector] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        # 已移除、等待空闲后关闭连接的后端
+        self._tasks: Set[asyncio.Task] = set()
+
+        # 实例数量变化时的回调（用于调整调度并发上限）
+        self.on_backends_changed = None
+        # 每轮定期刷新完成后的异步回调（用于补齐常驻模型）
+        self.on_refreshed = None
+
+    # ------------------------------------------------------------------
+    # 生命周期
+    # ------------------------------------------------------------------
+    async def start(self, discovery_manager: ServiceDiscoveryManager,
+                    service_connector: ExternalServiceConnector,
+                    primary: Optional[ServiceClient] = None):
+        """
+        启动后端池
+
+        Args:
+            discovery_manager: 服务发现管理器
+            service_connector: 服务连接器
+            primary: 已建立的主服务客户端，由连接器负责关闭
+        """
+        self.discovery_manager = discovery_manager
+        self.service_connector = service_connector
+
+        if primary is not None:
+            self.add_client(primary, owned=False)
+
+        await self.refresh_backends()
+        await self.refresh_resident_models()
+
+        if self.refresh_interval > 0 and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    def add_client(self, client: ServiceClient, owned: bool = True) -> LLMBackend:
+        """加入一个已连接的后端"""
+        backend = self.backends.get(client.base_url)
+        if backend is None:
+            backend = self.backends[client.base_url] = LLMBackend(client, owned=owned)
+            self.logger.info(f"LLM后端加入: {client.base_url}")
+            self._notify_changed()
+        elif backend.client is not client:
+            # 同一地址重连后替换客户端
+            backend.client = client
+            backend.owned = owned
+        return backend
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh_backends()
+                await self.refresh_resident_models()
+                if self.on_refreshed is not None:
+                    await self.on_refreshed()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.warning(f"刷新LLM后端失败: {e}")
+
+    async def refresh_backends(self):
+        """从服务发现同步实例列表：加入新实例，移除已下线实例"""
+        if self.discovery_manager is None or self.service_connector is None:
+            return
+
+        try:
+            instances = await self.discovery_manager.discover_service_instances(self.service_name)
+        except Exception as e:
+            self.logger.warning(f"发现LLM后端实例失败: {e}")
+            return
+
+        discovered_urls = {info.url for info in instances}
+
+        for info in instances:
+            if info.url in self.backends:
+                continue
+            try:
+                client = await self.service_connector.create_instance_client(info)
+                self.add_client(client, owned=True)
+            except Exception as e:
+                self.logger.warning(f"连接LLM后端失败 {info.url}: {e}")
+
+        # 只在发现结果非空时移除实例，避免 Consul 短暂不可用时清空后端池
+        if discovered_urls:
+            for url in list(self.backends):
+                if url not in discovered_urls:
+                    await self._remove_backend(url)
+
+    async def _remove_backend(self, url: str):
+        backend = self.backends.pop(url, None)
+        if backend is None:
+            return
+        backend.removed = True
+        self.logger.info(f"LLM后端移除: {url}")
+        self._notify_changed()
+
+        if backend.owned:
+            # 等待进行中的请求结束后再关闭连接
+            async def _close_when_idle():
+                try:
+                    while backend.in_flight > 0:
+                        await asyncio.sleep(0.5)
+                finally:
+                    # cleanup 取消等待时同样关闭连接
+                    await backend.client.client.aclose()
+            task = asyncio.create_task(_close_when_idle())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def refresh_resident_models(self):
+        """通过 /api/ps 更新各实例已加载的模型"""
+        async def _refresh(backend: LLMBackend):
+            try:
+                response = await backend.client.get("/api/ps", timeout=5.0)
+                response.raise_for_status()
+                models = response.json().get("models", [])
+                backend.resident_models = {
+                    normalize_model_name(m.get("name") or m.get("model", "")) for m in models
+                }
+            except Exception as e:
+                self.logger.debug(f"获取常驻模型失败 {backend.url}: {e}")
+
+        await asyncio.gather(*(_refresh(b) for b in list(self.backends.values())))
+
+    def _notify_changed(self):
+        if self.on_backends_changed is not None:
+            self.on_backends_changed(len(self.backends))
+
+    async def cleanup(self):
+        """停止刷新任务并关闭自有连接"""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+        for task in list(self._tasks):
+            task.cancel()
+        for result in await asyncio.gather(*self._tasks, return_exceptions=True):
+            if isinstance(result, Exception):
+                self.logger.warning(f"关闭已移除的LLM后端连接失败: {result}")
+
+        for backend in self.backends.values():
+            if backend.owned:
+                try:
+                    await backend.client.client.aclose()
+                except Exception as e:
+                    self.logger.warning(f"关闭LLM后端连接失败 {backend.url}: {e}")
+        self.backends.clear()
+
+    # ------------------------------------------------------------------
+    # 路由
+    # ------------------------------------------------------------------
+    def select(self, model: Optional[str], exclude: Iterable[str] = ()) -> Optional[LLMBackend]:
+        """
+        为请求选择后端
+
+        Args:
+            model: 目标模型
+            exclude: 本次请求已失败、需要跳过的后端URL
+
+        Returns:
+            Optional[LLMBackend]: 选中的后端，后端池为空时返回None
+        """
+        excluded = set(exclude)
+        candidates = [b for b in self.backends.values() if b.url not in excluded]
+        if not candidates:
+            # 所有后端都已尝试过，允许重试
+            candidates = list(self.backends.values())
+        if not candidates:
+            return None
+
+        healthy = [b for b in candidates if b.healthy]
+        if not healthy:
+            # 全部处于冷却期时，选择最早恢复的那个
+            return min(candidates, key=lambda b: b.unhealthy_until)
+
+        if model:
+            resident = [b for b in healthy if b.has_model(model)]
+            if resident:
+                healthy = resident
+
+        return min(healthy, key=lambda b: (b.in_flight, b.consecutive_failures, b.total_requests))
+
+    def has_alternative(self, exclude: Iterable[str]) -> bool:
+        """是否还有未尝试过的健康后端"""
+        excluded = set(exclude)
+        return any(b.healthy and b.url not in excluded for b in self.backends.values())
+
+    def mark_success(self, backend: LLMBackend, model: Optional[str] = None):
+        """请求成功：清除失败计数，并记录该实例已加载模型"""
+        backend.consecutive_failures = 0
+        backend.unhealthy_until = 0.0
+        if model:
+            backend.resident_models.add(normalize_model_name(model))
+
+    def mark_failure(self, backend: LLMBackend):
+        """请求失败：连续失败达到阈值后进入冷却期"""
+        backend.consecutive_failures += 1
+        if backend.consecutive_failures >= self.failure_threshold:
+            backend.unhealthy_until = time.monotonic() + self.failure_cooldown
+            self.logger.warning(
+                f"LLM后端 {backend.url} 连续失败 {backend.consecutive_failures} 次，"
+                f"冷却 {self.failure_cooldown} 秒"
+            )
+
+    def is_resident(self, model: str) -> bool:
+        """是否有任一实例已加载该模型"""
+        return any(b.has_model(model) for b in self.backends.values())
+
+    def resident_models(self) -> Dict[str, List[str]]:
+        """各实例已加载的模型"""
+        return {url: sorted(b.resident_models) for url, b in self.backends.items()}
+
+    def get_status(self) -> List[Dict[str, Any]]:
+        """
+        获取后端池状态
+
+        Returns:
+            List[Dict[str, Any]]: 每个后端的负载、健康与常驻模型信息
+        """
+        return [
+            {
+                "url": b.url,
+                "healthy": b.healthy,
+                "in_flight": b.in_flight,
+                "total_requests": b.total_requests,
+                "consecutive_failures": b.consecutive_failures,
+                "resident_models": sorted(b.resident_models)
+            }
+            for b in self.backends.values()
+        ]
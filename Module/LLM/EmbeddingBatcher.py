@@ -0,0 +1,184 @@
+"""
+向量化请求合批
+
+把并发调用方的 embed 请求合并为少量 Ollama /api/embed 批量请求：
+- 同一模型的请求在很短的时间窗口内聚合，达到批大小上限时立即发送
+- 超过批大小上限的大输入拆成多个批次并发发送
+- 按（模型, 文本内容）哈希缓存向量，重复文本不再请求后端
+- 正在请求中的相同文本直接共享结果
+"""
+
+import asyncio
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, List, Callable, Awaitable
+from logging import Logger
+
+from Module.LLM.RequestScheduler import Priority
+
+
+Vector = List[float]
+# (model, texts, priority) -> 与 texts 一一对应的向量
+EmbedSender = Callable[[str, List[str], Priority], Awaitable[List[Vector]]]
+
+
+@dataclass
+class _PendingText:
+    key: str
+    text: str
+    priority: Priority
+    future: asyncio.Future
+
+
+class EmbeddingBatcher:
+    """
+    向量化请求合批器
+
+    由 LLMProxy 持有，实际的后端请求通过 ``sender`` 回调发出。
+    """
+
+    def __init__(self, logger: Logger, config: Optional[Dict[str, Any]], sender: EmbedSender):
+        """
+        初始化合批器
+
+        Args:
+            logger: 日志记录器
+            config: 合批配置
+            sender: 发送一批文本并返回向量的协程函数
+        """
+        self.logger = logger
+        config = config or {}
+
+        self.max_batch_size: int = config.get("max_batch_size", 64)
+        self.max_wait: float = config.get("max_wait_ms", 5) / 1000
+        self.cache_size: int = config.get("cache_size", 10000)
+        self.sender = sender
+
+        self._cache: OrderedDict[str, Vector] = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._queues: Dict[str, List[_PendingText]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+        self.stats = {"texts": 0, "cache_hits": 0, "shared": 0, "batches": 0, "batched_texts": 0}
+
+    @staticmethod
+    def _key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+    async def embed(self, texts: List[str], model: str, priority: Priority = "interactive") -> List[Vector]:
+        """
+        获取文本向量
+
+        Args:
+            texts: 文本列表
+            model: 向量模型
+            priority: 调度优先级，同一批次中任一请求为交互优先级时整批按交互优先级发送
+
+        Returns:
+            List[Vector]: 与 texts 一一对应的向量
+        """
+        loop = asyncio.get_running_loop()
+        futures: List[asyncio.Future] = []
+
+        for text in texts:
+            self.stats["texts"] += 1
+            key = self._key(model, text)
+
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                future = loop.create_future()
+                future.set_result(vector)
+                futures.append(future)
+                continue
+
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.stats["shared"] += 1
+                futures.append(future)
+                continue
+
+            future = self._in_flight[key] = loop.create_future()
+            # 所有调用方都已取消时，由此取走异常，避免 "exception was never retrieved"
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            futures.append(future)
+            self._enqueue(model, _PendingText(key, text, priority, future))
+
+        # 同一个future可能被多个调用方共享，用 shield 避免单个调用方取消时影响其他调用方
+        vectors = await asyncio.gather(*(asyncio.shield(f) for f in futures))
+        return [list(v) for v in vectors]
+
+    def _enqueue(self, model: str, item: _PendingText):
+        queue = self._queues.setdefault(model, [])
+        queue.append(item)
+
+        if len(queue) >= self.max_batch_size:
+            self._flush(model)
+        elif model not in self._timers:
+            loop = asyncio.get_running_loop()
+            self._timers[model] = loop.call_later(self.max_wait, self._flush, model)
+
+    def _flush(self, model: str):
+        """把队列中的文本按批大小上限拆分后发送"""
+        timer = self._timers.pop(model, None)
+        if timer is not None:
+            timer.cancel()
+
+        queue = self._queues.pop(model, [])
+        for i in range(0, len(queue), self.max_batch_size):
+            task = asyncio.create_task(self._send_batch(model, queue[i:i + self.max_batch_size]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send_batch(self, model: str, batch: List[_PendingText]):
+        priority: Priority = "interactive" if any(p.priority == "interactive" for p in batch) else "background"
+        self.stats["batches"] += 1
+        self.stats["batched_texts"] += len(batch)
+
+        try:
+            vectors = await self.sender(model, [p.text for p in batch], priority)
+            if len(vectors) != len(batch):
+                raise RuntimeError(f"向量数量不匹配: 期望 {len(batch)}，实际 {len(vectors)}")
+        except Exception as e:
+            self.logger.error(f"向量化请求失败: model={model}, size={len(batch)}: {e}")
+            for item in batch:
+                self._in_flight.pop(item.key, None)
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+
+        for item, vector in zip(batch, vectors):
+            self._in_flight.pop(item.key, None)
+            self._store(item.key, vector)
+            if not item.future.done():
+                item.future.set_result(vector)
+
+    def _store(self, key: str, vector: Vector):
+        if self.cache_size <= 0:
+            return
+        self._cache[key] = vector
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def clear(self):
+        """清空向量缓存"""
+        self._cache.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        获取合批与缓存统计
+
+        Returns:
+            Dict[str, Any]: 文本数、缓存命中、平均批大小等指标
+        """
+        batches = self.stats["batches"]
+        return {
+            **self.stats,
+            "avg_batch_size": self.stats["batched_texts"] / batches if batches else None,
+            "cache_entries": len(self._cache),
+            "queued": sum(len(q) for q in self._queues.values())
+        }
@@ -5,14 +5,57 @@ LLM服务代理
 替代原来的OllamaAgent FastAPI服务。
 """
 
+import json
+import time
 import asyncio
+import hashlib
 import httpx
-from typing import Dict, Any, LiteralString, Optional, List, Literal
+from collections import deque, OrderedDict
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import Dict, Any, LiteralString, Optional, List, Literal, AsyncGenerator
 from logging import Logger
 
 from Module.Utils.Logger import setup_logger
 from Module.Utils.ConfigTools import load_config
 from Init.ServiceDiscovery import ServiceDiscoveryManager, ExternalServiceConnector
+from Module.LLM.ResponseCache import LLMResponseCache
+from Module.LLM.RequestScheduler import LLMRequestScheduler, Priority
+from Module.LLM.BackendPool import LLMBackendPool, LLMBackend
+from Module.LLM.ModelKeepAlive import ModelKeepAliveManager
+from Module.LLM.TokenCounter import TokenCounter
+from Module.LLM.EmbeddingBatcher import EmbeddingBatcher
+from Module.Utils.RetryPolicy import RetryPolicy
+
+@dataclass
+class StreamStats:
+    """单次流式生成的统计信息"""
+    model: str
+    started_at: float
+    first_token_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    chunk_count: int = 0
+    eval_count: Optional[int] = None        # Ollama 最终块给出的生成token数
+    eval_duration_ns: Optional[int] = None  # Ollama 最终块给出的生成耗时(纳秒)
+    cancelled: bool = False
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        """首token延迟（秒）"""
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """生成速度，优先使用 Ollama 上报的 eval 数据"""
+        if self.eval_count and self.eval_duration_ns:
+            return self.eval_count / (self.eval_duration_ns / 1e9)
+        if self.first_token_at is None or self.finished_at is None:
+            return None
+        elapsed = self.finished_at - self.first_token_at
+        return self.chunk_count / elapsed if elapsed > 0 else None
+
 
 class LLMProxy:
     """
@@ -45,6 +88,46 @@ class LLMProxy:
         self.default_model = self.config.get("default_model", "qwen2.5:3b")
         self.request_timeout = self.config.get("request_timeout", 120.0)
         
+        # 重试策略：错误分类、指数退避与进程级重试预算
+        self.retry_policy = RetryPolicy(self.logger, "llm", {
+            "max_attempts": self.config.get("max_retries", 3),
+            "base_delay": self.config.get("retry_delay", 1.0),
+            **self.config.get("retry", {})
+        })
+        
+        # 最近的流式生成统计
+        self.stream_history: deque[StreamStats] = deque(maxlen=self.config.get("stream_history_size", 100))
+        
+        # 确定性请求的响应缓存
+        self.response_cache = LLMResponseCache(self.logger, self.config.get("response_cache", {}))
+        
+        # 请求调度：按模型限制并发，交互请求优先于后台任务
+        self.scheduler = LLMRequestScheduler(self.logger, self.config.get("scheduler", {}))
+        
+        # 多后端池：按模型亲和性与负载路由，失败时转移
+        self.backend_pool = LLMBackendPool(self.logger, self.config.get("backend_pool", {}))
+        self.backend_pool.on_backends_changed = self.scheduler.set_backend_count
+        
+        # 模型预加载与 keep_alive 管理
+        self.keep_alive = ModelKeepAliveManager(self.logger, self.config.get("keep_alive", {}), self.default_model)
+        self.backend_pool.on_refreshed = self._ensure_pinned_models_resident
+        
+        # 按token计算提示词预算，并据此选择 num_ctx
+        token_config = self.config.get("token_budget", {})
+        self.token_counter = TokenCounter(self.logger, token_config)
+        self.context_buckets: List[int] = sorted(token_config.get("context_buckets", [1024, 2048, 4096, 8192]))
+        self.reserve_tokens: int = token_config.get("reserve_tokens", 64)
+        
+        # 向量化：合并并发请求，按内容缓存
+        embedding_config = self.config.get("embedding", {})
+        self.embedding_model = embedding_config.get("model", "nomic-embed-text")
+        self.embedding_batcher = EmbeddingBatcher(self.logger, embedding_config, self._send_embed_batch)
+        
+        # 分层摘要：并发上限与已摘要块缓存
+        self.summary_model = self.config.get("summary_model", "qwen2.5:3b")
+        self._summary_semaphore = asyncio.Semaphore(self.config.get("summary_concurrency", 4))
+        self._summary_chunk_cache: OrderedDict[str, str] = OrderedDict()
+        
         self.logger.info("LLMProxy initialized")
     
     def _load_config(self, config_path: Optional[str]) -> Dict:
@@ -61,7 +144,61 @@ class LLMProxy:
             "default_model": "qwen2.5:3b",  # 使用更小的模型避免显存问题
             "request_timeout": 120.0,
             "max_retries": 3,
-            "retry_delay": 1.0
+            "retry_delay": 1.0,
+            "retry": {
+                "max_delay": 8.0,            # 单次退避上限（秒）
+                "deadline": None,            # 单次调用的默认截止时间（秒）
+                "budget_ratio": 0.1,         # 重试数不超过请求数的10%
+                "budget_min_retries": 10,    # 低流量时窗口内至少允许的重试数
+                "budget_window": 10.0        # 预算统计窗口（秒）
+            },
+            "stream_history_size": 100,
+            "token_budget": {
+                "tokenizer": None,                            # HuggingFace分词器名称或路径，如 "Qwen/Qwen2.5-3B-Instruct"；为空时近似估算
+                "context_buckets": [1024, 2048, 4096, 8192],  # num_ctx 档位，最大档即上下文上限
+                "reserve_tokens": 64,                         # 为模板等预留的token
+                "count_cache_size": 4096                      # token计数缓存条数
+            },
+            "embedding": {
+                "model": "nomic-embed-text",  # 向量模型
+                "max_batch_size": 64,         # 单次 /api/embed 请求的最大文本数
+                "max_wait_ms": 5,             # 合并并发请求的等待窗口
+                "cache_size": 10000           # 向量缓存条数
+            },
+            "summary_model": "qwen2.5:3b",   # 摘要使用的模型
+            "summary_chunk_tokens": 600,     # 每个摘要块的token预算（需与 num_ctx 匹配）
+            "summary_concurrency": 4,        # 同时进行的块摘要数
+            "summary_cache_size": 1024,      # 已摘要块缓存条数
+            "response_cache": {
+                "enabled": True,
+                "max_entries": 512,          # 内存LRU条目数
+                "max_temperature": 0.3,      # 调用方要求缓存（cache=True）且不高于该温度（或指定seed）的请求才缓存
+                "disk_dir": None,            # 设置后启用磁盘缓存，如 "${AGENT_HOME}/Temp/llm_cache"
+                "ttl": 86400,                # 磁盘缓存有效期（秒）
+                "max_disk_bytes": 268435456  # 磁盘缓存总容量（字节）
+            },
+            "scheduler": {
+                "max_concurrency_per_model": 2,  # 对应 Ollama 的 OLLAMA_NUM_PARALLEL
+                "model_concurrency": {},         # 按模型覆盖并发上限
+                "queue_deadlines": {             # 最长排队时间（秒）
+                    "interactive": 30.0,
+                    "background": 600.0
+                }
+            },
+            "backend_pool": {
+                "service_name": "ollama_server",  # Consul中的LLM后端服务名
+                "refresh_interval": 15.0,         # 实例列表与常驻模型刷新间隔（秒）
+                "failure_threshold": 2,           # 连续失败多少次后进入冷却
+                "failure_cooldown": 10.0          # 冷却时间（秒）
+            },
+            "keep_alive": {
+                "preload_models": ["qwen2.5:3b"],  # initialize() 时预加载并固定常驻的模型
+                "pinned_keep_alive": "30m",        # 固定常驻模型的 keep_alive（后台定期续期）
+                "hot_keep_alive": "10m",           # 近期流量较高模型的 keep_alive
+                "cold_keep_alive": "1m",           # 偶尔使用模型的 keep_alive，用完尽快释放
+                "traffic_window": 600.0,           # 流量统计窗口（秒）
+                "hot_threshold": 3                 # 窗口内达到该请求数视为高流量
+            }
         }
     
     async def initialize(self):
@@ -94,17 +231,30 @@ class LLMProxy:
             
             self.logger.info(f"✅ LLM服务连接成功: {self.service_client.base_url}")
             
+            # 启动后端池，纳入同一服务名下的其他实例
+            await self.backend_pool.start(self.discovery_manager, self.service_connector, primary=self.service_client)
+            self.logger.info(f"LLM后端池就绪，共 {len(self.backend_pool.backends)} 个实例")
+            
+            # 预加载模型，避免首个请求承担模型加载耗时
+            await self.warm_up_models()
+            
         except Exception as e:
             self.logger.error(f"LLM服务初始化失败: {e}")
             raise
     
-    async def chat(self, message: str, model: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+    async def chat(self, message: str, model: Optional[str] = None,
+                   priority: Priority = "interactive", user: str = "default",
+                   cache: bool = False, deadline: Optional[float] = None, **kwargs) -> Dict[str, Any]:
         """
         与LLM进行对话，优化显存使用
         
         Args:
             message: 用户消息
             model: 模型名称，如果不指定则使用默认模型
+            priority: 调度优先级，后台任务请使用 "background"
+            user: 用户标识，用于调度公平性
+            cache: 是否使用响应缓存，仅用于结果不随时间变化的确定性任务（关键词提取、摘要等）
+            deadline: 本次调用的截止时间（秒），包含排队与重试，为空时使用配置中的默认值
             **kwargs: 其他参数
             
         Returns:
@@ -113,11 +263,35 @@ class LLMProxy:
         if not self.service_client:
             await self.initialize()
         
+        data = self._build_chat_payload(message, model, stream=False, **kwargs)
+        model = data["model"]
+        
+        cached = await self.response_cache.get(data) if cache else None
+        if cached is not None:
+            self.logger.debug(f"LLM chat cache hit for model: {model}")
+            return cached
+        
+        self._apply_keep_alive(data)
+        expires = self._expires_at(deadline)
+        
+        try:
+            async with self.scheduler.slot(model, priority, user, deadline=self._remaining(expires)):
+                response = await self._make_request("/api/chat", data, deadline=self._remaining(expires))
+            self.logger.debug(f"LLM chat successful for model: {model}")
+            if cache:
+                await self.response_cache.put(data, response)
+            return response
+            
+        except Exception as e:
+            self.logger.error(f"LLM chat failed: {e}")
+            raise
+    
+    def _build_chat_payload(self, message: str, model: Optional[str], stream: bool, **kwargs) -> Dict[str, Any]:
+        """构建 /api/chat 请求体"""
         model = model or self.default_model
         
         # 优化参数以减少显存使用
         optimized_params = {
-            "num_ctx": 1024,        # 大幅减少上下文长度
             "num_predict": 100,     # 大幅限制生成长度
             "temperature": 0.1,     # 降低随机性
             "top_p": 0.8,          # 核采样
@@ -127,8 +301,10 @@ class LLMProxy:
         # 用户参数会覆盖默认参数
         optimized_params.update(kwargs)
         
-        # 构建请求数据
-        data = {
+        # 按实际提示词长度确定 num_ctx，超出上下文上限时截断
+        message = self._fit_prompt(message, optimized_params, TokenCounter.MESSAGE_OVERHEAD)
+        
+        return {
             "model": model,
             "messages": [
                 {
@@ -136,26 +312,272 @@ class LLMProxy:
                     "content": message
                 }
             ],
-            "stream": False,
+            "stream": stream,
             "options": optimized_params  # Ollama 使用 options 字段
         }
+    
+    def _build_generate_payload(self, prompt: str, model: Optional[str], stream: bool, **kwargs) -> Dict[str, Any]:
+        """构建 /api/generate 请求体"""
+        data = {
+            "model": model or self.default_model,
+            "prompt": prompt,
+            **kwargs,
+            "stream": stream
+        }
+        options = dict(data.get("options") or {})
+        data["prompt"] = self._fit_prompt(prompt, options)
+        data["options"] = options
+        return data
+    
+    def _fit_prompt(self, text: str, options: Dict[str, Any], overhead: int = 0) -> str:
+        """
+        按token预算处理提示词，并在 options 中写入 num_ctx
+        
+        num_ctx 从固定档位中选择能容纳「提示词 + 生成长度 + 预留」的最小一档。
+        Ollama 在 num_ctx 变化时会重新加载模型，使用少量固定档位可以避免频繁重载。
+        调用方显式指定 num_ctx 时以其为上限，只做截断。
+        
+        Args:
+            text: 提示词
+            options: Ollama options，会被原地修改
+            overhead: 提示词之外的固定token开销
+            
+        Returns:
+            str: 必要时截断后的提示词
+        """
+        num_predict = options.get("num_predict", 128)
+        if num_predict is None or num_predict < 0:
+            num_predict = 0
+        
+        explicit_ctx = options.get("num_ctx")
+        max_ctx = explicit_ctx or self.context_buckets[-1]
+        budget = max_ctx - num_predict - self.reserve_tokens - overhead
+        
+        prompt_tokens = self.token_counter.count(text)
+        if prompt_tokens > budget:
+            self.logger.warning(f"提示词超出上下文预算 ({prompt_tokens} > {budget} tokens)，已截断")
+            text = self.token_counter.truncate(text, budget)
+            prompt_tokens = self.token_counter.count(text)
+        
+        if not explicit_ctx:
+            needed = prompt_tokens + overhead + num_predict + self.reserve_tokens
+            options["num_ctx"] = next((b for b in self.context_buckets if b >= needed), self.context_buckets[-1])
+        
+        return text
+    
+    async def chat_stream(self, message: str, model: Optional[str] = None,
+                          stats: Optional[StreamStats] = None, priority: Priority = "interactive",
+                          user: str = "default", deadline: Optional[float] = None,
+                          **kwargs) -> AsyncGenerator[str, None]:
+        """
+        流式对话，逐块返回增量文本
+        
+        调用方提前退出时请使用 ``contextlib.aclosing`` 或取消所在任务，
+        生成器关闭时会同时关闭上游HTTP连接，Ollama 随即停止生成。
+        
+        Args:
+            message: 用户消息
+            model: 模型名称，如果不指定则使用默认模型
+            stats: 可选，由调用方传入以获取本次调用的首token延迟与生成速度
+            priority: 调度优先级
+            user: 用户标识
+            deadline: 截止时间（秒），包含排队与首token前的重试，为空时使用配置中的默认值
+            **kwargs: 其他参数（写入 options）
+            
+        Yields:
+            str: 增量文本
+        """
+        if not self.service_client:
+            await self.initialize()
+        
+        data = self._build_chat_payload(message, model, stream=True, **kwargs)
+        async with aclosing(self._stream_request("/api/chat", data, stats, priority, user, deadline)) as stream:
+            async for delta in stream:
+                yield delta
+    
+    async def generate_stream(self, prompt: str, model: Optional[str] = None,
+                              stats: Optional[StreamStats] = None, priority: Priority = "interactive",
+                              user: str = "default", deadline: Optional[float] = None,
+                              **kwargs) -> AsyncGenerator[str, None]:
+        """
+        流式生成文本，逐块返回增量文本
+        
+        Args:
+            prompt: 提示文本
+            model: 模型名称
+            stats: 可选，由调用方传入以获取本次调用的统计信息
+            priority: 调度优先级
+            user: 用户标识
+            deadline: 截止时间（秒），包含排队与首token前的重试
+            **kwargs: 其他参数
+            
+        Yields:
+            str: 增量文本
+        """
+        if not self.service_client:
+            await self.initialize()
+        
+        data = self._build_generate_payload(prompt, model, stream=True, **kwargs)
+        async with aclosing(self._stream_request("/api/generate", data, stats, priority, user, deadline)) as stream:
+            async for delta in stream:
+                yield delta
+    
+    async def _stream_request(self, path: str, data: Dict[str, Any],
+                              stats: Optional[StreamStats] = None, priority: Priority = "interactive",
+                              user: str = "default", deadline: Optional[float] = None) -> AsyncGenerator[str, None]:
+        """
+        发起流式请求并增量解析 Ollama 的 NDJSON 响应
+        
+        调度槽位在整个流式生成期间保持占用。
+        
+        Args:
+            path: API路径
+            data: 请求数据（stream=True）
+            stats: 统计信息对象，为空时内部创建
+            priority: 调度优先级
+            user: 用户标识
+            deadline: 截止时间（秒），从进入调度队列开始计算
+            
+        Yields:
+            str: 增量文本
+        """
+        if self.service_client is None:
+            self.logger.error("服务客户端未初始化")
+            raise RuntimeError("服务客户端未初始化")
+        
+        model = data["model"]
+        self._apply_keep_alive(data)
+        expires = self._expires_at(deadline)
+        if stats is None:
+            stats = StreamStats(model=model, started_at=time.perf_counter())
+        else:
+            stats.model = model
+            stats.started_at = time.perf_counter()
         
         try:
-            response = await self._make_request("/api/chat", data)
-            self.logger.debug(f"LLM chat successful for model: {model}")
-            return response
+            async with self.scheduler.slot(model, priority, user, deadline=self._remaining(expires)):
+                tried: List[str] = []
+                retry = self.retry_policy.start(self._remaining(expires))
+                while True:
+                    backend = self._select_backend(model, tried)
+                    try:
+                        async with backend.track(), backend.client.stream(
+                            "POST",
+                            path,
+                            json=data,
+                            headers={"Content-Type": "application/json"},
+                            timeout=retry.timeout(self.request_timeout)
+                        ) as response:
+                            response.raise_for_status()
+                            
+                            async for line in response.aiter_lines():
+                                if not line.strip():
+                                    continue
+                                chunk = json.loads(line)
+                                
+                                if "error" in chunk:
+                                    raise RuntimeError(f"LLM stream error: {chunk['error']}")
+                                
+                                # chat 返回 message.content，generate 返回 response
+                                if "message" in chunk:
+                                    delta = chunk["message"].get("content", "")
+                                else:
+                                    delta = chunk.get("response", "")
+                                
+                                if delta:
+                                    if stats.first_token_at is None:
+                                        stats.first_token_at = time.perf_counter()
+                                    stats.chunk_count += 1
+                                    yield delta
+                                
+                                if chunk.get("done"):
+                                    stats.eval_count = chunk.get("eval_count")
+                                    stats.eval_duration_ns = chunk.get("eval_duration")
+                                    break
+                        
+                        self.backend_pool.mark_success(backend, model)
+                        break
+                        
+                    except (httpx.HTTPStatusError, httpx.RequestError) as e:
+                        if self._is_backend_fault(e):
+                            self.backend_pool.mark_failure(backend)
+                        tried.append(backend.url)
+                        # 已经输出过内容，或没有其他后端可用时，不再转移
+                        if stats.first_token_at is not None or not self.backend_pool.has_alternative(tried):
+                            raise
+                        if retry.next_delay(e, failover=True) is None:
+                            raise
+                        self.logger.warning(f"LLM stream failed on {backend.url}, failing over: {e}")
+                        
+        except (GeneratorExit, asyncio.CancelledError):
+            # 调用方提前关闭，退出 async with 时连接已被关闭
+            stats.cancelled = True
+            self.logger.info(f"LLM stream cancelled for model: {model}")
+            raise
             
         except Exception as e:
-            self.logger.error(f"LLM chat failed: {e}")
+            self.logger.error(f"LLM stream failed: {e}")
             raise
+            
+        finally:
+            stats.finished_at = time.perf_counter()
+            self.stream_history.append(stats)
+            ttft = stats.time_to_first_token
+            tps = stats.tokens_per_second
+            self.logger.debug(
+                f"LLM stream finished for model: {model}, "
+                f"ttft={ttft if ttft is None else round(ttft, 3)}s, "
+                f"tokens/s={tps if tps is None else round(tps, 1)}"
+            )
+    
+    def get_stream_metrics(self) -> Dict[str, Any]:
+        """
+        汇总最近流式调用的统计
+        
+        Returns:
+            Dict[str, Any]: 调用次数、取消次数、平均首token延迟和平均生成速度
+        """
+        ttfts = [s.time_to_first_token for s in self.stream_history if s.time_to_first_token is not None]
+        tps = [s.tokens_per_second for s in self.stream_history
+               if not s.cancelled and s.tokens_per_second is not None]
+        return {
+            "calls": len(self.stream_history),
+            "cancelled": sum(1 for s in self.stream_history if s.cancelled),
+            "avg_time_to_first_token": sum(ttfts) / len(ttfts) if ttfts else None,
+            "avg_tokens_per_second": sum(tps) / len(tps) if tps else None
+        }
+    
+    def get_queue_metrics(self) -> Dict[str, Any]:
+        """
+        获取调度队列指标
+        
+        Returns:
+            Dict[str, Any]: 各模型的并发/排队数与各优先级的等待统计
+        """
+        return self.scheduler.get_metrics()
     
-    async def generate(self, prompt: str, model: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+    def get_cache_metrics(self) -> Dict[str, Any]:
+        """
+        获取响应缓存统计
+        
+        Returns:
+            Dict[str, Any]: 命中率等缓存指标
+        """
+        return self.response_cache.get_metrics()
+    
+    async def generate(self, prompt: str, model: Optional[str] = None,
+                       priority: Priority = "interactive", user: str = "default",
+                       cache: bool = False, deadline: Optional[float] = None, **kwargs) -> Dict[str, Any]:
         """
         生成文本
         
         Args:
             prompt: 提示文本
             model: 模型名称
+            priority: 调度优先级，后台任务请使用 "background"
+            user: 用户标识，用于调度公平性
+            cache: 是否使用响应缓存，仅用于结果不随时间变化的确定性任务
+            deadline: 本次调用的截止时间（秒），包含排队与重试
             **kwargs: 其他参数
             
         Returns:
@@ -164,25 +586,80 @@ class LLMProxy:
         if not self.service_client:
             await self.initialize()
         
-        model = model or self.default_model
-        
         # 构建请求数据
-        data = {
-            "model": model,
-            "prompt": prompt,
-            "stream": False,
-            **kwargs
-        }
+        data = self._build_generate_payload(prompt, model, stream=False, **kwargs)
+        model = data["model"]
+        
+        cached = await self.response_cache.get(data) if cache else None
+        if cached is not None:
+            self.logger.debug(f"LLM generate cache hit for model: {model}")
+            return cached
+        
+        self._apply_keep_alive(data)
+        expires = self._expires_at(deadline)
         
         try:
-            response = await self._make_request("/api/generate", data)
+            async with self.scheduler.slot(model, priority, user, deadline=self._remaining(expires)):
+                response = await self._make_request("/api/generate", data, deadline=self._remaining(expires))
             self.logger.debug(f"LLM generate successful for model: {model}")
+            if cache:
+                await self.response_cache.put(data, response)
             return response
             
         except Exception as e:
             self.logger.error(f"LLM generate failed: {e}")
             raise
     
+    async def embed(self, texts: List[str], model: Optional[str] = None,
+                    priority: Priority = "interactive", deadline: Optional[float] = None) -> List[List[float]]:
+        """
+        获取文本向量
+        
+        并发调用会被合并为批量请求，重复文本直接使用缓存。
+        
+        Args:
+            texts: 文本列表
+            model: 向量模型，默认使用配置中的向量模型
+            priority: 调度优先级，批量入库等后台任务请使用 "background"
+            deadline: 本次调用的截止时间（秒）
+            
+        Returns:
+            List[List[float]]: 与 texts 一一对应的向量
+        """
+        if not texts:
+            return []
+        
+        if not self.service_client:
+            await self.initialize()
+        
+        # 批量请求由多个调用方共享，截止时间只限制本调用方的等待，不取消共享的批次
+        return await asyncio.wait_for(
+            self.embedding_batcher.embed(texts, model or self.embedding_model, priority),
+            timeout=deadline
+        )
+    
+    async def _send_embed_batch(self, model: str, texts: List[str], priority: Priority) -> List[List[float]]:
+        """发送一批文本到 /api/embed"""
+        data = {
+            "model": model,
+            "input": texts,
+            "truncate": True  # 超出模型上下文的文本由 Ollama 截断
+        }
+        self._apply_keep_alive(data)
+        
+        async with self.scheduler.slot(model, priority, "embedding"):
+            response = await self._make_request("/api/embed", data)
+        return response.get("embeddings", [])
+    
+    def get_embedding_metrics(self) -> Dict[str, Any]:
+        """
+        获取向量化合批统计
+        
+        Returns:
+            Dict[str, Any]: 缓存命中、平均批大小等指标
+        """
+        return self.embedding_batcher.get_metrics()
+    
     async def list_models(self) -> List[Dict[str, Any]]:
         """
         获取可用模型列表
@@ -209,13 +686,18 @@ class LLMProxy:
             self.logger.error(f"Failed to list models: {e}")
             raise
     
-    async def _make_request(self, path: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    async def _make_request(self, path: str, data: Dict[str, Any],
+                            deadline: Optional[float] = None) -> Dict[str, Any]:
         """
         发起HTTP请求
         
+        只重试连接错误、超时、429 与 5xx；有其他可用后端时立即转移，
+        否则按指数退避等待后重试。重试受进程级重试预算限制。
+        
         Args:
             path: API路径
             data: 请求数据
+            deadline: 本次调用的截止时间（秒），为空时使用重试配置中的默认值
             
         Returns:
             Dict[str, Any]: 响应数据
@@ -223,61 +705,173 @@ class LLMProxy:
         if self.service_client is None:
             self.logger.error("服务客户端未初始化")
             raise RuntimeError("服务客户端未初始化")
-            
-        max_retries = self.config.get("max_retries", 3)
-        retry_delay = self.config.get("retry_delay", 1.0)
         
-        for attempt in range(max_retries):
+        model = data.get("model")
+        tried: List[str] = []
+        retry = self.retry_policy.start(deadline)
+        
+        while True:
+            backend = self._select_backend(model, tried)
             try:
-                response = await self.service_client.post(
-                    path,
-                    json=data,
-                    headers={"Content-Type": "application/json"},
-                    timeout=self.request_timeout
-                )
+                async with backend.track():
+                    response = await backend.client.post(
+                        path,
+                        json=data,
+                        headers={"Content-Type": "application/json"},
+                        timeout=retry.timeout(self.request_timeout)
+                    )
                 response.raise_for_status()
+                self.backend_pool.mark_success(backend, model)
                 return response.json()
                 
-            except httpx.HTTPStatusError as e:
-                self.logger.error(f"HTTP error (attempt {attempt + 1}): {e.response.status_code}")
-                if attempt == max_retries - 1:
-                    raise
-                    
-            except httpx.RequestError as e:
-                self.logger.error(f"Request error (attempt {attempt + 1}): {e}")
-                if attempt == max_retries - 1:
-                    raise
-                    
             except Exception as e:
-                self.logger.error(f"Unexpected error (attempt {attempt + 1}): {e}")
-                if attempt == max_retries - 1:
+                if isinstance(e, httpx.HTTPStatusError):
+                    self.logger.error(f"HTTP error from {backend.url} (attempt {retry.attempt + 1}): {e.response.status_code}")
+                else:
+                    self.logger.error(f"Request error from {backend.url} (attempt {retry.attempt + 1}): {e}")
+                if self._is_backend_fault(e):
+                    self.backend_pool.mark_failure(backend)
+                
+                tried.append(backend.url)
+                # 还有其他可用后端时立即转移，否则退避后重试
+                delay = retry.next_delay(e, failover=self.backend_pool.has_alternative(tried))
+                if delay is None:
                     raise
             
-            # 重试延迟
-            if attempt < max_retries - 1:
-                await asyncio.sleep(retry_delay * (attempt + 1))
+            if delay > 0:
+                await asyncio.sleep(delay)
+    
+    @staticmethod
+    def _expires_at(deadline: Optional[float]) -> Optional[float]:
+        """把相对截止时间换算为绝对时间，排队与请求共用同一个截止点"""
+        return time.monotonic() + deadline if deadline is not None else None
+    
+    @staticmethod
+    def _remaining(expires: Optional[float]) -> Optional[float]:
+        """距截止点的剩余时间（秒）"""
+        return max(0.0, expires - time.monotonic()) if expires is not None else None
+    
+    def _select_backend(self, model: Optional[str], exclude: List[str]) -> LLMBackend:
+        """为请求选择后端实例，后端池为空时使用主服务客户端"""
+        if not self.backend_pool.backends:
+            if self.service_client is None:
+                raise RuntimeError("服务客户端未初始化")
+            self.backend_pool.add_client(self.service_client, owned=False)
         
-        # 如果所有重试都失败了，抛出异常
-        raise RuntimeError(f"所有重试都失败了，无法完成请求到 {path}")
+        backend = self.backend_pool.select(model, exclude)
+        if backend is None:
+            raise RuntimeError("没有可用的LLM后端")
+        return backend
     
-    async def check_health(self) -> bool:
+    @staticmethod
+    def _is_backend_fault(e: Exception) -> bool:
+        """连接错误与5xx视为后端故障，4xx（如模型不存在）不计入"""
+        if isinstance(e, httpx.HTTPStatusError):
+            return e.response.status_code >= 500
+        return isinstance(e, httpx.RequestError)
+    
+    def _apply_keep_alive(self, data: Dict[str, Any]):
+        """记录模型流量，并按流量为请求设置 keep_alive（调用方显式指定时不覆盖）"""
+        model = data["model"]
+        self.keep_alive.record(model)
+        data.setdefault("keep_alive", self.keep_alive.keep_alive_for(model))
+    
+    async def warm_up_model(self, model: str) -> bool:
         """
-        检查LLM服务健康状态
+        预加载模型到显存
+        
+        发送不带提示词的 generate 请求，Ollama 会加载模型并按 keep_alive 保持常驻。
         
+        Args:
+            model: 模型名称
+            
         Returns:
-            bool: 是否健康
+            bool: 是否加载成功
         """
+        data = {
+            "model": model,
+            "keep_alive": self.keep_alive.keep_alive_for(model),
+            # 与常规请求使用相同的最小 num_ctx 档位，避免首个请求因参数不同而重载
+            "options": {"num_ctx": self.context_buckets[0]}
+        }
         try:
-            if not self.service_client:
-                return False
-                
-            response = await self.service_client.get("/api/tags", timeout=5.0)
-            return response.status_code == 200
+            start = time.perf_counter()
+            async with self.scheduler.slot(model, "background"):
+                await self._make_request("/api/generate", data)
+            self.logger.info(f"模型预加载完成: {model}，耗时 {time.perf_counter() - start:.2f}s")
+            return True
             
         except Exception as e:
-            self.logger.warning(f"Health check failed: {e}")
+            self.logger.warning(f"模型预加载失败 {model}: {e}")
             return False
     
+    async def warm_up_models(self) -> Dict[str, bool]:
+        """
+        预加载所有配置的模型
+        
+        Returns:
+            Dict[str, bool]: 模型 -> 是否加载成功
+        """
+        models = self.keep_alive.preload_models
+        results = await asyncio.gather(*(self.warm_up_model(m) for m in models))
+        return dict(zip(models, results))
+    
+    async def _ensure_pinned_models_resident(self):
+        """后端池刷新后，重新加载被换出的固定常驻模型"""
+        for model in self.keep_alive.preload_models:
+            if not self.backend_pool.is_resident(model):
+                self.logger.info(f"固定常驻模型 {model} 未加载，重新预加载")
+                await self.warm_up_model(model)
+    
+    async def get_resident_models(self, refresh: bool = False) -> Dict[str, Any]:
+        """
+        获取已加载（常驻显存）的模型
+        
+        Args:
+            refresh: 是否先通过 /api/ps 刷新
+            
+        Returns:
+            Dict[str, Any]: 各后端已加载的模型，以及各模型的流量与 keep_alive
+        """
+        if refresh:
+            await self.backend_pool.refresh_resident_models()
+        return {
+            "backends": self.backend_pool.resident_models(),
+            "models": self.keep_alive.get_status()
+        }
+    
+    def get_backend_status(self) -> List[Dict[str, Any]]:
+        """
+        获取各LLM后端的负载与常驻模型
+        
+        Returns:
+            List[Dict[str, Any]]: 后端状态列表
+        """
+        return self.backend_pool.get_status()
+    
+    async def check_health(self) -> bool:
+        """
+        检查LLM服务健康状态
+        
+        Returns:
+            bool: 是否健康
+        """
+        clients = [b.client for b in self.backend_pool.backends.values()]
+        if not clients and self.service_client:
+            clients = [self.service_client]
+        
+        # 任一后端可用即视为健康
+        for client in clients:
+            try:
+                response = await client.get("/api/tags", timeout=5.0)
+                if response.status_code == 200:
+                    return True
+                    
+            except Exception as e:
+                self.logger.warning(f"Health check failed for {client.base_url}: {e}")
+        
+        return False
+    
     async def reconnect(self):
         """重新连接LLM服务"""
         self.logger.info("重新连接LLM服务...")
@@ -285,6 +879,8 @@ class LLMProxy:
         try:
             if self.service_connector:
                 self.service_client = await self.service_connector.reconnect_service("llm_service")
+                self.backend_pool.add_client(self.service_client, owned=False)
+                await self.backend_pool.refresh_backends()
                 self.logger.info("✅ LLM服务重连成功")
             else:
                 await self.initialize()
@@ -298,6 +894,9 @@ class LLMProxy:
         self.logger.info("清理LLM代理资源...")
         
         try:
+            # 0. 停止后端池刷新并关闭其自有连接
+            await self.backend_pool.cleanup()
+            
             # 1. 先清理服务连接器（它会清理服务客户端）
             if self.service_connector:
                 await self.service_connector.cleanup()
@@ -325,6 +924,22 @@ class LLMProxy:
 
     # RAG相关方法
     async def summary_chat_message(self, messages: List[str], summary_type: Literal["daily", "weekly", "monthly", "yearly"]) -> str:
+        """
+        对聊天记录生成摘要（分层 map-reduce）
+        
+        1. 按token预算把全部消息切分成块
+        2. 在并发上限内并行摘要各块（map）
+        3. 把部分摘要再切块、摘要，递归直到只剩一份（reduce）
+        
+        已摘要过的块会被缓存，消息列表只是追加增长时，前面的块直接复用。
+        
+        Args:
+            messages: 聊天消息列表
+            summary_type: 摘要类型
+            
+        Returns:
+            str: 摘要文本；服务异常时返回备用摘要
+        """
         if summary_type not in ["daily", "weekly", "monthly", "yearly"]:
             raise ValueError("Invalid summary type. Must be one of: daily, weekly, monthly, yearly.")
         
@@ -337,88 +952,15 @@ class LLMProxy:
         type_text = type_map[summary_type]
         
         # 检查消息列表是否为空
+        messages = [msg for msg in messages if msg and msg.strip()]
         if not messages:
             raise ValueError("消息列表不能为空")
         
-        # 大幅减少消息长度以避免显存问题
-        max_msg_length = 4000  # 从2000减少到500
-        processed_messages = []
-        current_length = 0
-        
-        for msg in messages:
-            # 每条消息最多只取前200个字符
-            truncated_msg = msg[:200] + "..." if len(msg) > 200 else msg
-            if current_length + len(truncated_msg) > max_msg_length:
-                break
-            processed_messages.append(truncated_msg)
-            current_length += len(truncated_msg)
-        
-        if not processed_messages:
-            # 如果消息太长，只取第一条消息的前面部分
-            first_msg = messages[0][:100] if messages else ""
-            processed_messages = [first_msg + "..."] if first_msg else []
-            if not processed_messages:
-                raise ValueError("处理后的消息列表为空")
-        
-        # 极简化的提示词
-        summary_prompt = f"""请对以下聊天记录生成{type_text}摘要：
-
-            {chr(10).join(processed_messages[:5])}
-
-            要求：
-            1. 总结主要话题
-            2. 提取关键信息  
-            3. 控制在100字以内
-
-            摘要：
-        """
-        
         try:
-            self.logger.info(f"开始生成{type_text}摘要，消息数量: {len(processed_messages)}")
-            
-            # 使用较小的模型和优化参数
-            response = await self.chat(
-                summary_prompt, 
-                model="qwen2.5:3b",  # 使用更小的模型
-                num_predict=200,       # 限制生成长度
-                temperature=0.3        # 降低随机性
-            )
+            self.logger.info(f"开始生成{type_text}摘要，消息数量: {len(messages)}")
             
-            self.logger.debug(f"LLM原始响应: {response}")
+            summary = await self._map_reduce_summary(messages, type_text)
             
-            # 更严格的响应检查
-            if not response:
-                raise ValueError("LLM返回空响应")
-            
-            # 处理 Ollama 的响应格式
-            message_content = ""
-            
-            # Ollama 格式：直接从 message.content 获取
-            if "message" in response and isinstance(response["message"], dict):
-                message_content = response["message"].get("content", "")
-            
-            # 备用：检查是否有 response 字段（某些 Ollama 版本）
-            elif "response" in response:
-                message_content = response["response"]
-            
-            # 备用：检查 OpenAI 兼容格式
-            elif "choices" in response and response["choices"]:
-                choice = response["choices"][0]
-                if "message" in choice:
-                    message_content = choice["message"].get("content", "")
-                elif "text" in choice:
-                    message_content = choice["text"]
-            
-            # 最后的备用：直接查找可能的内容字段
-            elif "content" in response:
-                message_content = response["content"]
-            
-            if not message_content or not message_content.strip():
-                # 调试信息
-                self.logger.error(f"无法解析响应内容，响应结构: {list(response.keys())}")
-                raise ValueError(f"摘要内容为空，响应格式: {list(response.keys())}")
-                
-            summary = message_content.strip()
             self.logger.info(f"成功生成{type_text}摘要，长度: {len(summary)}")
             return summary
             
@@ -427,7 +969,7 @@ class LLMProxy:
             if e.response.status_code == 500:
                 error_msg += " - 服务器内部错误，可能是显存不足或模型加载失败"
             elif e.response.status_code == 404:
-                error_msg += f" - 模型 {self.default_model} 未找到"
+                error_msg += f" - 模型 {self.summary_model} 未找到"
             
             self.logger.error(error_msg)
             
@@ -442,6 +984,161 @@ class LLMProxy:
         except Exception as e:
             self.logger.error(f"生成{type_text}摘要失败: {e}")
             return f"由于技术问题无法生成摘要。包含 {len(messages)} 条消息的{type_text}对话记录。"
+    
+    async def _map_reduce_summary(self, messages: List[str], type_text: str) -> str:
+        """分层摘要：map 各块，再递归 reduce 部分摘要"""
+        budget = self.config.get("summary_chunk_tokens", 600)
+        chunks = self._chunk_texts(messages, budget)
+        level = 0
+        
+        while True:
+            final = len(chunks) == 1
+            self.logger.debug(f"摘要第 {level} 层: {len(chunks)} 块")
+            partials = await asyncio.gather(*(
+                self._summarize_chunk(chunk, type_text, level, final) for chunk in chunks
+            ))
+            if final:
+                return partials[0]
+            
+            next_chunks = self._chunk_texts(partials, budget)
+            if len(next_chunks) >= len(chunks):
+                # 部分摘要过长无法合并时，强制两两合并以保证收敛
+                next_chunks = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+            chunks = next_chunks
+            level += 1
+    
+    def _chunk_texts(self, texts: List[str], budget: int) -> List[List[str]]:
+        """
+        按token预算把文本顺序切块
+        
+        从头开始贪心装块，因此消息列表只在尾部追加时，前面已满的块保持不变，
+        其摘要可直接从缓存复用。超过预算的单条文本会被拆成多段。
+        """
+        chunks: List[List[str]] = []
+        current: List[str] = []
+        current_tokens = 0
+        
+        for text in texts:
+            for piece in self._split_to_budget(text, budget):
+                tokens = self.token_counter.count(piece)
+                if current and current_tokens + tokens > budget:
+                    chunks.append(current)
+                    current, current_tokens = [], 0
+                current.append(piece)
+                current_tokens += tokens
+        
+        if current:
+            chunks.append(current)
+        return chunks
+    
+    def _split_to_budget(self, text: str, budget: int) -> List[str]:
+        """把超出预算的单条文本按字符拆分"""
+        tokens = self.token_counter.count(text)
+        if tokens <= budget:
+            return [text]
+        piece_len = max(1, len(text) * budget // tokens)
+        return [text[i:i + piece_len] for i in range(0, len(text), piece_len)]
+    
+    async def _summarize_chunk(self, chunk: List[str], type_text: str, level: int, final: bool) -> str:
+        """摘要单个块，结果按块内容缓存"""
+        cache_key = hashlib.sha256(
+            json.dumps([type_text, level > 0, final, chunk], ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+        
+        cached = self._summary_chunk_cache.get(cache_key)
+        if cached is not None:
+            self._summary_chunk_cache.move_to_end(cache_key)
+            return cached
+        
+        content = "\n".join(chunk)
+        if final:
+            summary_prompt = f"""请对以下{'分段摘要' if level > 0 else '聊天记录'}生成{type_text}摘要：
+
+            {content}
+
+            要求：
+            1. 总结主要话题
+            2. 提取关键信息  
+            3. 控制在100字以内
+
+            摘要：
+            """
+        elif level == 0:
+            summary_prompt = f"""以下是{type_text}聊天记录的一部分，请提取要点：
+
+            {content}
+
+            要求：
+            1. 保留话题、结论和关键信息
+            2. 控制在150字以内
+
+            要点：
+            """
+        else:
+            summary_prompt = f"""以下是{type_text}聊天记录的若干分段摘要，请合并为一份：
+
+            {content}
+
+            要求：
+            1. 去除重复，保留关键信息
+            2. 控制在150字以内
+
+            合并摘要：
+            """
+        
+        async with self._summary_semaphore:
+            response = await self.chat(
+                summary_prompt,
+                model=self.summary_model,
+                priority="background", # 后台任务，不抢占交互请求
+                cache=True,            # 相同内容的摘要结果可复用
+                num_predict=200,       # 限制生成长度
+                temperature=0.3        # 降低随机性
+            )
+        
+        self.logger.debug(f"LLM原始响应: {response}")
+        summary = self._extract_content(response)
+        
+        self._summary_chunk_cache[cache_key] = summary
+        while len(self._summary_chunk_cache) > self.config.get("summary_cache_size", 1024):
+            self._summary_chunk_cache.popitem(last=False)
+        return summary
+    
+    def _extract_content(self, response: Dict[str, Any]) -> str:
+        """从LLM响应中提取文本内容"""
+        # 更严格的响应检查
+        if not response:
+            raise ValueError("LLM返回空响应")
+        
+        # 处理 Ollama 的响应格式
+        message_content = ""
+        
+        # Ollama 格式：直接从 message.content 获取
+        if "message" in response and isinstance(response["message"], dict):
+            message_content = response["message"].get("content", "")
+        
+        # 备用：检查是否有 response 字段（某些 Ollama 版本）
+        elif "response" in response:
+            message_content = response["response"]
+        
+        # 备用：检查 OpenAI 兼容格式
+        elif "choices" in response and response["choices"]:
+            choice = response["choices"][0]
+            if "message" in choice:
+                message_content = choice["message"].get("content", "")
+            elif "text" in choice:
+                message_content = choice["text"]
+        
+        # 最后的备用：直接查找可能的内容字段
+        elif "content" in response:
+            message_content = response["content"]
+        
+        if not message_content or not message_content.strip():
+            # 调试信息
+            self.logger.error(f"无法解析响应内容，响应结构: {list(response.keys())}")
+            raise ValueError(f"摘要内容为空，响应格式: {list(response.keys())}")
+            
+        return message_content.strip()
 
 # 便捷函数
 async def create_llm_proxy(config_path: Optional[str] = None) -> LLMProxy:
@@ -0,0 +1,100 @@
+"""
+模型常驻管理
+
+根据配置与近期流量为每个模型决定 Ollama 的 ``keep_alive``：
+- 预加载（固定常驻）的模型使用较长的 keep_alive
+- 近期请求频繁的模型保持较长时间
+- 偶尔使用的模型（如摘要任务临时切换的模型）用完即尽快释放，
+  避免把聊天模型挤出显存
+"""
+
+import time
+from collections import deque
+from typing import Dict, Any, Optional, List, Union, Deque
+from logging import Logger
+
+
+KeepAlive = Union[str, int]
+
+
+class ModelKeepAliveManager:
+    """按模型管理 keep_alive 与预加载列表"""
+
+    def __init__(self, logger: Logger, config: Optional[Dict[str, Any]] = None,
+                 default_model: Optional[str] = None):
+        """
+        初始化常驻管理器
+
+        Args:
+            logger: 日志记录器
+            config: 配置
+            default_model: 默认模型，未配置预加载列表时固定常驻该模型
+        """
+        self.logger = logger
+        config = config or {}
+
+        preload = config.get("preload_models")
+        if preload is None:
+            preload = [default_model] if default_model else []
+        self.preload_models: List[str] = list(preload)
+
+        self.pinned_keep_alive: KeepAlive = config.get("pinned_keep_alive", "30m")
+        self.hot_keep_alive: KeepAlive = config.get("hot_keep_alive", "10m")
+        self.cold_keep_alive: KeepAlive = config.get("cold_keep_alive", "1m")
+        self.traffic_window: float = config.get("traffic_window", 600.0)
+        self.hot_threshold: int = config.get("hot_threshold", 3)
+
+        # model -> 近期请求时间戳
+        self._traffic: Dict[str, Deque[float]] = {}
+
+    def record(self, model: str):
+        """记录一次发往后端的请求"""
+        now = time.monotonic()
+        history = self._traffic.setdefault(model, deque())
+        history.append(now)
+        self._trim(history, now)
+
+    def _trim(self, history: Deque[float], now: float):
+        while history and now - history[0] > self.traffic_window:
+            history.popleft()
+
+    def recent_requests(self, model: str) -> int:
+        """窗口期内的请求数"""
+        history = self._traffic.get(model)
+        if not history:
+            return 0
+        self._trim(history, time.monotonic())
+        return len(history)
+
+    def keep_alive_for(self, model: str) -> KeepAlive:
+        """
+        计算模型的 keep_alive
+
+        Args:
+            model: 模型名称
+
+        Returns:
+            KeepAlive: Ollama 接受的 keep_alive 值
+        """
+        if model in self.preload_models:
+            return self.pinned_keep_alive
+        if self.recent_requests(model) >= self.hot_threshold:
+            return self.hot_keep_alive
+        return self.cold_keep_alive
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        获取各模型的流量与 keep_alive
+
+        Returns:
+            Dict[str, Any]: model -> {recent_requests, keep_alive, pinned}
+        """
+        models = set(self._traffic) | set(self.preload_models)
+        return {
+            model: {
+                "recent_requests": self.recent_requests(model),
+                "keep_alive": self.keep_alive_for(model),
+                "pinned": model in self.preload_models
+            }
+            for model in sorted(models)
+        }
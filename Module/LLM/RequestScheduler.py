@@ -0,0 +1,247 @@
+"""
+LLM请求调度器
+
+在 LLMProxy 内部协调所有发往LLM后端的请求：
+- 按模型限制并发数
+- 优先级队列（interactive > background）
+- 排队超时（queue-time deadline）
+- 同一优先级内按用户轮转，保证公平
+- 队列指标
+"""
+
+import time
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, Literal, Deque, AsyncIterator
+from logging import Logger
+
+
+Priority = Literal["interactive", "background"]
+
+# 数值越小优先级越高
+PRIORITY_LEVELS: Dict[str, int] = {
+    "interactive": 0,
+    "background": 1
+}
+
+
+class SchedulerTimeoutError(TimeoutError):
+    """请求在队列中等待超过截止时间"""
+    def __init__(self, model: str, priority: str, waited: float):
+        self.model = model
+        self.priority = priority
+        self.waited = waited
+        super().__init__(f"LLM request for model '{model}' ({priority}) timed out in queue after {waited:.2f}s")
+
+
+class _ModelQueue:
+    """单个模型的并发状态与等待队列"""
+
+    def __init__(self, base_limit: int):
+        self.base_limit = base_limit
+        self.limit = base_limit
+        self.active = 0
+        # priority -> user -> 等待者队列；OrderedDict 的顺序即用户轮转顺序
+        self.waiters: Dict[int, OrderedDict[str, Deque[asyncio.Future]]] = {
+            level: OrderedDict() for level in sorted(PRIORITY_LEVELS.values())
+        }
+
+    def queued(self, level: Optional[int] = None) -> int:
+        levels = [level] if level is not None else list(self.waiters)
+        return sum(
+            1
+            for lv in levels
+            for queue in self.waiters[lv].values()
+            for fut in queue if not fut.done()
+        )
+
+
+class LLMRequestScheduler:
+    """
+    LLM请求调度器
+
+    用法：
+        async with scheduler.slot(model, priority="background", user="alice"):
+            ...  # 发起请求
+    """
+
+    def __init__(self, logger: Logger, config: Optional[Dict[str, Any]] = None):
+        """
+        初始化调度器
+
+        Args:
+            logger: 日志记录器
+            config: 调度配置
+        """
+        self.logger = logger
+        config = config or {}
+
+        self.default_concurrency: int = config.get("max_concurrency_per_model", 2)
+        self.model_concurrency: Dict[str, int] = config.get("model_concurrency", {})
+        self.queue_deadlines: Dict[str, float] = {
+            "interactive": 30.0,
+            "background": 600.0,
+            **config.get("queue_deadlines", {})
+        }
+
+        self._queues: Dict[str, _ModelQueue] = {}
+
+        # 后端实例数，各模型并发上限按实例数线性扩展
+        self.backend_count = 1
+
+        # 统计
+        self._stats: Dict[str, Dict[str, Any]] = {
+            priority: {"granted": 0, "timeouts": 0, "total_wait": 0.0, "max_wait": 0.0}
+            for priority in PRIORITY_LEVELS
+        }
+
+    def _get_queue(self, model: str) -> _ModelQueue:
+        queue = self._queues.get(model)
+        if queue is None:
+            limit = self.model_concurrency.get(model, self.default_concurrency)
+            queue = self._queues[model] = _ModelQueue(max(1, limit))
+            queue.limit = queue.base_limit * self.backend_count
+        return queue
+
+    def set_backend_count(self, count: int):
+        """
+        更新后端实例数，并按新的并发上限唤醒等待者
+
+        Args:
+            count: 可用后端实例数
+        """
+        self.backend_count = max(1, count)
+        for queue in self._queues.values():
+            queue.limit = queue.base_limit * self.backend_count
+            self._dispatch(queue)
+
+    @asynccontextmanager
+    async def slot(self, model: str, priority: Priority = "interactive", user: str = "default",
+                   deadline: Optional[float] = None) -> AsyncIterator[None]:
+        """
+        获取指定模型的执行槽位
+
+        Args:
+            model: 模型名称
+            priority: 优先级类别
+            user: 用户标识，用于同优先级内的公平轮转
+            deadline: 最长排队时间（秒），默认使用该优先级的配置
+
+        Raises:
+            SchedulerTimeoutError: 排队超过截止时间
+        """
+        if priority not in PRIORITY_LEVELS:
+            raise ValueError(f"Invalid priority '{priority}'. Must be one of: {list(PRIORITY_LEVELS)}")
+
+        await self._acquire(model, priority, user, deadline)
+        try:
+            yield
+        finally:
+            self._release(model)
+
+    async def _acquire(self, model: str, priority: str, user: str, deadline: Optional[float]):
+        queue = self._get_queue(model)
+        level = PRIORITY_LEVELS[priority]
+        stats = self._stats[priority]
+        start = time.perf_counter()
+
+        # 有空闲槽位且无人排队时直接执行
+        if queue.active < queue.limit and queue.queued() == 0:
+            queue.active += 1
+            stats["granted"] += 1
+            return
+
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        queue.waiters[level].setdefault(user, deque()).append(fut)
+
+        timeout = deadline if deadline is not None else self.queue_deadlines.get(priority)
+        try:
+            await asyncio.wait_for(fut, timeout=timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            # 槽位恰好在超时/取消时被分配，需要归还
+            if fut.done() and not fut.cancelled():
+                self._release(model)
+            if isinstance(e, asyncio.TimeoutError):
+                waited = time.perf_counter() - start
+                stats["timeouts"] += 1
+                self.logger.warning(f"LLM请求排队超时: model={model}, priority={priority}, user={user}, waited={waited:.2f}s")
+                raise SchedulerTimeoutError(model, priority, waited) from None
+            raise
+        finally:
+            self._prune(queue, level, user)
+
+        waited = time.perf_counter() - start
+        stats["granted"] += 1
+        stats["total_wait"] += waited
+        stats["max_wait"] = max(stats["max_wait"], waited)
+
+    def _release(self, model: str):
+        queue = self._get_queue(model)
+        queue.active -= 1
+        self._dispatch(queue)
+
+    def _dispatch(self, queue: _ModelQueue):
+        """按优先级、用户轮转的顺序把空闲槽位分配给等待者"""
+        while queue.active < queue.limit:
+            fut = self._next_waiter(queue)
+            if fut is None:
+                return
+            queue.active += 1
+            fut.set_result(None)
+
+    @staticmethod
+    def _next_waiter(queue: _ModelQueue) -> Optional[asyncio.Future]:
+        for users in queue.waiters.values():
+            while users:
+                user, waiters = next(iter(users.items()))
+                while waiters and waiters[0].done():
+                    waiters.popleft()
+                if not waiters:
+                    del users[user]
+                    continue
+                fut = waiters.popleft()
+                # 该用户移到队尾，下一个槽位给其他用户
+                users.move_to_end(user)
+                if not waiters:
+                    del users[user]
+                return fut
+        return None
+
+    @staticmethod
+    def _prune(queue: _ModelQueue, level: int, user: str):
+        waiters = queue.waiters[level].get(user)
+        if waiters is None:
+            return
+        while waiters and waiters[0].done():
+            waiters.popleft()
+        if not waiters:
+            del queue.waiters[level][user]
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        获取队列指标
+
+        Returns:
+            Dict[str, Any]: 各模型的并发与排队情况，以及各优先级的等待统计
+        """
+        models = {
+            model: {
+                "limit": queue.limit,
+                "active": queue.active,
+                "queued": {
+                    priority: queue.queued(level) for priority, level in PRIORITY_LEVELS.items()
+                }
+            }
+            for model, queue in self._queues.items()
+        }
+        priorities = {
+            priority: {
+                "granted": stats["granted"],
+                "timeouts": stats["timeouts"],
+                "avg_wait": stats["total_wait"] / stats["granted"] if stats["granted"] else 0.0,
+                "max_wait": stats["max_wait"]
+            }
+            for priority, stats in self._stats.items()
+        }
+        return {"models": models, "priorities": priorities}
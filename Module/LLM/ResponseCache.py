@@ -0,0 +1,304 @@
+"""
+LLM响应缓存
+
+为 LLMProxy 中显式开启缓存的确定性请求（关键词提取、摘要、提示词修正等）提供响应缓存：
+- 内存 LRU
+- 可选的磁盘存储（TTL + 总字节数上限淘汰）
+- 按归一化提示词键存储，每个响应只存一份；同时记录写入时的精确键，用于区分精确命中与归一化命中
+- 命中率统计
+"""
+
+import os
+import re
+import json
+import copy
+import time
+import asyncio
+import hashlib
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+from logging import Logger
+
+
+class LLMResponseCache:
+    """
+    LLM响应缓存
+
+    键由 (model, messages/prompt, options) 计算得到。缓存由调用方按请求显式开启，
+    且只有确定性的请求（低温度或固定seed）才会被缓存，避免把随机采样的结果固化下来。
+    普通对话的答案可能随时间变化（如“今天天气怎么样”），不应使用缓存。
+    """
+
+    def __init__(self, logger: Logger, config: Optional[Dict[str, Any]] = None):
+        """
+        初始化响应缓存
+
+        Args:
+            logger: 日志记录器
+            config: 缓存配置
+        """
+        self.logger = logger
+        config = config or {}
+
+        self.enabled: bool = config.get("enabled", True)
+        self.max_entries: int = config.get("max_entries", 512)
+        self.max_temperature: float = config.get("max_temperature", 0.3)
+        self.ttl: float = config.get("ttl", 24 * 3600)
+        self.max_disk_bytes: int = config.get("max_disk_bytes", 256 * 1024 * 1024)
+
+        disk_dir = config.get("disk_dir")
+        self.disk_dir: Optional[str] = os.path.expandvars(disk_dir) if disk_dir else None
+
+        # 内存 LRU: 归一化键 -> (写入时的精确键, response)
+        self._memory: OrderedDict[str, Tuple[str, Dict[str, Any]]] = OrderedDict()
+
+        # 磁盘索引: key -> (size, mtime)
+        self._disk_index: Dict[str, Tuple[int, float]] = {}
+        self._disk_bytes = 0
+        self._disk_lock = asyncio.Lock()
+
+        # 统计
+        self.hits = 0
+        self.normalized_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.skipped = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._load_disk_index()
+
+    # ------------------------------------------------------------------
+    # 键计算
+    # ------------------------------------------------------------------
+    def is_cacheable(self, data: Dict[str, Any]) -> bool:
+        """判断请求是否为确定性请求"""
+        if not self.enabled or data.get("stream"):
+            return False
+
+        # chat 请求参数在 options 中，generate 请求参数可能在顶层
+        options = data.get("options") or {}
+        if "seed" in options or "seed" in data:
+            return True
+
+        temperature = options.get("temperature", data.get("temperature"))
+        return temperature is not None and temperature <= self.max_temperature
+
+    @staticmethod
+    def _normalize_text(text: str) -> str:
+        """归一化提示词：NFKC（全角转半角）、去除首尾空白、合并连续空白"""
+        text = unicodedata.normalize("NFKC", text)
+        return re.sub(r"\s+", " ", text).strip()
+
+    @staticmethod
+    def _digest(payload: Dict[str, Any]) -> str:
+        raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def make_keys(self, data: Dict[str, Any]) -> Tuple[str, str]:
+        """
+        计算精确键与归一化键
+
+        Args:
+            data: 发往 Ollama 的请求体
+
+        Returns:
+            Tuple[str, str]: (精确键, 归一化键)
+        """
+        payload = {k: v for k, v in data.items() if k not in ("stream", "keep_alive")}
+        exact_key = self._digest(payload)
+
+        normalized = dict(payload)
+        if "messages" in normalized:
+            normalized["messages"] = [
+                {**m, "content": self._normalize_text(m.get("content", ""))}
+                for m in normalized["messages"]
+            ]
+        if "prompt" in normalized:
+            normalized["prompt"] = self._normalize_text(normalized["prompt"])
+        normalized_key = "n-" + self._digest(normalized)
+
+        return exact_key, normalized_key
+
+    # ------------------------------------------------------------------
+    # 读写
+    # ------------------------------------------------------------------
+    async def get(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        查询缓存
+
+        Args:
+            data: 请求体
+
+        Returns:
+            Optional[Dict[str, Any]]: 命中时返回缓存的响应，否则返回None
+        """
+        if not self.is_cacheable(data):
+            self.skipped += 1
+            return None
+
+        exact_key, normalized_key = self.make_keys(data)
+
+        entry = self._memory.get(normalized_key)
+        if entry is not None:
+            self._memory.move_to_end(normalized_key)
+        elif self.disk_dir:
+            entry = await self._disk_get(normalized_key)
+            if entry is not None:
+                self._memory_put(normalized_key, entry)
+                self.disk_hits += 1
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        stored_key, response = entry
+        self.hits += 1
+        if stored_key != exact_key:
+            self.normalized_hits += 1
+        return copy.deepcopy(response)
+
+    async def put(self, data: Dict[str, Any], response: Dict[str, Any]):
+        """
+        写入缓存
+
+        Args:
+            data: 请求体
+            response: LLM响应
+        """
+        if not self.is_cacheable(data):
+            return
+
+        # 只按归一化键存一份（它同样覆盖精确匹配），保存副本，调用方之后修改响应对象不影响缓存
+        exact_key, normalized_key = self.make_keys(data)
+        entry = (exact_key, copy.deepcopy(response))
+        self._memory_put(normalized_key, entry)
+        if self.disk_dir:
+            await self._disk_put(normalized_key, entry)
+
+    def _memory_put(self, key: str, entry: Tuple[str, Dict[str, Any]]):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # 磁盘存储
+    # ------------------------------------------------------------------
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir or "", f"{key}.json")
+
+    def _load_disk_index(self):
+        """启动时扫描磁盘缓存目录，重建索引并清理过期条目"""
+        now = time.time()
+        for entry in os.scandir(self.disk_dir):
+            if not entry.is_file() or not entry.name.endswith(".json"):
+                continue
+            stat = entry.stat()
+            # 旧版本按精确键写入的文件（不带 "n-" 前缀）不会再被查找
+            if now - stat.st_mtime > self.ttl or not entry.name.startswith("n-"):
+                self._remove_file(entry.path)
+                continue
+            self._disk_index[entry.name[:-5]] = (stat.st_size, stat.st_mtime)
+            self._disk_bytes += stat.st_size
+        self.logger.info(f"LLM响应磁盘缓存已加载: {len(self._disk_index)} 条, {self._disk_bytes} 字节")
+
+    def _remove_file(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.logger.warning(f"删除缓存文件失败 {path}: {e}")
+
+    def _drop_disk_entry(self, key: str):
+        size, _ = self._disk_index.pop(key, (0, 0.0))
+        self._disk_bytes -= size
+        self._remove_file(self._disk_path(key))
+
+    async def _disk_get(self, key: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        entry = self._disk_index.get(key)
+        if entry is None:
+            return None
+
+        if time.time() - entry[1] > self.ttl:
+            async with self._disk_lock:
+                await asyncio.to_thread(self._drop_disk_entry, key)
+            return None
+
+        def _read() -> Optional[Tuple[str, Dict[str, Any]]]:
+            try:
+                with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                    stored = json.load(f)
+                return stored["key"], stored["response"]
+            except (OSError, ValueError, KeyError, TypeError):
+                return None
+
+        entry = await asyncio.to_thread(_read)
+        if entry is None:
+            async with self._disk_lock:
+                self._drop_disk_entry(key)
+        return entry
+
+    async def _disk_put(self, key: str, entry: Tuple[str, Dict[str, Any]]):
+        exact_key, response = entry
+        raw = json.dumps({"key": exact_key, "response": response}, ensure_ascii=False).encode("utf-8")
+        if len(raw) > self.max_disk_bytes:
+            return
+
+        def _write():
+            path = self._disk_path(key)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(raw)
+            os.replace(tmp_path, path)
+
+        async with self._disk_lock:
+            try:
+                await asyncio.to_thread(_write)
+            except OSError as e:
+                self.logger.warning(f"写入LLM响应磁盘缓存失败: {e}")
+                return
+
+            old_size, _ = self._disk_index.get(key, (0, 0.0))
+            self._disk_index[key] = (len(raw), time.time())
+            self._disk_bytes += len(raw) - old_size
+
+            # 超出容量时按写入时间从旧到新淘汰
+            if self._disk_bytes > self.max_disk_bytes:
+                for old_key, _ in sorted(self._disk_index.items(), key=lambda item: item[1][1]):
+                    if self._disk_bytes <= self.max_disk_bytes:
+                        break
+                    if old_key != key:
+                        self._drop_disk_entry(old_key)
+
+    # ------------------------------------------------------------------
+    # 统计
+    # ------------------------------------------------------------------
+    def clear(self):
+        """清空内存与磁盘缓存"""
+        self._memory.clear()
+        for key in list(self._disk_index):
+            self._drop_disk_entry(key)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+
+        Returns:
+            Dict[str, Any]: 命中数、未命中数、命中率与容量信息
+        """
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "normalized_hits": self.normalized_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_entries": len(self._disk_index),
+            "disk_bytes": self._disk_bytes
+        }
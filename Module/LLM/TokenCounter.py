@@ -0,0 +1,171 @@
+"""
+Token计数
+
+为 LLMProxy 提供按token计算的提示词预算：
+- 优先使用本地分词器（transformers，可选依赖）精确计数
+- 未安装或未配置分词器时，退化为区分中日韩字符的快速估算
+- 按消息内容缓存计数结果
+- 按精确预算截断文本
+"""
+
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List
+from logging import Logger
+
+
+class TokenCounter:
+    """
+    Token计数器
+
+    中文与英文每个字符对应的token数相差很大，按字符截断要么溢出上下文，
+    要么浪费上下文，因此预算统一按token计算。
+    """
+
+    # 每条 chat 消息的格式开销（角色标记等）
+    MESSAGE_OVERHEAD = 4
+
+    def __init__(self, logger: Logger, config: Optional[Dict[str, Any]] = None):
+        """
+        初始化计数器
+
+        Args:
+            logger: 日志记录器
+            config: 配置，``tokenizer`` 为 HuggingFace 分词器名称或本地路径
+        """
+        self.logger = logger
+        config = config or {}
+
+        self.cache_size: int = config.get("count_cache_size", 4096)
+        self._cache: OrderedDict[str, int] = OrderedDict()
+
+        self.tokenizer = None
+        tokenizer_name = config.get("tokenizer")
+        if tokenizer_name:
+            self.tokenizer = self._load_tokenizer(tokenizer_name)
+
+    def _load_tokenizer(self, name: str):
+        try:
+            from transformers import AutoTokenizer
+        except ImportError:
+            self.logger.warning("未安装 transformers，token计数使用近似估算")
+            return None
+
+        try:
+            tokenizer = AutoTokenizer.from_pretrained(name)
+            self.logger.info(f"已加载分词器: {name}")
+            return tokenizer
+        except Exception as e:
+            self.logger.warning(f"加载分词器 {name} 失败，token计数使用近似估算: {e}")
+            return None
+
+    @property
+    def exact(self) -> bool:
+        """是否为精确计数"""
+        return self.tokenizer is not None
+
+    @staticmethod
+    def approximate(text: str) -> int:
+        """快速估算：中日韩字符约1字1token，其他字符约4字符1token"""
+        cjk = sum(
+            1 for ch in text
+            if '\u3000' <= ch <= '\u9fff' or '\uac00' <= ch <= '\ud7af' or '\uff00' <= ch <= '\uffef'
+        )
+        return cjk + (len(text) - cjk + 3) // 4
+
+    def count(self, text: str) -> int:
+        """
+        计算文本的token数（带缓存）
+
+        Args:
+            text: 文本
+
+        Returns:
+            int: token数
+        """
+        if not text:
+            return 0
+
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
+        if self.tokenizer is not None:
+            tokens = len(self.tokenizer.encode(text, add_special_tokens=False))
+        else:
+            tokens = self.approximate(text)
+
+        self._cache[key] = tokens
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return tokens
+
+    def count_messages(self, messages: List[Dict[str, Any]]) -> int:
+        """
+        计算 chat 消息列表的token数
+
+        Args:
+            messages: Ollama chat 格式的消息列表
+
+        Returns:
+            int: token数
+        """
+        return sum(self.count(m.get("content", "")) + self.MESSAGE_OVERHEAD for m in messages)
+
+    def truncate(self, text: str, budget: int, marker: str = "\n...\n") -> str:
+        """
+        把文本截断到token预算以内，保留开头与结尾、省略中间
+
+        提示词的指令通常位于开头或结尾，因此从中间删减。
+
+        Args:
+            text: 文本
+            budget: token预算
+            marker: 省略位置的标记
+
+        Returns:
+            str: 截断后的文本
+        """
+        if budget <= 0:
+            return ""
+        if self.count(text) <= budget:
+            return text
+
+        remaining = budget - self.count(marker)
+        if remaining <= 0:
+            return self._truncate_head(text, budget)
+
+        head = self._truncate_head(text, remaining - remaining // 2)
+        tail = self._truncate_tail(text, remaining // 2)
+        return head + marker + tail
+
+    def _truncate_head(self, text: str, budget: int) -> str:
+        """保留开头不超过 budget 个token"""
+        if self.tokenizer is not None:
+            ids = self.tokenizer.encode(text, add_special_tokens=False)[:budget]
+            return self.tokenizer.decode(ids)
+        return text[:self._fit_length(text, budget, from_end=False)]
+
+    def _truncate_tail(self, text: str, budget: int) -> str:
+        """保留结尾不超过 budget 个token"""
+        if budget <= 0:
+            return ""
+        if self.tokenizer is not None:
+            ids = self.tokenizer.encode(text, add_special_tokens=False)[-budget:]
+            return self.tokenizer.decode(ids)
+        length = self._fit_length(text, budget, from_end=True)
+        return text[len(text) - length:]
+
+    def _fit_length(self, text: str, budget: int, from_end: bool) -> int:
+        """二分查找估算token数不超过预算的最长前缀/后缀长度"""
+        low, high = 0, len(text)
+        while low < high:
+            mid = (low + high + 1) // 2
+            piece = text[len(text) - mid:] if from_end else text[:mid]
+            if self.approximate(piece) <= budget:
+                low = mid
+            else:
+                high = mid - 1
+        return low
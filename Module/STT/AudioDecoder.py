@@ -0,0 +1,166 @@
+"""
+STT服务端的音频解码
+
+客户端上传的几乎都是 16kHz 单声道 PCM WAV，用 torchaudio.load 完整解码一遍并按声道求均值
+对这类数据是多余的开销。AudioDecoder：
+- 快速路径：直接解析WAV头，用 np.frombuffer 零拷贝地读取PCM样本，只做一次到 float32 的转换
+- 其他格式（或非常见的样本格式）回退到 torchaudio 完整解码
+- 采样率与模型不一致时重采样，Resample 对象按源采样率缓存复用
+"""
+
+import threading
+from io import BytesIO
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from Module.Utils.WavUtils import parse_wav_header
+
+
+# WAVE_FORMAT_EXTENSIBLE：样本格式记录在扩展字段中，常见于多声道或24位音频
+_FORMAT_EXTENSIBLE = 0xFFFE
+
+# (格式, 位深) -> (样本类型, 归一化系数)
+_PCM_DTYPES = {
+    (1, 8): (np.dtype(np.uint8), None),
+    (1, 16): (np.dtype("<i2"), 1 / 32768.0),
+    (1, 32): (np.dtype("<i4"), 1 / 2147483648.0),
+    (3, 32): (np.dtype("<f4"), None),
+}
+
+
+class AudioDecoder:
+    """
+    把上传的音频解码为单声道 float32 张量（取值范围 [-1, 1]），并重采样到模型采样率
+    """
+
+    def __init__(self, target_rate: Optional[int] = 16000):
+        """
+        初始化解码器
+
+        Args:
+            target_rate: 模型采样率，None 表示保持原采样率
+        """
+        self.target_rate = target_rate
+        self._resamplers: Dict[int, object] = {}
+        self._lock = threading.Lock()
+
+        self.fast_decodes = 0
+        self.fallback_decodes = 0
+        self.resampled = 0
+
+    def decode(self, data: bytes) -> Tuple["torch.Tensor", int]:
+        """
+        解码音频
+
+        Args:
+            data: 音频文件数据
+
+        Returns:
+            Tuple[torch.Tensor, int]: (单声道 float32 张量, 采样率)
+        """
+        import torch
+
+        samples = self._decode_pcm_wav(data)
+        if samples is not None:
+            self.fast_decodes += 1
+            audio, rate = samples
+            waveform = torch.from_numpy(audio)
+        else:
+            import torchaudio
+
+            self.fallback_decodes += 1
+            waveform, rate = torchaudio.load(BytesIO(data))
+            waveform = waveform.mean(0)
+
+        if self.target_rate is not None and rate != self.target_rate:
+            waveform = self._resampler(rate)(waveform)
+            rate = self.target_rate
+            self.resampled += 1
+        return waveform, rate
+
+    @staticmethod
+    def _decode_pcm_wav(data: bytes) -> Optional[Tuple[np.ndarray, int]]:
+        """
+        快速路径：解析WAV头并直接读取PCM
+
+        Returns:
+            Optional[Tuple[np.ndarray, int]]: (单声道 float32 样本, 采样率)；不是支持的PCM WAV时返回None
+        """
+        try:
+            parsed = parse_wav_header(data)
+        except ValueError:
+            return None
+        if parsed is None:
+            return None
+        fmt, offset = parsed
+
+        audio_format = fmt.audio_format
+        if audio_format == _FORMAT_EXTENSIBLE:
+            audio_format = _extensible_subformat(data, offset)
+        dtype, scale = _PCM_DTYPES.get((audio_format, fmt.bits_per_sample), (None, None))
+        if dtype is None or fmt.channels < 1:
+            return None
+
+        # 流式写出的WAV头中data长度可能是0或占位值，以实际数据为准，并舍去末尾不完整的帧
+        declared = int.from_bytes(data[offset - 4:offset], "little")
+        end = len(data) if declared in (0, 0xFFFFFFFF) else min(len(data), offset + declared)
+        frame_bytes = fmt.block_align
+        end -= (end - offset) % frame_bytes
+
+        # 零拷贝地读取PCM样本
+        pcm = np.frombuffer(memoryview(data)[offset:end], dtype=dtype)
+        if fmt.channels > 1:
+            pcm = pcm.reshape(-1, fmt.channels)
+
+        if dtype == np.uint8:
+            audio = (pcm.astype(np.float32) - 128.0) * (1 / 128.0)
+        elif scale is not None:
+            audio = np.multiply(pcm, scale, dtype=np.float32)
+        else:
+            audio = pcm.astype(np.float32)
+        if fmt.channels > 1:
+            audio = audio.mean(axis=1, dtype=np.float32)
+        return audio, fmt.sample_rate
+
+    def _resampler(self, rate: int):
+        """获取（或创建）从 rate 到目标采样率的重采样器"""
+        resampler = self._resamplers.get(rate)
+        if resampler is None:
+            import torchaudio
+
+            with self._lock:
+                resampler = self._resamplers.get(rate)
+                if resampler is None:
+                    resampler = torchaudio.transforms.Resample(orig_freq=rate, new_freq=self.target_rate)
+                    self._resamplers[rate] = resampler
+        return resampler
+
+    def get_metrics(self) -> Dict[str, int]:
+        """
+        获取解码统计
+
+        Returns:
+            Dict[str, int]: 快速路径与回退解码次数、重采样次数与缓存的重采样器数量
+        """
+        return {
+            "fast_decodes": self.fast_decodes,
+            "fallback_decodes": self.fallback_decodes,
+            "resampled": self.resampled,
+            "cached_resamplers": len(self._resamplers)
+        }
+
+
+def _extensible_subformat(data: bytes, data_offset: int) -> int:
+    """读取 WAVE_FORMAT_EXTENSIBLE 的子格式（GUID的前两个字节），无法识别时返回0"""
+    pos = 12
+    while pos + 8 <= data_offset:
+        chunk_id = data[pos:pos + 4]
+        size = int.from_bytes(data[pos + 4:pos + 8], "little")
+        if chunk_id == b"fmt ":
+            # fmt 块：16字节基本字段 + cbSize(2) + validBits(2) + channelMask(4) + SubFormat GUID
+            if size >= 40:
+                return int.from_bytes(data[pos + 8 + 24:pos + 8 + 26], "little")
+            return 0
+        pos += 8 + size + (size & 1)
+    return 0
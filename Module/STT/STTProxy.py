@@ -5,15 +5,17 @@ STT服务代理
 替代原来的SenseVoiceAgent FastAPI服务。
 """
 
-from email.policy import default
 import os
 import asyncio
 import httpx
-from typing import Dict, Any, Optional, Union, List
+import aiofiles
+from typing import Dict, Any, Optional, Union, List, Tuple
 from logging import Logger
 
 from Module.Utils.Logger import setup_logger
 from Module.Utils.ConfigTools import load_config
+from Module.Utils.RetryPolicy import RetryPolicy, is_retryable
+from Module.STT.SilenceTrimmer import SilenceTrimmer
 from Init.ServiceDiscovery import ServiceDiscoveryManager, ExternalServiceConnector
 
 
@@ -50,6 +52,16 @@ class STTProxy:
             ".wav", ".mp3", ".m4a", ".flac", ".aac"
         ])
         
+        # 重试策略：错误分类、指数退避与进程级重试预算
+        self.retry_policy = RetryPolicy(self.logger, "stt", {
+            "max_attempts": self.config.get("max_retries", 3),
+            "base_delay": self.config.get("retry_delay", 2.0),
+            **self.config.get("retry", {})
+        })
+        
+        # 上传前裁剪首尾静音，减少上传与推理的数据量
+        self.trimmer = SilenceTrimmer(self.config.get("silence_trim", {}))
+        
         self.logger.info("STTProxy initialized")
     
     def _load_config(self, config_path: Optional[str]) -> Dict:
@@ -66,8 +78,26 @@ class STTProxy:
             "request_timeout": 30.0,
             "max_retries": 3,
             "retry_delay": 2.0,
+            "retry": {
+                "max_delay": 8.0,
+                "deadline": None,
+                "budget_ratio": 0.1,
+                "budget_min_retries": 10,
+                "budget_window": 10.0
+            },
             "supported_formats": [".wav", ".mp3", ".m4a", ".flac", ".aac"],
-            "max_file_size": 100 * 1024 * 1024  # 100MB
+            "max_file_size": 100 * 1024 * 1024,  # 100MB
+            "silence_trim": {
+                "enabled": False,                # 默认不裁剪，按需开启
+                "threshold_db": -45.0,           # 低于该能量（dBFS）的帧视为静音
+                "frame_ms": 20,
+                "padding_ms": 300                # 语音两端保留的余量
+            },
+            "batch": {
+                "max_files": 8,                  # 单次 /predict/sentences 请求的音频数
+                "max_bytes": 20 * 1024 * 1024,   # 单次请求的音频总字节数
+                "concurrency": 4                 # 同时进行的批量请求数
+            }
         }
         return default_config
     
@@ -128,8 +158,8 @@ class STTProxy:
         
         try:
             # 读取音频文件
-            with open(audio_file_path, 'rb') as f:
-                audio_data = f.read()
+            async with aiofiles.open(audio_file_path, 'rb') as f:
+                audio_data = await f.read()
             
             # 使用文件名作为key
             filename = os.path.basename(audio_file_path)
@@ -169,6 +199,9 @@ class STTProxy:
             raise ValueError(f"Audio file too large: {len(audio_data)} bytes > {max_size}")
         
         try:
+            # 大文件的逐帧能量计算放到线程中，不阻塞事件循环
+            audio_data = await asyncio.to_thread(self.trimmer.trim, audio_data)
+            
             # 使用流式预测或句子预测
             use_stream = kwargs.get("use_stream", False)
             
@@ -187,6 +220,154 @@ class STTProxy:
             raise
         
     
+    async def transcribe_many(self, audios: List[Union[str, bytes]], language: Optional[str] = None,
+                              concurrency: Optional[int] = None, **kwargs) -> List[Dict[str, Any]]:
+        """
+        批量转录多个音频
+
+        多个音频打包为一次 /predict/sentences 请求，多个批次并发发送；
+        单个音频的错误不影响其他音频。
+
+        Args:
+            audios: 音频文件路径或音频数据的列表
+            language: 语言代码（'zh', 'en', 'auto'）
+            concurrency: 同时进行的批量请求数，默认使用配置
+            **kwargs: 其他参数（batch_size：单次请求的音频数）
+
+        Returns:
+            List[Dict[str, Any]]: 与 audios 一一对应的结果，
+                形如 {"key": 文件名, "result": 识别结果或None, "error": 错误信息或None}
+        """
+        if not self.service_client:
+            await self.initialize()
+
+        batch_config = self.config.get("batch", {})
+        concurrency = max(1, concurrency or batch_config.get("concurrency", 4))
+        max_files = max(1, kwargs.get("batch_size") or batch_config.get("max_files", 8))
+        max_bytes = batch_config.get("max_bytes", 20 * 1024 * 1024)
+        max_size = self.config.get("max_file_size", 100 * 1024 * 1024)
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(audios)
+        # (序号, 文件名, 路径或数据, 字节数)
+        entries: List[Tuple[int, str, Union[str, bytes], int]] = []
+        for index, audio in enumerate(audios):
+            if isinstance(audio, (bytes, bytearray, memoryview)):
+                filename = f"audio_{index}.wav"
+                if len(audio) > max_size:
+                    results[index] = self._item_error(filename, f"Audio file too large: {len(audio)} bytes > {max_size}")
+                    continue
+                entries.append((index, filename, bytes(audio), len(audio)))
+            else:
+                filename = os.path.basename(audio)
+                try:
+                    self._validate_audio_file(audio)
+                    entries.append((index, filename, audio, os.path.getsize(audio)))
+                except Exception as e:
+                    results[index] = self._item_error(filename, str(e))
+
+        # 按音频数与总字节数打包
+        batches: List[List[Tuple[int, str, Union[str, bytes], int]]] = []
+        batch_bytes = 0
+        for entry in entries:
+            if not batches or len(batches[-1]) >= max_files or batch_bytes + entry[3] > max_bytes:
+                batches.append([])
+                batch_bytes = 0
+            batches[-1].append(entry)
+            batch_bytes += entry[3]
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _run(batch):
+            # 在获得并发名额后才读取文件，内存占用不超过 concurrency 个批次
+            async with semaphore:
+                await self._transcribe_batch(batch, language, results)
+
+        await asyncio.gather(*(_run(batch) for batch in batches))
+
+        failed = sum(1 for r in results if r and r["error"])
+        self.logger.info(f"STT batch transcription completed: {len(audios)} audios, "
+                         f"{len(batches)} requests, {failed} failed")
+        return results
+
+    async def _transcribe_batch(self, batch: List[Tuple[int, str, Union[str, bytes], int]],
+                                language: Optional[str], results: List[Optional[Dict[str, Any]]]):
+        """转录一个批次，结果写入 results 的对应位置"""
+        uploads: List[Tuple[int, str, bytes]] = []
+        for index, filename, source, _ in batch:
+            if isinstance(source, bytes):
+                uploads.append((index, filename, await asyncio.to_thread(self.trimmer.trim, source)))
+                continue
+            try:
+                async with aiofiles.open(source, 'rb') as f:
+                    data = await f.read()
+                uploads.append((index, filename, await asyncio.to_thread(self.trimmer.trim, data)))
+            except Exception as e:
+                results[index] = self._item_error(filename, str(e))
+        if not uploads:
+            return
+
+        try:
+            # 以序号作为key，结果按key映射回输入位置（文件名可能重复或包含逗号）
+            response = await self._sentences_batch_request(
+                [(filename, data) for _, filename, data in uploads],
+                [str(index) for index, _, _ in uploads],
+                language
+            )
+        except Exception as e:
+            if len(uploads) > 1 and not self._is_unavailable(e):
+                # 整批被拒绝时逐个发送一次（不再重试），定位出错的音频
+                self.logger.warning(f"STT batch request failed ({len(uploads)} audios), retrying individually: {e}")
+                await self._transcribe_individually(uploads, language, results)
+            else:
+                # 后端不可用或过载时（已按策略重试过）逐个重试只会放大负载
+                for index, filename, _ in uploads:
+                    results[index] = self._item_error(filename, str(e))
+            return
+
+        self._fill_results(uploads, response, results)
+
+    async def _transcribe_individually(self, uploads: List[Tuple[int, str, bytes]], language: Optional[str],
+                                       results: List[Optional[Dict[str, Any]]]):
+        """整批失败后逐个转录，每个音频只尝试一次；遇到后端不可用时其余音频直接记为失败"""
+        for position, (index, filename, data) in enumerate(uploads):
+            try:
+                response = await self._sentences_batch_request([(filename, data)], [str(index)], language, retry=False)
+            except Exception as e:
+                results[index] = self._item_error(filename, str(e))
+                if self._is_unavailable(e):
+                    for rest_index, rest_filename, _ in uploads[position + 1:]:
+                        results[rest_index] = self._item_error(rest_filename, str(e))
+                    return
+                continue
+            self._fill_results([(index, filename, data)], response, results)
+
+    def _fill_results(self, uploads: List[Tuple[int, str, bytes]], response: Dict[str, Any],
+                      results: List[Optional[Dict[str, Any]]]):
+        """按key把识别结果写入 results 的对应位置"""
+        by_key = {str(item.get("key")): item for item in response.get("result", [])}
+        for index, filename, _ in uploads:
+            item = by_key.get(str(index))
+            if item is None:
+                results[index] = self._item_error(filename, "No recognition result")
+            else:
+                item["key"] = filename
+                results[index] = {"key": filename, "result": item, "error": None}
+
+    @staticmethod
+    def _is_unavailable(e: BaseException) -> bool:
+        """
+        后端不可用或过载（连接错误、超时、429、502~504 等）
+
+        500 通常由请求中的某个音频引起（如无法解码），不计入
+        """
+        if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 500:
+            return False
+        return is_retryable(e)
+
+    @staticmethod
+    def _item_error(filename: str, error: str) -> Dict[str, Any]:
+        return {"key": filename, "result": None, "error": error}
+
     async def get_supported_languages(self) -> List[str]:
         """
         获取支持的语言列表
@@ -228,41 +409,17 @@ class STTProxy:
             self.logger.error("服务客户端未初始化")
             return {}
             
-        max_retries = self.config.get("max_retries", 3)
-        retry_delay = self.config.get("retry_delay", 2.0)
-        
-        for attempt in range(max_retries):
-            try:
-                response = await self.service_client.post(
-                    path,
-                    json=data,
-                    headers={"Content-Type": "application/json"},
-                    timeout=self.request_timeout
-                )
-                response.raise_for_status()
-                return response.json()
-                
-            except httpx.HTTPStatusError as e:
-                self.logger.error(f"HTTP error (attempt {attempt + 1}): {e.response.status_code}")
-                if attempt == max_retries - 1:
-                    raise
-                    
-            except httpx.RequestError as e:
-                self.logger.error(f"Request error (attempt {attempt + 1}): {e}")
-                if attempt == max_retries - 1:
-                    raise
-                    
-            except Exception as e:
-                self.logger.error(f"Unexpected error (attempt {attempt + 1}): {e}")
-                if attempt == max_retries - 1:
-                    raise
-            
-            # 重试延迟
-            if attempt < max_retries - 1:
-                await asyncio.sleep(retry_delay * (attempt + 1))
+        async def _attempt(timeout: float) -> Dict[str, Any]:
+            response = await self.service_client.post(
+                path,
+                json=data,
+                headers={"Content-Type": "application/json"},
+                timeout=timeout
+            )
+            response.raise_for_status()
+            return response.json()
         
-        # 如果所有重试都失败，返回空字典
-        return {}
+        return await self.retry_policy.run(_attempt, self.request_timeout, label=f"STT request {path}")
     
     
     async def _upload_request(self, path: str, files: Dict, data: Dict[str, Any]) -> Dict[str, Any]:
@@ -271,41 +428,17 @@ class STTProxy:
             self.logger.error("服务客户端未初始化")
             return {}
             
-        max_retries = self.config.get("max_retries", 3)
-        retry_delay = self.config.get("retry_delay", 2.0)
-        
-        for attempt in range(max_retries):
-            try:
-                response = await self.service_client.post(
-                    path,
-                    files=files,
-                    data=data,
-                    timeout=self.request_timeout
-                )
-                response.raise_for_status()
-                return response.json()
-                
-            except httpx.HTTPStatusError as e:
-                self.logger.error(f"Upload HTTP error (attempt {attempt + 1}): {e.response.status_code}")
-                if attempt == max_retries - 1:
-                    raise
-                    
-            except httpx.RequestError as e:
-                self.logger.error(f"Upload request error (attempt {attempt + 1}): {e}")
-                if attempt == max_retries - 1:
-                    raise
-                    
-            except Exception as e:
-                self.logger.error(f"Upload unexpected error (attempt {attempt + 1}): {e}")
-                if attempt == max_retries - 1:
-                    raise
-            
-            # 重试延迟
-            if attempt < max_retries - 1:
-                await asyncio.sleep(retry_delay * (attempt + 1))
+        async def _attempt(timeout: float) -> Dict[str, Any]:
+            response = await self.service_client.post(
+                path,
+                files=files,
+                data=data,
+                timeout=timeout
+            )
+            response.raise_for_status()
+            return response.json()
         
-        # 如果所有重试都失败，返回空字典
-        return {}
+        return await self.retry_policy.run(_attempt, self.request_timeout, label=f"STT upload {path}")
     
     
     async def check_health(self) -> bool:
@@ -377,30 +510,20 @@ class STTProxy:
             self.logger.error("服务客户端未初始化")
             return {}
         
-        max_retries = self.config.get("max_retries", 3)
-        retry_delay = self.config.get("retry_delay", 2.0)
+        files = {
+            "file": (filename, audio_data, "audio/wav")
+        }
         
-        for attempt in range(max_retries):
-            try:
-                files = {
-                    "file": (filename, audio_data, "audio/wav")
-                }
-                
-                response = await self.service_client.post(
-                    "/predict/stream",
-                    files=files,
-                    timeout=self.request_timeout
-                )
-                response.raise_for_status()
-                return response.json()
-                
-            except Exception as e:
-                self.logger.error(f"Stream request error (attempt {attempt + 1}): {e}")
-                if attempt == max_retries - 1:
-                    raise
-                await asyncio.sleep(retry_delay * (attempt + 1))
+        async def _attempt(timeout: float) -> Dict[str, Any]:
+            response = await self.service_client.post(
+                "/predict/stream",
+                files=files,
+                timeout=timeout
+            )
+            response.raise_for_status()
+            return response.json()
         
-        return {}
+        return await self.retry_policy.run(_attempt, self.request_timeout, label="STT stream request")
     
     async def _sentences_request(self, audio_data: bytes, filename: str, language: Optional[str]) -> Dict[str, Any]:
         """
@@ -414,41 +537,51 @@ class STTProxy:
         Returns:
             Dict[str, Any]: 转录结果
         """
+        # 使用文件名作为key
+        return await self._sentences_batch_request([(filename, audio_data)], [filename], language)
+
+    async def _sentences_batch_request(self, audios: List[Tuple[str, bytes]], keys: List[str],
+                                       language: Optional[str], retry: bool = True) -> Dict[str, Any]:
+        """
+        在一次句子预测请求中转录多个音频
+
+        Args:
+            audios: [(文件名, 音频数据)]
+            keys: 与 audios 一一对应的key（不能包含逗号）
+            language: 语言代码
+            retry: 是否按重试策略重试，False 时只尝试一次
+
+        Returns:
+            Dict[str, Any]: 转录结果，result 中每项的 key 对应请求的key
+        """
         if self.service_client is None:
             self.logger.error("服务客户端未初始化")
             return {}
+
+        # 准备multipart form数据
+        files = [
+            ("files", (filename, audio_data, "audio/wav"))
+            for filename, audio_data in audios
+        ]
+
+        data = {
+            "keys": ",".join(keys),
+            "lang": language or "auto"
+        }
+
+        async def _attempt(timeout: float) -> Dict[str, Any]:
+            response = await self.service_client.post(
+                "/predict/sentences",
+                files=files,
+                data=data,
+                timeout=timeout
+            )
+            response.raise_for_status()
+            return response.json()
         
-        max_retries = self.config.get("max_retries", 3)
-        retry_delay = self.config.get("retry_delay", 2.0)
-        
-        for attempt in range(max_retries):
-            try:
-                # 准备multipart form数据
-                files = [
-                    ("files", (filename, audio_data, "audio/wav"))
-                ]
-                
-                data = {
-                    "keys": filename,  # 使用文件名作为key
-                    "lang": language or "auto"
-                }
-                
-                response = await self.service_client.post(
-                    "/predict/sentences",
-                    files=files,
-                    data=data,
-                    timeout=self.request_timeout
-                )
-                response.raise_for_status()
-                return response.json()
-                
-            except Exception as e:
-                self.logger.error(f"Sentences request error (attempt {attempt + 1}): {e}")
-                if attempt == max_retries - 1:
-                    raise
-                await asyncio.sleep(retry_delay * (attempt + 1))
-        
-        return {}
+        if not retry:
+            return await _attempt(self.request_timeout)
+        return await self.retry_policy.run(_attempt, self.request_timeout, label=f"STT sentences request ({len(audios)} audios)")
 
 
 # 便捷函数
@@ -12,7 +12,7 @@ import os
 import httpx
 import asyncio
 import uvicorn
-from fastapi import FastAPI, status, Form, HTTPException, Body
+from fastapi import FastAPI, status, Form, HTTPException, Body, Request
 from dotenv import dotenv_values
 from typing import Dict, List, Any, Tuple, AsyncGenerator
 from pydantic import BaseModel
@@ -20,6 +20,7 @@ from contextlib import asynccontextmanager
 
 from Module.Utils.Logger import setup_logger
 from Module.Utils.ConfigTools import load_config, validate_config
+from Module.STT.SilenceTrimmer import SilenceTrimmer
 from Module.Utils.FastapiServiceTools import (
     register_service_to_consul,
     unregister_service_from_consul
@@ -63,6 +64,9 @@ class SenseVoiceAgent:
         # SenseVoice_server地址
         self.server_url = self.config.get("server_url", "")
         
+        # 识别前裁剪首尾静音，减少上传与推理的数据量
+        self.trimmer = SilenceTrimmer(self.config.get("silence_trim", {}))
+        
         # 服务注册信息
         self.service_name = self.config.get("service_name", "SenseVoiceAgent")
         self.service_id = self.config.get("service_id", f"{self.service_name}-{self.host}:{self.port}")
@@ -144,6 +148,16 @@ class SenseVoiceAgent:
             """语音识别接口"""
             file_path = recognize_request.audio_path
             return await self._audio_recognize(file_path)
+        
+        @self.app.post("/audio/recognize/bytes")
+        async def audio_recognize_bytes(request: Request, filename: str = "audio.wav", lang: str = "auto"):
+            """语音识别接口（请求体为音频数据，可分块传输，不经过磁盘）"""
+            audio_data = bytearray()
+            async for chunk in request.stream():
+                audio_data += chunk
+            if not audio_data:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty audio body")
+            return await self._audio_recognize_bytes(bytes(audio_data), filename, lang)
     
     
     async def _audio_recognize(self, audio_path: str, lang: str="auto")->List[Tuple[str,str]]:
@@ -165,6 +179,32 @@ class SenseVoiceAgent:
             return ret
         
     
+    async def _audio_recognize_bytes(self, audio_data: bytes, filename: str, lang: str = "auto") -> Dict:
+        """
+        识别内存中的音频数据
+        
+        返回 SenseVoice_server 的原始响应：{"result": [{"key", "text", "raw_text", "clean_text"}]}
+        """
+        audio_data = await asyncio.to_thread(self.trimmer.trim, audio_data)
+        # key 以逗号分隔，文件名中的逗号会被拆成多个key
+        key = os.path.basename(filename).replace(",", "_") or "audio.wav"
+        try:
+            files = {"files": (key, audio_data, "audio/wav")}
+            form_data = {
+                "keys": key,
+                "lang": lang,
+            }
+            url = self.server_url + "/predict/sentences"
+            response = await self.client.post(url, files=files, data=form_data, timeout=120.0)
+            response.raise_for_status()
+            return response.json()
+        except httpx.RequestError as e:
+            self.logger.error(f"Failed to connect to server with error: {e}")
+            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e))
+        except httpx.HTTPStatusError as e:
+            self.logger.error(f"ASR server returned error: {e}")
+            raise HTTPException(status_code=e.response.status_code, detail=e.response.text)
+    
     async def _send_audio_files(self, audio_file: str, keys: str, lang: str="auto")->Dict:
         """发送音频文件到 ASR API"""
         try:
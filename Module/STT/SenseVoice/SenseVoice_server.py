@@ -18,12 +18,12 @@
 '''
 from fastapi import FastAPI, UploadFile, File, Form
 import uvicorn
+import asyncio
 import numpy as np
 from funasr import AutoModel
 from typing_extensions import Annotated
 from funasr.utils.postprocess_utils import rich_transcription_postprocess
-import wave
-import torchaudio
+import sys
 import os
 import re
 import argparse
@@ -32,6 +32,15 @@ from typing import List
 from io import BytesIO
 from model import SenseVoiceSmall
 
+# 在 ~/SenseVoice 中启动（需要导入其中的 model），Module.* 从 agent 仓库导入：
+# AGENT_HOME 设为仓库根目录，或把仓库根目录加入 PYTHONPATH；
+# 追加在 sys.path 末尾，SenseVoice 目录中的同名模块优先
+sys.path.append(os.environ.get("AGENT_HOME") or os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+from Module.STT.AudioDecoder import AudioDecoder
+from Module.Utils.MicroBatcher import MicroBatcher
+from Module.Utils.InferenceExecutor import InferenceExecutor, add_inference_exception_handlers
+
 class Language(str, Enum):
     auto = "auto"
     zh = "zh"
@@ -42,25 +51,42 @@ class Language(str, Enum):
     nospeech = "nospeech"
 
 class SenseVoiceServer:
-    def __init__(self, host: str = "0.0.0.0", port: int = 50000):
+    def __init__(self, host: str = "0.0.0.0", port: int = 50000,
+                 max_batch_size: int = 16, max_wait_ms: float = 10,
+                 max_queue: int = 32, inference_timeout: float = 60.0):
         """
         初始化 SenseVoice 服务器。
 
         :param host: 服务器主机地址
         :param port: 服务器端口
+        :param max_batch_size: 合并推理的最大音频数
+        :param max_wait_ms: 凑批的最长等待时间（毫秒）
+        :param max_queue: 推理队列上限，超出时返回503
+        :param inference_timeout: 单次推理超时（秒），超时返回504
         """
         self.host = host
         self.port = port
         self.app = FastAPI()  # 创建 FastAPI 应用实例
+        # 推理在专用线程中执行，事件循环（含 /health）保持响应
+        self.executor = InferenceExecutor("sensevoice", max_queue=max_queue, timeout=inference_timeout)
+        add_inference_exception_handlers(self.app)
         self.model_stream = AutoModel(model="paraformer-zh-streaming")  # 初始化流模型
         model_dir = "iic/SenseVoiceSmall"
         self.model_sentences, self.kwargs = SenseVoiceSmall.from_pretrained(model=model_dir, device=os.getenv("SENSEVOICE_DEVICE", "cuda:0"))
         self.model_sentences.eval()  # 设置模型为评估模式
         self.regex = r"<\|.*\|>"
+        # 16kHz 单声道 PCM WAV 直接读取样本，其他格式完整解码；统一重采样到模型采样率
+        self.decoder = AudioDecoder(target_rate=16000)
+        # 并发的句子识别请求合并为一次批量推理
+        self.batcher = MicroBatcher(self._infer_batch, {"max_batch_size": max_batch_size, "max_wait_ms": max_wait_ms})
         self.setup_routes()  # 设置路由
 
     def setup_routes(self):
         """设置 API 路由"""
+        @self.app.get("/health")
+        async def health_check():
+            return {"status": "healthy", "inference": self.executor.get_metrics()}
+
         @self.app.post("/predict/stream/")
         async def predict_stream(file: UploadFile = File(...)):
             return await self._predict_stream(file)
@@ -71,6 +97,10 @@ class SenseVoiceServer:
                                     lang: Annotated[Language, Form(description="language of audio content")] = "auto"):
             return await self._predict_sentences(files, keys, lang)
 
+        @self.app.get("/metrics/batching")
+        async def batching_metrics():
+            return {**self.batcher.get_metrics(), "decode": self.decoder.get_metrics()}
+
     async def _predict_stream(self, file: UploadFile):
         """
         处理实时推理请求。
@@ -79,54 +109,81 @@ class SenseVoiceServer:
         :return: 推理结果
         """
         audio_bytes = await file.read()
-        with wave.open(BytesIO(audio_bytes), 'rb') as audio_file:
-            audio_np = np.frombuffer(audio_file.readframes(audio_file.getnframes()), dtype=np.int16)
-        audio_np = audio_np.astype(np.float32) / 32768.0  # 转换为浮点数
+        waveform, _ = await asyncio.to_thread(self.decoder.decode, audio_bytes)
+        audio_np = waveform.numpy()
 
         # 进行推理
         cache = {}  # 模型的缓存，用于实时推理
-        res = self.model_stream.generate(input=audio_np, cache=cache, is_final=True)
+        res = await self.executor.run(self.model_stream.generate, input=audio_np, cache=cache, is_final=True)
         return {"result": res}
 
     async def _predict_sentences(self, files: List[bytes], keys: str, lang: Language):
         """
         处理句子推理请求。
 
+        每个音频作为一个条目提交给微批处理器，与其他并发请求中语言、采样率相同的音频合并推理。
+
         :param files: 上传的音频文件列表
         :param keys: 音频文件的名称
         :param lang: 音频内容的语言
         :return: 推理结果
         """
-        audios = []
-        audio_fs = 0
-        for file in files:
-            file_io = BytesIO(file)
-            data_or_path_or_list, audio_fs = torchaudio.load(file_io)
-            data_or_path_or_list = data_or_path_or_list.mean(0)
-            audios.append(data_or_path_or_list)
-            file_io.close()
         if lang == "":
             lang = "auto"
         if keys == "":
             key = ["wav_file_tmp_name"]
         else:
             key = keys.split(",")
-        res = self.model_sentences.inference(
+
+        # 解码与重采样在线程中执行，不阻塞事件循环
+        decoded = await asyncio.to_thread(lambda: [self.decoder.decode(file) for file in files])
+
+        # 按采样率分组提交（解码后通常都是16kHz），同一请求内的音频可能被拆到不同批次
+        groups = {}
+        for i, (data_or_path_or_list, audio_fs) in enumerate(decoded):
+            item_key = key[i] if i < len(key) else f"{key[-1]}_{i}"
+            groups.setdefault(audio_fs, []).append((i, (data_or_path_or_list, item_key)))
+
+        results = [None] * len(files)
+        for audio_fs, entries in groups.items():
+            outputs = await self.batcher.submit_many([item for _, item in entries], group=(lang, audio_fs))
+            for (i, _), output in zip(entries, outputs):
+                results[i] = output
+        return {"result": [r for r in results if r is not None]}
+
+    async def _infer_batch(self, group, items):
+        """
+        对一批音频执行一次推理，结果按输入顺序返回。
+
+        :param group: (语言, 采样率)
+        :param items: [(音频张量, 原始key)]
+        :return: 与 items 一一对应的识别结果，无结果的条目为 None
+        """
+        lang, audio_fs = group
+        # 不同请求的key可能重复，推理时使用批内唯一的key再映射回原始key
+        batch_keys = [f"{i}_{item_key}" for i, (_, item_key) in enumerate(items)]
+        res = await self.executor.run(self._inference, [audio for audio, _ in items], lang, batch_keys, audio_fs)
+        outputs = {}
+        for it in (res[0] if res else []):
+            index = int(str(it["key"]).split("_", 1)[0])
+            it["key"] = items[index][1]
+            it["raw_text"] = it["text"]
+            it["clean_text"] = re.sub(self.regex, "", it["text"], 0, re.MULTILINE)
+            it["text"] = rich_transcription_postprocess(it["text"])
+            outputs[index] = it
+        return [outputs.get(i) for i in range(len(items))]
+
+    def _inference(self, audios, lang, keys, audio_fs):
+        """批量推理（在推理线程中执行）"""
+        return self.model_sentences.inference(
             data_in=audios,
             language=lang,
             use_itn=False,
             ban_emo_unk=False,
-            key=key,
+            key=keys,
             fs=audio_fs,
             **self.kwargs,
         )
-        if len(res) == 0:
-            return {"result": []}
-        for it in res[0]:
-            it["raw_text"] = it["text"]
-            it["clean_text"] = re.sub(self.regex, "", it["text"], 0, re.MULTILINE)
-            it["text"] = rich_transcription_postprocess(it["text"])
-        return {"result": res[0]}
 
     def run(self):
         """运行 SenseVoice 服务器"""
@@ -136,9 +193,15 @@ def main():
     parser = argparse.ArgumentParser(description="SenseVoice FastAPI Server")
     parser.add_argument("--host", type=str, default="0.0.0.0", help="服务器主机地址")
     parser.add_argument("--port", type=int, default=50000, help="服务器端口")
+    parser.add_argument("--max-batch-size", type=int, default=16, help="合并推理的最大音频数")
+    parser.add_argument("--max-wait-ms", type=float, default=10, help="凑批的最长等待时间（毫秒）")
+    parser.add_argument("--max-queue", type=int, default=32, help="推理队列上限")
+    parser.add_argument("--inference-timeout", type=float, default=60.0, help="单次推理超时（秒）")
     args = parser.parse_args()
 
-    server = SenseVoiceServer(host=args.host, port=args.port)
+    server = SenseVoiceServer(host=args.host, port=args.port,
+                              max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms,
+                              max_queue=args.max_queue, inference_timeout=args.inference_timeout)
     server.run()
 
 if __name__ == "__main__":
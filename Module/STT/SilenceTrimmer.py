@@ -0,0 +1,104 @@
+"""
+语音首尾静音裁剪
+
+用户的语音输入通常在开头和结尾带有较长的静音（按下按键到开口、说完到松开），
+这部分音频同样要经过上传与推理。SilenceTrimmer 按帧计算能量，去掉首尾低于阈值的部分，
+两端各保留 padding_ms 的余量避免截断字音。
+
+只处理16位PCM WAV，其他格式原样返回；整段都低于阈值时也原样返回，由ASR判断。
+默认关闭，通过配置 enabled 开启。trim 为同步计算，异步代码中应放到线程中执行。
+"""
+
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+from Module.Utils.WavUtils import WavFormat, build_wav_header, parse_wav_header
+
+
+class SilenceTrimmer:
+    """
+    基于帧能量的首尾静音裁剪
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        初始化裁剪器
+
+        Args:
+            config: enabled、threshold_db（dBFS）、frame_ms、padding_ms
+        """
+        config = config or {}
+        self.enabled: bool = config.get("enabled", False)
+        self.threshold: float = 10 ** (config.get("threshold_db", -45.0) / 20)
+        self.frame_ms: int = max(1, config.get("frame_ms", 20))
+        self.padding_ms: int = config.get("padding_ms", 300)
+
+        self.trimmed = 0
+        self.trimmed_seconds = 0.0
+
+    def trim(self, data: bytes) -> bytes:
+        """
+        裁剪首尾静音
+
+        Args:
+            data: 音频文件数据
+
+        Returns:
+            bytes: 裁剪后的WAV数据；无需或无法裁剪时返回原数据
+        """
+        if not self.enabled:
+            return data
+        try:
+            parsed = parse_wav_header(data)
+        except ValueError:
+            return data
+        if parsed is None:
+            return data
+        fmt, offset = parsed
+        if fmt.audio_format != 1 or fmt.bits_per_sample != 16 or fmt.channels < 1:
+            return data
+
+        # 流式写出的WAV头中data长度可能是0或占位值，以实际数据为准
+        declared = int.from_bytes(data[offset - 4:offset], "little")
+        end = len(data) if declared in (0, 0xFFFFFFFF) else min(len(data), offset + declared)
+
+        frame_samples = max(1, fmt.sample_rate * self.frame_ms // 1000) * fmt.channels
+        frame_count = (end - offset) // 2 // frame_samples
+        if frame_count == 0:
+            return data
+
+        pcm = np.frombuffer(memoryview(data)[offset:offset + frame_count * frame_samples * 2], dtype="<i2")
+        frames = pcm.reshape(frame_count, frame_samples).astype(np.float32) / 32768.0
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        voiced = np.flatnonzero(rms >= self.threshold)
+        if voiced.size == 0:
+            return data
+
+        padding = self.padding_ms // self.frame_ms
+        first = max(0, int(voiced[0]) - padding)
+        last = min(frame_count, int(voiced[-1]) + 1 + padding)
+        if first == 0 and last == frame_count:
+            return data
+
+        start = offset + first * frame_samples * 2
+        # 保留到末尾时带上不足一帧的尾部数据
+        stop = end - (end - offset) % fmt.block_align if last == frame_count else offset + last * frame_samples * 2
+        body = memoryview(data)[start:stop]
+
+        self.trimmed += 1
+        self.trimmed_seconds += (end - offset - len(body)) / fmt.byte_rate
+        return build_wav_header(WavFormat(fmt.sample_rate, fmt.channels, 16, 1), len(body)) + body
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        获取裁剪统计
+
+        Returns:
+            Dict[str, Any]: 裁剪次数与累计裁掉的时长（秒）
+        """
+        return {
+            "enabled": self.enabled,
+            "trimmed": self.trimmed,
+            "trimmed_seconds": self.trimmed_seconds
+        }
@@ -1 +1,327 @@
-# TODO 实现
\ No newline at end of file
+# Project:      Agent
+# Author:       yomu
+# Time:         2024/11/08
+# Version:      0.1
+# Description:  agent STT streaming ASR server
+
+"""
+    实时流式语音识别服务（WebSocket）
+
+    SenseVoiceServer 的 /predict/stream/ 每次请求都新建模型缓存并以 is_final=True 推理，
+    无法做增量识别。本服务为每个 WebSocket 会话保存模型缓存：
+        - 客户端持续发送 16kHz、16位、单声道的 PCM 数据帧（二进制消息）
+        - 服务端按 chunk 切分，流式 VAD 判断语音起止
+        - 语音进行中逐 chunk 增量识别，返回 partial 结果；VAD 检测到语音结束时返回 final 结果
+        - 客户端发送文本消息 "end"（或 {"type": "end"}）结束当前语音并收到最终结果
+        - 超过 session_timeout 未收到数据的会话被关闭并释放缓存
+
+    服务端消息（JSON）：
+        {"type": "partial", "segment": 0, "text": "今天天气"}
+        {"type": "final", "segment": 0, "text": "今天天气怎么样", "start_ms": 320, "end_ms": 2480}
+        {"type": "error", "message": "..."}
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import logging
+import argparse
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from funasr import AutoModel
+
+# 在模型目录中单独启动，Module.* 从 agent 仓库导入：
+# AGENT_HOME 设为仓库根目录，或把仓库根目录加入 PYTHONPATH；未设置时按本文件在仓库中的位置推算
+sys.path.append(os.environ.get("AGENT_HOME") or os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+from Module.Utils.InferenceExecutor import InferenceExecutor, add_inference_exception_handlers
+
+
+SAMPLE_RATE = 16000
+
+logger = logging.getLogger("StreamingSenseVoice")
+
+
+class _Session:
+    """单个 WebSocket 会话的识别状态"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.asr_cache: Dict[str, Any] = {}
+        self.vad_cache: Dict[str, Any] = {}
+        self.pending = bytearray()      # 尚未凑满一个 chunk 的 PCM 数据
+        self.samples = 0                # 已送入 VAD 的采样数，用于把 VAD 时间戳换算为 chunk 内位置
+        self.in_speech = False
+        self.segment = 0
+        self.text = ""                  # 当前语音段已识别的文本
+        self.speech_start_ms: Optional[int] = None
+        self.last_active = time.monotonic()
+        self.lock = asyncio.Lock()      # 同一会话的 chunk 按顺序处理
+
+    def reset_segment(self):
+        """当前语音段结束，清空识别缓存（VAD 缓存跨语音段保留）"""
+        self.asr_cache = {}
+        self.in_speech = False
+        self.text = ""
+        self.speech_start_ms = None
+        self.segment += 1
+
+
+class StreamingASRServer:
+    def __init__(self, host: str = "0.0.0.0", port: int = 50001,
+                 chunk_ms: int = 600, session_timeout: float = 60.0, max_sessions: int = 32,
+                 max_queue: int = 64, inference_timeout: float = 10.0):
+        """
+        初始化流式识别服务器。
+
+        :param host: 服务器主机地址
+        :param port: 服务器端口
+        :param chunk_ms: 每次增量识别的音频长度（毫秒），paraformer 流式模型以 60ms 为单位
+        :param session_timeout: 会话空闲超时（秒）
+        :param max_sessions: 最大并发会话数
+        :param max_queue: 推理队列上限
+        :param inference_timeout: 单个 chunk 的推理超时（秒）
+        """
+        self.host = host
+        self.port = port
+        self.chunk_ms = chunk_ms
+        self.chunk_samples = SAMPLE_RATE * chunk_ms // 1000
+        # paraformer 流式模型的 chunk 配置：[0, 当前帧数, 前瞻帧数]，每帧 60ms
+        self.chunk_size = [0, max(1, chunk_ms // 60), max(1, chunk_ms // 120)]
+        self.session_timeout = session_timeout
+        self.max_sessions = max_sessions
+
+        self.app = FastAPI()  # 创建 FastAPI 应用实例
+        # 所有会话共享一个推理线程，事件循环（含 WebSocket 收发）保持响应
+        self.executor = InferenceExecutor("streaming_asr", max_queue=max_queue, timeout=inference_timeout,
+                                          logger=logger)
+        add_inference_exception_handlers(self.app)
+
+        self.asr_model = AutoModel(model="paraformer-zh-streaming")  # 流式识别模型
+        self.vad_model = AutoModel(model="fsmn-vad")  # 流式 VAD 模型
+
+        self.sessions: Dict[str, _Session] = {}
+        self.expired_sessions = 0
+        self.setup_routes()  # 设置路由
+
+    def setup_routes(self):
+        """设置 API 路由"""
+        @self.app.get("/health")
+        async def health_check():
+            return {
+                "status": "healthy",
+                "sessions": len(self.sessions),
+                "expired_sessions": self.expired_sessions,
+                "inference": self.executor.get_metrics()
+            }
+
+        @self.app.websocket("/asr/stream")
+        async def asr_stream(websocket: WebSocket):
+            """处理流式识别会话"""
+            await self._asr_stream(websocket)
+
+    # ------------------------------------------------------------------
+    # 会话
+    # ------------------------------------------------------------------
+    async def _asr_stream(self, websocket: WebSocket):
+        """
+        处理一个流式识别会话。
+
+        :param websocket: WebSocket 连接
+        """
+        await websocket.accept()
+        if len(self.sessions) >= self.max_sessions:
+            await websocket.send_json({"type": "error", "message": "too many sessions"})
+            await websocket.close(code=1013)
+            return
+
+        session = _Session(uuid.uuid4().hex)
+        self.sessions[session.session_id] = session
+        await websocket.send_json({"type": "ready", "session_id": session.session_id, "sample_rate": SAMPLE_RATE})
+        try:
+            while True:
+                # 空闲超时：会话及其模型缓存随连接一起释放
+                message = await asyncio.wait_for(websocket.receive(), self.session_timeout)
+                if message["type"] == "websocket.disconnect":
+                    break
+                session.last_active = time.monotonic()
+
+                if message.get("bytes") is not None:
+                    events = await self._feed(session, message["bytes"])
+                elif self._is_end(message.get("text")):
+                    events = await self._finish(session)
+                else:
+                    continue
+                for event in events:
+                    await websocket.send_json(event)
+        except asyncio.TimeoutError:
+            self.expired_sessions += 1
+            await self._safe_close(websocket, code=1000)
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            logger.exception(f"流式识别会话 {session.session_id} 出错: {e}")
+            try:
+                await websocket.send_json({"type": "error", "message": str(e)})
+            except Exception:
+                pass
+            await self._safe_close(websocket, code=1011)
+        finally:
+            self.sessions.pop(session.session_id, None)
+
+    @staticmethod
+    def _is_end(text: Optional[str]) -> bool:
+        if not text:
+            return False
+        if text.strip() == "end":
+            return True
+        try:
+            return json.loads(text).get("type") == "end"
+        except (ValueError, AttributeError):
+            return False
+
+    @staticmethod
+    async def _safe_close(websocket: WebSocket, code: int):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    # ------------------------------------------------------------------
+    # 识别
+    # ------------------------------------------------------------------
+    async def _feed(self, session: _Session, data: bytes) -> List[Dict[str, Any]]:
+        """
+        追加 PCM 数据，每凑满一个 chunk 执行一次 VAD 与增量识别。
+
+        :return: 需要发送给客户端的消息
+        """
+        events = []
+        async with session.lock:
+            session.pending += data
+            chunk_bytes = self.chunk_samples * 2
+            while len(session.pending) >= chunk_bytes:
+                chunk = bytes(session.pending[:chunk_bytes])
+                del session.pending[:chunk_bytes]
+                events += await self._process_chunk(session, self._to_float(chunk), is_final=False)
+        return events
+
+    async def _finish(self, session: _Session) -> List[Dict[str, Any]]:
+        """客户端结束输入：处理剩余数据并输出当前语音段的最终结果"""
+        async with session.lock:
+            remaining = bytes(session.pending[:len(session.pending) // 2 * 2])
+            session.pending.clear()
+            events = await self._process_chunk(session, self._to_float(remaining), is_final=True) if remaining else []
+            # 输入结束时总是以 final 收尾（文本可能为空），客户端据此判断识别完成
+            if session.in_speech or not any(event["type"] == "final" for event in events):
+                events.append(self._final_event(session, None))
+                session.reset_segment()
+            session.vad_cache = {}
+            session.samples = 0
+        return events
+
+    @staticmethod
+    def _to_float(pcm: bytes) -> np.ndarray:
+        return np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+
+    async def _process_chunk(self, session: _Session, audio: np.ndarray, is_final: bool) -> List[Dict[str, Any]]:
+        """对一个 chunk 执行 VAD 与增量识别"""
+        chunk_start = session.samples
+        session.samples += len(audio)
+        segments = await self.executor.run(self._vad, session, audio, is_final)
+        ended = None
+        for begin, end in segments:
+            if begin != -1 and not session.in_speech:
+                session.in_speech = True
+                session.speech_start_ms = begin
+            if end != -1:
+                ended = end
+        # 同一 chunk 内上一段语音结束后又开始了新的一段
+        reopened = segments[-1][0] if segments and segments[-1][1] == -1 and ended is not None else None
+
+        if not session.in_speech:
+            return []
+
+        # 语音结束（或输入结束）时以 is_final=True 冲刷识别缓存
+        final = is_final or ended is not None
+        if not final or reopened is None:
+            return await self._recognize_segment(session, audio, final, ended)
+
+        # 在新语音段起点处切分，起点之后的音频送入新语音段的识别缓存
+        split = min(max(reopened * SAMPLE_RATE // 1000 - chunk_start, 0), len(audio))
+        events = await self._recognize_segment(session, audio[:split], True, ended)
+        session.in_speech = True
+        session.speech_start_ms = reopened
+        events += await self._recognize_segment(session, audio[split:], is_final, None)
+        return events
+
+    async def _recognize_segment(self, session: _Session, audio: np.ndarray, final: bool,
+                                 end_ms: Optional[int]) -> List[Dict[str, Any]]:
+        """识别当前语音段的一段音频，final 时输出最终结果并结束该语音段"""
+        text = await self.executor.run(self._recognize, session, audio, final) if len(audio) else ""
+        if text:
+            session.text += text
+
+        if final:
+            events = [self._final_event(session, end_ms)]
+            session.reset_segment()
+            return events
+        if text:
+            return [{"type": "partial", "segment": session.segment, "text": session.text}]
+        return []
+
+    @staticmethod
+    def _final_event(session: _Session, end_ms: Optional[int]) -> Dict[str, Any]:
+        return {
+            "type": "final",
+            "segment": session.segment,
+            "text": session.text,
+            "start_ms": session.speech_start_ms,
+            "end_ms": end_ms
+        }
+
+    def _vad(self, session: _Session, audio: np.ndarray, is_final: bool) -> List[Tuple[int, int]]:
+        """
+        流式 VAD（在推理线程中执行）
+
+        :return: 本 chunk 内检测到的语音段 [(起点, 终点)]，单位毫秒；只检测到一端时另一端为 -1
+        """
+        res = self.vad_model.generate(input=audio, cache=session.vad_cache, is_final=is_final, chunk_size=self.chunk_ms)
+        return [tuple(segment) for segment in (res[0].get("value", []) if res else [])]
+
+    def _recognize(self, session: _Session, audio: np.ndarray, is_final: bool) -> str:
+        """增量识别（在推理线程中执行），返回本 chunk 新增的文本"""
+        res = self.asr_model.generate(
+            input=audio,
+            cache=session.asr_cache,
+            is_final=is_final,
+            chunk_size=self.chunk_size,
+            encoder_chunk_look_back=4,
+            decoder_chunk_look_back=1
+        )
+        return res[0].get("text", "") if res else ""
+
+    def run(self):
+        """运行流式识别服务器"""
+        uvicorn.run(self.app, host=self.host, port=self.port, ws='auto')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming ASR WebSocket Server")
+    parser.add_argument("--host", type=str, default="0.0.0.0", help="服务器主机地址")
+    parser.add_argument("--port", type=int, default=50001, help="服务器端口")
+    parser.add_argument("--chunk-ms", type=int, default=600, help="增量识别的音频长度（毫秒）")
+    parser.add_argument("--session-timeout", type=float, default=60.0, help="会话空闲超时（秒）")
+    parser.add_argument("--max-sessions", type=int, default=32, help="最大并发会话数")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    server = StreamingASRServer(host=args.host, port=args.port, chunk_ms=args.chunk_ms,
+                                session_timeout=args.session_timeout, max_sessions=args.max_sessions)
+    server.run()
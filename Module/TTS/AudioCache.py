@@ -0,0 +1,305 @@
+"""
+TTS音频缓存
+
+为 TTSProxy 提供内容寻址的合成结果缓存：
+- 键为 (文本, 角色, 语言, 切分方式, 音频格式, 权重版本) 的哈希
+- 音频文件保存在磁盘，总字节数超过上限时按 LRU 淘汰
+- 内存中维护索引，命中时无需访问后端
+- 相同键的并发请求只合成一次
+- 正在读取的文件被固定（pin），不会被淘汰
+"""
+
+import os
+import re
+import json
+import uuid
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable
+from logging import Logger
+
+
+# 参与缓存键计算的合成参数（batch_size、streaming_mode 等不影响输出音频）
+KEY_PARAMS = ("text", "text_lang", "text_split_method", "media_type", "prompt_lang")
+
+_CACHE_FILE = re.compile(r"^([0-9a-f]{64})\.(\w+)$")
+
+
+class TTSAudioCache:
+    """
+    TTS音频缓存
+
+    缓存文件命名为 ``<key>.<media_type>``，启动时扫描目录重建索引，
+    文件修改时间即为最近使用时间。
+    """
+
+    def __init__(self, logger: Logger, config: Optional[Dict[str, Any]] = None):
+        """
+        初始化音频缓存
+
+        Args:
+            logger: 日志记录器
+            config: 缓存配置
+        """
+        self.logger = logger
+        config = config or {}
+
+        self.enabled: bool = config.get("enabled", True)
+        self.cache_dir: str = os.path.expandvars(config.get("dir", "${AGENT_HOME}/Temp/tts_cache"))
+        self.max_bytes: int = config.get("max_bytes", 512 * 1024 * 1024)
+
+        # key -> (path, size)，按最近使用排序
+        self._index: OrderedDict[str, Tuple[str, int]] = OrderedDict()
+        self._total_bytes = 0
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        # key -> 固定次数，被固定的文件不参与淘汰
+        self._pins: Dict[str, int] = {}
+
+        self.hits = 0
+        self.shared = 0
+        self.misses = 0
+
+        if self.enabled:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._load_index()
+
+    # ------------------------------------------------------------------
+    # 键计算
+    # ------------------------------------------------------------------
+    @staticmethod
+    def make_key(params: Dict[str, Any], character: str, weights_version: str) -> str:
+        """
+        计算缓存键
+
+        Args:
+            params: 合成请求参数
+            character: 角色名称
+            weights_version: 角色权重与参考音频的版本标识
+
+        Returns:
+            str: sha256 十六进制摘要
+        """
+        payload = {name: params.get(name) for name in KEY_PARAMS}
+        payload["character"] = character
+        payload["weights_version"] = weights_version
+        raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # ------------------------------------------------------------------
+    # 索引
+    # ------------------------------------------------------------------
+    def _load_index(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith(".part"):
+                # 上次进程中断遗留的未完成文件
+                self._remove_file(path)
+                continue
+            match = _CACHE_FILE.match(name)
+            if not match:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, match.group(1), path, stat.st_size))
+
+        for _, key, path, size in sorted(entries):
+            self._index[key] = (path, size)
+            self._total_bytes += size
+
+        if entries:
+            self.logger.info(f"TTS音频缓存已加载: {len(entries)} 个文件, {self._total_bytes} 字节")
+
+    def _remove_file(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.logger.warning(f"删除TTS缓存文件失败 {path}: {e}")
+
+    async def lookup(self, key: str, pin: bool = False) -> Optional[str]:
+        """
+        查找缓存
+
+        Args:
+            key: 缓存键
+            pin: 命中时固定该文件，使用完毕后须调用 release
+
+        Returns:
+            Optional[str]: 命中时返回音频文件路径
+        """
+        entry = self._index.get(key)
+        if entry is None:
+            return None
+
+        path, size = entry
+        try:
+            # 更新修改时间，重启后仍能保持 LRU 顺序
+            await asyncio.to_thread(os.utime, path)
+        except FileNotFoundError:
+            # 文件被外部删除
+            if self._index.get(key) == entry:
+                self._index.pop(key)
+                self._total_bytes -= size
+            return None
+
+        if key not in self._index:
+            # 等待期间被淘汰
+            return None
+        self._index.move_to_end(key)
+        if pin:
+            self._pin(key)
+        self.hits += 1
+        return path
+
+    async def get_or_create(self, key: str, media_type: str,
+                            producer: Callable[[str], Awaitable[None]], pin: bool = False) -> Tuple[str, bool]:
+        """
+        获取缓存文件，未命中时调用 producer 生成
+
+        生成在独立的任务中进行：发起生成的请求被取消时，等待同一个键的其他请求不受影响。
+
+        Args:
+            key: 缓存键
+            media_type: 音频格式，作为文件扩展名
+            producer: 把音频写入给定路径的协程函数
+            pin: 固定返回的文件，使用完毕后须调用 release
+
+        Returns:
+            Tuple[str, bool]: (音频文件路径, 是否命中缓存)
+        """
+        path = await self.lookup(key, pin=pin)
+        if path is not None:
+            return path, True
+
+        task = self._in_flight.get(key)
+        hit = task is not None
+        if hit:
+            self.shared += 1
+        else:
+            self.misses += 1
+            task = self._in_flight[key] = asyncio.create_task(self._produce(key, media_type, producer, pin))
+            # 所有等待者都已取消时避免 "exception was never retrieved" 警告
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+        try:
+            path = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if pin and not hit:
+                # 生成任务完成时会替调用方固定文件，调用方已取消，由回调释放
+                task.add_done_callback(lambda t: t.cancelled() or t.exception() is not None or self.release(key))
+            raise
+        if pin and hit:
+            self._pin(key)
+        return path, hit
+
+    async def _produce(self, key: str, media_type: str, producer: Callable[[str], Awaitable[None]],
+                       pin: bool) -> str:
+        """生成缓存文件（独立任务）"""
+        final_path = os.path.join(self.cache_dir, f"{key}.{media_type}")
+        tmp_path = f"{final_path}.{uuid.uuid4().hex}.part"
+        try:
+            try:
+                await producer(tmp_path)
+                os.replace(tmp_path, final_path)
+                size = os.path.getsize(final_path)
+            except BaseException:
+                self._remove_file(tmp_path)
+                raise
+
+            self._index[key] = (final_path, size)
+            self._total_bytes += size
+            if pin:
+                # 在淘汰之前固定，发起请求的调用方拿到的文件一定存在
+                self._pin(key)
+        finally:
+            self._in_flight.pop(key, None)
+
+        await self._evict()
+        return final_path
+
+    def _pin(self, key: str):
+        self._pins[key] = self._pins.get(key, 0) + 1
+
+    def release(self, key: str):
+        """
+        释放固定的文件
+
+        Args:
+            key: 缓存键
+        """
+        count = self._pins.get(key, 0) - 1
+        if count > 0:
+            self._pins[key] = count
+        else:
+            self._pins.pop(key, None)
+
+    async def put_bytes(self, key: str, media_type: str, data: bytes) -> Optional[str]:
+        """
+        写入已获得的完整音频（如流式合成结束后）
+
+        Args:
+            key: 缓存键
+            media_type: 音频格式
+            data: 音频数据
+
+        Returns:
+            Optional[str]: 缓存文件路径；键已存在或正在生成时返回None
+        """
+        if key in self._index or key in self._in_flight:
+            return None
+
+        def _write(path: str):
+            with open(path, "wb") as f:
+                f.write(data)
+
+        path, _ = await self.get_or_create(key, media_type, lambda path: asyncio.to_thread(_write, path))
+        return path
+
+    async def _evict(self):
+        """超过容量上限时淘汰最久未使用的文件（保留最新写入的一个，跳过被固定的文件）"""
+        removed = []
+        for key in list(self._index)[:-1]:
+            if self._total_bytes <= self.max_bytes:
+                break
+            if key in self._pins:
+                continue
+            path, size = self._index.pop(key)
+            self._total_bytes -= size
+            removed.append(path)
+
+        for path in removed:
+            await asyncio.to_thread(self._remove_file, path)
+
+        if removed:
+            self.logger.debug(f"TTS音频缓存淘汰 {len(removed)} 个文件")
+
+    def clear(self):
+        """清空缓存"""
+        for path, _ in self._index.values():
+            self._remove_file(path)
+        self._index.clear()
+        self._total_bytes = 0
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+
+        Returns:
+            Dict[str, Any]: 命中率、文件数与占用字节数
+        """
+        lookups = self.hits + self.shared + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "shared": self.shared,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.shared) / lookups if lookups else None,
+            "entries": len(self._index),
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes
+        }
@@ -0,0 +1,220 @@
+"""
+TTS音频转码
+
+把 GPT-SoVITS 输出的WAV/PCM流边接收边编码为 Opus（Ogg封装）或 MP3，
+语音场景下体积约为PCM的十分之一以下。
+
+编码通过 ffmpeg 子进程完成：PCM写入标准输入，编码结果从标准输出读取，
+每收到一段PCM即可产出对应的压缩数据。找不到 ffmpeg 时回退为WAV原样输出。
+"""
+
+import shutil
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, List, AsyncIterator, AsyncGenerator
+from logging import Logger
+
+from Module.Utils.WavUtils import WavFormat, parse_wav_header
+
+
+@dataclass(frozen=True)
+class AudioEncoding:
+    """输出格式"""
+    name: str
+    content_type: str
+    extension: str
+    codec: str = ""
+    container: str = ""
+
+
+ENCODINGS: Dict[str, AudioEncoding] = {
+    "wav": AudioEncoding("wav", "audio/wav", "wav"),
+    "opus": AudioEncoding("opus", "audio/ogg", "ogg", codec="libopus", container="ogg"),
+    "mp3": AudioEncoding("mp3", "audio/mpeg", "mp3", codec="libmp3lame", container="mp3"),
+}
+
+# 客户端可能使用的别名（含 Accept 头中的 MIME 类型）
+_ALIASES = {
+    "ogg": "opus",
+    "audio/ogg": "opus",
+    "audio/opus": "opus",
+    "audio/mpeg": "mp3",
+    "audio/mp3": "mp3",
+    "audio/wav": "wav",
+    "audio/x-wav": "wav",
+    "audio/wave": "wav",
+}
+
+# WAV样本格式 -> ffmpeg 原始PCM格式
+_PCM_FORMATS = {
+    (1, 8): "u8",
+    (1, 16): "s16le",
+    (1, 24): "s24le",
+    (1, 32): "s32le",
+    (3, 32): "f32le",
+}
+
+
+class AudioTranscoder:
+    """
+    WAV流转码器
+
+    ``transcode_stream`` 接收以WAV头开头的数据块流（如 TTSProxy.synthesize_stream 的输出），
+    逐块产出目标格式的数据。
+    """
+
+    def __init__(self, logger: Logger, config: Optional[Dict[str, Any]] = None):
+        """
+        初始化转码器
+
+        Args:
+            logger: 日志记录器
+            config: 转码配置
+        """
+        self.logger = logger
+        config = config or {}
+
+        self.default_format: str = config.get("default_format", "wav")
+        self.ffmpeg: str = config.get("ffmpeg", "ffmpeg")
+        self.bitrates: Dict[str, str] = {"opus": "32k", "mp3": "64k", **config.get("bitrates", {})}
+        self.chunk_size: int = config.get("chunk_size", 4096)
+
+        self.available = shutil.which(self.ffmpeg) is not None
+        if not self.available:
+            self.logger.warning(f"未找到 ffmpeg（{self.ffmpeg}），TTS音频将以WAV格式输出")
+
+    def resolve_format(self, requested: Optional[str]) -> str:
+        """
+        解析客户端请求的格式
+
+        Args:
+            requested: 格式名称、别名或 Accept 头，为空时使用默认格式
+
+        Returns:
+            str: 实际输出的格式（wav/opus/mp3），不支持或无法转码时为 wav
+        """
+        name = None
+        for candidate in (requested or self.default_format or "wav").split(","):
+            # Accept 头形如 "audio/ogg;q=0.9, audio/mpeg"，按顺序取第一个支持的格式
+            candidate = candidate.split(";")[0].strip().lower()
+            candidate = _ALIASES.get(candidate, candidate)
+            if candidate in ENCODINGS:
+                name = candidate
+                break
+
+        if name is None or (name != "wav" and not self.available):
+            return "wav"
+        return name
+
+    @staticmethod
+    def encoding(fmt: str) -> AudioEncoding:
+        return ENCODINGS[fmt]
+
+    def _ffmpeg_args(self, encoding: AudioEncoding, wav_format: WavFormat) -> List[str]:
+        pcm_format = _PCM_FORMATS.get((wav_format.audio_format, wav_format.bits_per_sample))
+        if pcm_format is None:
+            raise ValueError(f"Unsupported WAV sample format: {wav_format}")
+
+        args = [
+            self.ffmpeg, "-hide_banner", "-loglevel", "error",
+            "-f", pcm_format, "-ar", str(wav_format.sample_rate), "-ac", str(wav_format.channels),
+            "-i", "pipe:0",
+            "-c:a", encoding.codec, "-b:a", self.bitrates[encoding.name]
+        ]
+        if encoding.name == "opus":
+            args += ["-application", "voip", "-page_duration", "20000"]
+        # 每个包编码后立即写出，而不是攒满输出缓冲区
+        args += ["-flush_packets", "1", "-f", encoding.container, "pipe:1"]
+        return args
+
+    async def transcode_stream(self, chunks: AsyncIterator[bytes], fmt: str) -> AsyncGenerator[bytes, None]:
+        """
+        边接收边转码
+
+        Args:
+            chunks: 以WAV头开头的音频数据块
+            fmt: 目标格式（resolve_format 的返回值）
+
+        Yields:
+            bytes: 目标格式的数据块
+        """
+        if fmt == "wav":
+            async for chunk in chunks:
+                yield chunk
+            return
+
+        encoding = ENCODINGS[fmt]
+        iterator = chunks.__aiter__()
+
+        # 先读出完整的WAV头，得到PCM格式
+        head = bytearray()
+        parsed = None
+        while parsed is None:
+            try:
+                chunk = await iterator.__anext__()
+            except StopAsyncIteration:
+                raise ValueError("Audio stream ended before WAV header")
+            head += chunk
+            parsed = parse_wav_header(head)
+        wav_format, offset = parsed
+
+        process = await asyncio.create_subprocess_exec(
+            *self._ffmpeg_args(encoding, wav_format),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+
+        async def _feed():
+            try:
+                process.stdin.write(bytes(head[offset:]))
+                await process.stdin.drain()
+                async for data in iterator:
+                    process.stdin.write(data)
+                    await process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                # ffmpeg 提前退出，错误由返回码报告
+                pass
+            finally:
+                if not process.stdin.is_closing():
+                    process.stdin.close()
+
+        feeder = asyncio.create_task(_feed())
+        try:
+            while data := await process.stdout.read(self.chunk_size):
+                yield data
+
+            # 输入流的异常在这里抛出
+            await feeder
+            stderr = await process.stderr.read()
+            if await process.wait() != 0:
+                raise RuntimeError(f"ffmpeg exited with {process.returncode}: {stderr.decode(errors='replace')[-500:]}")
+        finally:
+            if not feeder.done():
+                feeder.cancel()
+                await asyncio.gather(feeder, return_exceptions=True)
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+    async def transcode_bytes(self, wav_data: bytes, fmt: str) -> bytes:
+        """
+        转码完整的WAV数据
+
+        Args:
+            wav_data: WAV数据
+            fmt: 目标格式
+
+        Returns:
+            bytes: 目标格式的数据
+        """
+        if fmt == "wav":
+            return wav_data
+
+        async def _single():
+            yield wav_data
+
+        output = bytearray()
+        async for chunk in self.transcode_stream(_single(), fmt):
+            output += chunk
+        return bytes(output)
@@ -0,0 +1,246 @@
+"""
+TTS角色感知调度
+
+GPT-SoVITS 后端的 GPT/SoVITS 权重是全局状态，切换一次需要重新加载模型，
+不同角色的请求交替到达时会反复切换权重。调度器：
+- 记录每个后端当前加载的权重
+- 排队的请求按权重分组，优先派发给已加载对应权重的后端
+- 只在后端空闲时切换权重，不影响正在合成的请求
+- 最早的请求等待超过 max_wait 后优先为它派发，避免重排导致饥饿
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List, Tuple, Callable, Awaitable, AsyncIterator
+from logging import Logger
+
+
+# (gpt_path, sovits_path)；为None表示请求不依赖特定权重
+WeightsKey = Tuple[str, str]
+
+
+@dataclass
+class _Backend:
+    """后端实例的调度状态"""
+    client: Any
+    loaded: Optional[WeightsKey] = None      # 调度目标权重（派发时即更新）
+    confirmed: Optional[WeightsKey] = None   # 已确认加载完成的权重
+    active: int = 0
+    switch_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+@dataclass
+class _Waiter:
+    key: Optional[WeightsKey]
+    enqueued_at: float
+    future: asyncio.Future
+
+
+class CharacterScheduler:
+    """
+    按角色权重分组调度TTS请求
+
+    switcher(client, key, previous) 负责在指定后端上加载权重，
+    previous 为该后端已确认加载的权重（未知时为None），可据此跳过未变化的部分。
+    """
+
+    def __init__(self, logger: Logger, config: Optional[Dict[str, Any]],
+                 switcher: Callable[[Any, WeightsKey, Optional[WeightsKey]], Awaitable[None]]):
+        """
+        初始化调度器
+
+        Args:
+            logger: 日志记录器
+            config: 调度配置
+            switcher: 切换后端权重的协程函数
+        """
+        self.logger = logger
+        config = config or {}
+
+        self.enabled: bool = config.get("enabled", True)
+        self.max_wait: float = config.get("max_wait", 2.0)
+        self.per_backend_concurrency: int = max(1, config.get("per_backend_concurrency", 2))
+        self.switcher = switcher
+
+        self._backends: Dict[str, _Backend] = {}
+        self._waiters: List[_Waiter] = []    # 按到达顺序
+
+        self.dispatched = 0
+        self.switches = 0
+        self.switch_failures = 0
+        self.forced = 0
+        self.total_wait = 0.0
+        self.max_observed_wait = 0.0
+
+    # ------------------------------------------------------------------
+    # 后端管理
+    # ------------------------------------------------------------------
+    def set_backends(self, clients: List[Any]):
+        """
+        更新后端列表，已知后端保留其权重状态
+
+        Args:
+            clients: 服务客户端列表（以 base_url 区分）
+        """
+        backends: Dict[str, _Backend] = {}
+        for client in clients:
+            backend = self._backends.get(client.base_url)
+            if backend is None:
+                backend = _Backend(client)
+            else:
+                backend.client = client
+            backends[client.base_url] = backend
+        self._backends = backends
+        self._dispatch()
+
+    @property
+    def has_backends(self) -> bool:
+        return bool(self._backends)
+
+    # ------------------------------------------------------------------
+    # 申请与释放
+    # ------------------------------------------------------------------
+    @asynccontextmanager
+    async def slot(self, key: Optional[WeightsKey]) -> AsyncIterator[Any]:
+        """
+        申请一个已加载指定权重的后端，必要时先切换权重
+
+        Args:
+            key: 请求所需的权重，None 表示任意后端均可
+
+        Yields:
+            Any: 服务客户端
+        """
+        backend = await self._acquire(key)
+        try:
+            if key is not None:
+                async with backend.switch_lock:
+                    if backend.confirmed != key:
+                        await self._switch(backend, key)
+            yield backend.client
+        finally:
+            self._release(backend)
+
+    async def _acquire(self, key: Optional[WeightsKey]) -> _Backend:
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(key, loop.time(), loop.create_future())
+        self._waiters.append(waiter)
+        self._dispatch()
+
+        try:
+            return await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # 已分配到后端但调用方被取消
+                self._release(waiter.future.result())
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def _release(self, backend: _Backend):
+        backend.active -= 1
+        self._dispatch()
+
+    async def _switch(self, backend: _Backend, key: WeightsKey):
+        previous = backend.confirmed
+        self.logger.info(f"切换TTS权重 {backend.client.base_url}: {previous} -> {key}")
+        try:
+            await self.switcher(backend.client, key, previous)
+        except BaseException:
+            # 切换中断后后端状态未知
+            self.switch_failures += 1
+            backend.confirmed = None
+            if backend.loaded == key:
+                backend.loaded = None
+            raise
+        backend.confirmed = key
+        self.switches += 1
+
+    # ------------------------------------------------------------------
+    # 派发
+    # ------------------------------------------------------------------
+    def _dispatch(self):
+        """为排队的请求分配后端"""
+        if not self._waiters:
+            return
+        now = asyncio.get_running_loop().time()
+
+        while self._waiters:
+            free = [b for b in self._backends.values() if b.active < self.per_backend_concurrency]
+            if not free:
+                return
+            waiter, backend = self._pick(free, now)
+            if waiter is None or backend is None:
+                return
+
+            self._waiters.remove(waiter)
+            backend.active += 1
+            if waiter.key is not None:
+                backend.loaded = waiter.key
+
+            wait = now - waiter.enqueued_at
+            self.dispatched += 1
+            self.total_wait += wait
+            self.max_observed_wait = max(self.max_observed_wait, wait)
+            if not waiter.future.done():
+                waiter.future.set_result(backend)
+            else:
+                backend.active -= 1
+
+    def _pick(self, free: List[_Backend], now: float) -> Tuple[Optional[_Waiter], Optional[_Backend]]:
+        oldest = self._waiters[0]
+        if now - oldest.enqueued_at >= self.max_wait:
+            # 最早的请求已超时：只为它派发，其他请求不再占用后端，
+            # 直到有已加载其权重的后端可用或某个后端空闲下来
+            backend = self._backend_for(oldest, free)
+            if backend is not None:
+                self.forced += 1
+            return oldest, backend
+
+        # 优先把请求派发给已加载对应权重的后端
+        for waiter in self._waiters:
+            for backend in free:
+                if waiter.key is None or backend.loaded == waiter.key:
+                    return waiter, backend
+
+        # 没有可直接服务的请求时，空闲后端切换到最早等待的请求所需的权重
+        idle = [b for b in free if b.active == 0]
+        if idle:
+            return oldest, idle[0]
+        return None, None
+
+    @staticmethod
+    def _backend_for(waiter: _Waiter, free: List[_Backend]) -> Optional[_Backend]:
+        for backend in free:
+            if waiter.key is None or backend.loaded == waiter.key:
+                return backend
+        for backend in free:
+            if backend.active == 0:
+                return backend
+        return None
+
+    # ------------------------------------------------------------------
+    # 统计
+    # ------------------------------------------------------------------
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        获取调度统计
+
+        Returns:
+            Dict[str, Any]: 派发数、权重切换次数、等待时间与各后端状态
+        """
+        return {
+            "enabled": self.enabled,
+            "queued": len(self._waiters),
+            "dispatched": self.dispatched,
+            "switches": self.switches,
+            "switch_failures": self.switch_failures,
+            "forced": self.forced,
+            "avg_wait": self.total_wait / self.dispatched if self.dispatched else None,
+            "max_wait": self.max_observed_wait,
+            "backends": {
+                url: {"loaded": backend.confirmed, "active": backend.active}
+                for url, backend in self._backends.items()
+            }
+        }
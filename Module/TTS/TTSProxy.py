@@ -6,16 +6,27 @@ TTS服务代理
 """
 
 import os
+import shutil
 import datetime
 import asyncio
+import hashlib
 import aiofiles
 import httpx
-from typing import Dict, Any, Optional, Union, List
+from contextlib import aclosing, asynccontextmanager
+from typing import Dict, Any, Optional, Union, List, Tuple, AsyncGenerator
 from logging import Logger
 from urllib.parse import urljoin
 
 from Module.Utils.Logger import setup_logger
 from Module.Utils.ConfigTools import load_config, validate_config
+from Module.Utils.RetryPolicy import RetryPolicy
+from Module.Utils.ArtifactStore import get_artifact_store
+from Module.TTS.AudioCache import TTSAudioCache
+from Module.Utils.WavUtils import WavFormat, build_wav_header, parse_wav_header, finalize_wav, finalize_wav_file
+from Module.TTS.TextSegmenter import split_sentences
+from Module.TTS.CharacterScheduler import CharacterScheduler, WeightsKey
+from Module.TTS.AudioTranscoder import AudioTranscoder
+from Init.ServiceDiscovery.service_connector import ServiceClient
 from Init.ServiceDiscovery import ServiceDiscoveryManager, ExternalServiceConnector
 
 
@@ -51,12 +62,54 @@ class TTSProxy:
         self.default_character = self.config.get("default_character", "Elysia")
         self.request_timeout = self.config.get("request_timeout", 60.0)
         
+        # 重试策略：错误分类、指数退避与进程级重试预算
+        self.retry_policy = RetryPolicy(self.logger, "tts", {
+            "max_attempts": self.config.get("max_retries", 3),
+            "base_delay": self.config.get("retry_delay", 2.0),
+            **self.config.get("retry", {})
+        })
+        
         # 角色配置
         self.characters = self.config.get("characters", {})
         
         # 确保保存目录存在
         self._ensure_save_dir()
         
+        # 合成输出文件：分片存放，按配额与过期时间清理
+        artifacts_config = self.config.get("artifacts", {})
+        self.artifacts = get_artifact_store(
+            artifacts_config.get("dir", os.path.join(self.save_dir, "tts_output")),
+            self.logger,
+            artifacts_config
+        )
+        
+        # 流式合成：上游未返回WAV头时使用的音频格式，以及读取缓存文件的块大小
+        self.stream_format = WavFormat(sample_rate=self.config.get("stream_sample_rate", 32000))
+        self.stream_chunk_size = self.config.get("stream_chunk_size", 8192)
+        
+        # 合成结果缓存：按内容寻址，重复文本不再合成
+        self.audio_cache = TTSAudioCache(self.logger, self.config.get("audio_cache", {}))
+        
+        # 输出转码：WAV边接收边编码为 Opus/MP3，减小传输体积
+        self.transcoder = AudioTranscoder(self.logger, self.config.get("output", {}))
+        
+        # 分段并行合成：长文本按句切分后在多个TTS实例上并发合成
+        # 分段之间插入静音会改变输出音频，默认关闭，可通过配置或 parallel=True 按请求开启
+        parallel_config = self.config.get("parallel_synthesis", {})
+        self.parallel_enabled: bool = parallel_config.get("enabled", False)
+        self.min_segment_chars: int = parallel_config.get("min_segment_chars", 8)
+        self.max_segment_chars: int = parallel_config.get("max_segment_chars", 80)
+        self.segment_pause: float = parallel_config.get("segment_pause", 0.3)
+        self._segment_semaphore = asyncio.Semaphore(parallel_config.get("max_concurrency", 4))
+        
+        # 所有TTS实例（含主服务客户端）及各实例进行中的请求数
+        self.instances: List[ServiceClient] = []
+        self._owned_clients: List[ServiceClient] = []
+        self._instance_load: Dict[str, int] = {}
+        
+        # 角色感知调度：按权重分组派发请求，减少后端权重切换
+        self.scheduler = CharacterScheduler(self.logger, self.config.get("scheduler", {}), self._switch_weights)
+        
         self.logger.info("TTSProxy initialized")
         
     
@@ -76,6 +129,44 @@ class TTSProxy:
             "request_timeout": 60.0,
             "max_retries": 3,
             "retry_delay": 2.0,
+            "retry": {
+                "max_delay": 8.0,
+                "deadline": None,
+                "budget_ratio": 0.1,
+                "budget_min_retries": 10,
+                "budget_window": 10.0
+            },
+            "stream_sample_rate": 32000,   # GPT-SoVITS 输出采样率，上游未返回WAV头时使用
+            "stream_chunk_size": 8192,
+            "parallel_synthesis": {
+                "enabled": False,           # 默认行为；单次请求可用 parallel=True/False 覆盖
+                "max_concurrency": 4,       # 同时合成的分段数
+                "min_segment_chars": 8,     # 短于此长度的句子与相邻句合并
+                "max_segment_chars": 80,    # 单段最大长度
+                "segment_pause": 0.3        # 分段之间插入的静音（秒）
+            },
+            "scheduler": {
+                "enabled": True,
+                "max_wait": 2.0,                 # 请求最长等待时间（秒），超过后优先派发
+                "per_backend_concurrency": 2     # 每个TTS实例同时处理的请求数
+            },
+            "output": {
+                "default_format": "wav",         # 未指定 output_format 时的输出格式：wav/opus/mp3
+                "ffmpeg": "ffmpeg",
+                "bitrates": {"opus": "32k", "mp3": "64k"}
+            },
+            "artifacts": {
+                "dir": "${AGENT_HOME}/Temp/tts_output",
+                "max_bytes": 1024 * 1024 * 1024,  # 输出目录总大小上限
+                "max_files": 5000,
+                "max_age": 24 * 3600,             # 输出文件保留时间（秒）
+                "min_age": 600                    # 返回给调用方的文件至少保留的时间（秒）
+            },
+            "audio_cache": {
+                "enabled": True,
+                "dir": "${AGENT_HOME}/Temp/tts_cache",
+                "max_bytes": 512 * 1024 * 1024   # 缓存目录总大小上限
+            },
             "characters": {
                 "Elysia": {
                     "gpt_path": "/home/yomu/GPTSoVits/GPT_SoVITS/pretrained_models/s1bert25hz-2kh-longer-epoch=68e-step=50232.ckpt",
@@ -130,11 +221,71 @@ class TTSProxy:
             
             self.logger.info(f"✅ TTS服务连接成功: {self.service_client.base_url}")
             
+            await self._discover_instances()
+            
         except Exception as e:
             self.logger.error(f"TTS服务初始化失败: {e}")
             raise
         
     
+    async def _discover_instances(self):
+        """发现所有健康的TTS实例，供分段并行合成使用"""
+        await self._close_owned_clients()
+        self.instances = [self.service_client] if self.service_client else []
+        
+        if self.discovery_manager is None or self.service_connector is None:
+            return
+        
+        try:
+            infos = await self.discovery_manager.discover_service_instances("GPTSoVits_server")
+        except Exception as e:
+            self.logger.warning(f"发现TTS实例失败: {e}")
+            return
+        
+        known = {client.base_url for client in self.instances}
+        for info in infos:
+            if info.url in known:
+                continue
+            try:
+                client = await self.service_connector.create_instance_client(info)
+                self.instances.append(client)
+                self._owned_clients.append(client)
+                known.add(info.url)
+            except Exception as e:
+                self.logger.warning(f"连接TTS实例失败 {info.url}: {e}")
+        
+        self.scheduler.set_backends(self.instances)
+        self.logger.info(f"可用TTS实例: {[client.base_url for client in self.instances]}")
+    
+    async def _close_owned_clients(self):
+        for client in self._owned_clients:
+            try:
+                await client.client.aclose()
+            except Exception as e:
+                self.logger.warning(f"关闭TTS实例连接失败 {client.base_url}: {e}")
+        self._owned_clients.clear()
+    
+    @asynccontextmanager
+    async def _client_slot(self, weights: Optional[WeightsKey] = None):
+        """
+        申请一个TTS实例
+        
+        启用调度时交给角色感知调度器（必要时先切换权重），
+        否则选择进行中请求最少的实例。
+        """
+        if self.scheduler.enabled and self.scheduler.has_backends:
+            async with self.scheduler.slot(weights) as client:
+                yield client
+            return
+        
+        candidates = self.instances or [self.service_client]
+        client = min(candidates, key=lambda c: self._instance_load.get(c.base_url, 0))
+        self._instance_load[client.base_url] = self._instance_load.get(client.base_url, 0) + 1
+        try:
+            yield client
+        finally:
+            self._instance_load[client.base_url] -= 1
+    
     async def synthesize(self, text: str, character: Optional[str] = None, 
                         save_file: bool = True, **kwargs) -> Union[str, bytes]:
         """
@@ -144,7 +295,8 @@ class TTSProxy:
             text: 要合成的文本
             character: 角色名称，如果不指定则使用默认角色
             save_file: 是否保存为文件
-            **kwargs: 其他参数
+            **kwargs: 其他参数，use_cache=False 时跳过音频缓存，parallel=True 时长文本分段并行合成，
+                output_format 指定输出格式（wav/opus/mp3）
             
         Returns:
             Union[str, bytes]: 如果save_file=True返回文件路径，否则返回音频数据
@@ -152,13 +304,49 @@ class TTSProxy:
         if not self.service_client:
             await self.initialize()
         
+        output_format = self._output_format(kwargs)
+        character, character_config, params = self._build_params(text, character, **kwargs)
+        
+        try:
+            if output_format != "wav":
+                return await self._synthesize_encoded(text, character, save_file, output_format, kwargs)
+            
+            segments = self._segments_for(text, kwargs)
+            if len(segments) > 1:
+                return await self._synthesize_segments(segments, character, save_file, kwargs)
+            
+            if self.audio_cache.enabled and kwargs.get("use_cache", True):
+                return await self._synthesize_cached(params, character, character_config, save_file)
+            
+            if save_file:
+                # 保存为文件
+                file_path = await self._synthesize_and_save(params, self._weights_key(character_config))
+                self.logger.info(f"TTS synthesis completed, saved to: {file_path}")
+                return file_path
+            else:
+                # 返回音频数据
+                audio_data = await self._synthesize_raw(params, self._weights_key(character_config))
+                self.logger.info(f"TTS synthesis completed, returned {len(audio_data)} bytes")
+                return audio_data
+                
+        except Exception as e:
+            self.logger.error(f"TTS synthesis failed: {e}")
+            raise
+        
+    
+    def _build_params(self, text: str, character: Optional[str], **kwargs) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+        """
+        构建 /tts 请求参数
+        
+        Returns:
+            Tuple[str, Dict[str, Any], Dict[str, Any]]: (角色名称, 角色配置, 请求参数)
+        """
         character = character or self.default_character
         character_config = self.characters.get(character, {})
         
         if not character_config:
             raise ValueError(f"Character '{character}' not configured")
         
-        # 构建请求参数
         params = {
             "text": text,
             "text_lang": kwargs.get("text_lang", "zh"),
@@ -170,103 +358,375 @@ class TTSProxy:
             "media_type": kwargs.get("media_type", "wav"),
             "streaming_mode": kwargs.get("streaming_mode", True)
         }
+        return character, character_config, params
+    
+    async def synthesize_stream(self, text: str, character: Optional[str] = None,
+                                **kwargs) -> AsyncGenerator[bytes, None]:
+        """
+        流式合成语音，上游每返回一段音频立即产出，首个数据块到达即可开始播放
         
-        try:
-            if save_file:
-                # 保存为文件
-                file_path = await self._synthesize_and_save(params)
-                self.logger.info(f"TTS synthesis completed, saved to: {file_path}")
-                return file_path
-            else:
-                # 返回音频数据
-                audio_data = await self._synthesize_raw(params)
-                self.logger.info(f"TTS synthesis completed, returned {len(audio_data)} bytes")
-                return audio_data
-                
-        except Exception as e:
-            self.logger.error(f"TTS synthesis failed: {e}")
-            raise
+        media_type 为 wav 时，首个数据块以长度字段为 0xFFFFFFFF 的流式WAV头开头，
+        之后均为PCM数据。长文本按句切分后并发合成，按原顺序输出。
+        命中音频缓存时直接分块读取缓存文件。
+        
+        Args:
+            text: 要合成的文本
+            character: 角色名称，如果不指定则使用默认角色
+            **kwargs: 其他参数，use_cache=False 时跳过音频缓存，parallel=True 时分段并行合成，
+                output_format 为 opus/mp3 时边合成边转码
+            
+        Yields:
+            bytes: 音频数据块
+        """
+        if not self.service_client:
+            await self.initialize()
+        
+        output_format = self._output_format(kwargs)
+        segments = self._segments_for(text, kwargs)
+        if len(segments) > 1:
+            stream = self._stream_segments(segments, character, kwargs)
+        else:
+            stream = self._stream_single(text, character, kwargs)
+        
+        if output_format != "wav":
+            stream = self.transcoder.transcode_stream(stream, output_format)
         
+        async with aclosing(stream) as chunks:
+            async for chunk in chunks:
+                yield chunk
     
-    async def _synthesize_and_save(self, params: Dict[str, Any]) -> str:
-        """合成语音并保存文件"""
+    def _output_format(self, kwargs: Dict[str, Any]) -> str:
+        """取出 output_format 参数并解析为实际输出格式；上游直接输出非wav格式时不转码"""
+        requested = kwargs.pop("output_format", None)
+        if kwargs.get("media_type", "wav") != "wav":
+            return "wav"
+        return self.transcoder.resolve_format(requested)
+    
+    async def _synthesize_encoded(self, text: str, character: Optional[str], save_file: bool,
+                                  output_format: str, kwargs: Dict[str, Any]) -> Union[str, bytes]:
+        """合成WAV（经缓存）后转码为指定格式"""
+        wav_data = await self.synthesize(text, character, save_file=False, output_format="wav", **kwargs)
+        audio_data = await self.transcoder.transcode_bytes(wav_data, output_format)
+        self.logger.info(f"TTS output encoded as {output_format}: {len(wav_data)} -> {len(audio_data)} bytes")
+        
+        if not save_file:
+            return audio_data
+        
+        return await self._save_output(audio_data, self.transcoder.encoding(output_format).extension)
+    
+    def _segments_for(self, text: str, kwargs: Dict[str, Any]) -> List[str]:
+        """切分需要并行合成的文本；只有 wav 输出才能按PCM拼接"""
+        if not kwargs.get("parallel", self.parallel_enabled) or kwargs.get("media_type", "wav") != "wav":
+            return [text]
+        return split_sentences(text, self.min_segment_chars, self.max_segment_chars) or [text]
+    
+    async def _stream_segments(self, segments: List[str], character: Optional[str],
+                               kwargs: Dict[str, Any]) -> AsyncGenerator[bytes, None]:
+        """
+        并发合成各分段，按原顺序拼接为一个流式WAV
+        
+        当前分段的数据到达即输出，后续分段的数据先在队列中缓冲。
+        分段按顺序申请并发名额，靠前的分段总是先开始合成。
+        """
+        done = object()
+        queues: List[asyncio.Queue] = [asyncio.Queue() for _ in segments]
+        
+        async def _produce(queue: asyncio.Queue, segment: str):
+            try:
+                async with self._segment_semaphore:
+                    async with aclosing(self._stream_single(segment, character, kwargs)) as stream:
+                        async for chunk in stream:
+                            queue.put_nowait(chunk)
+                queue.put_nowait(done)
+            except Exception as e:
+                queue.put_nowait(e)
+        
+        tasks = [asyncio.create_task(_produce(queue, segment)) for queue, segment in zip(queues, segments)]
+        fmt: Optional[WavFormat] = None
+        
+        try:
+            for queue in queues:
+                # 去掉每个分段自带的WAV头，只在整个流的开头输出一次
+                head: Optional[bytearray] = bytearray()
+                while True:
+                    item = await queue.get()
+                    if item is done:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    
+                    if head is not None:
+                        head += item
+                        parsed = parse_wav_header(head)
+                        if parsed is None:
+                            continue
+                        segment_fmt, offset = parsed
+                        item = bytes(head[offset:])
+                        head = None
+                        
+                        if fmt is None:
+                            fmt = segment_fmt
+                            yield build_wav_header(fmt)
+                        elif self.segment_pause > 0:
+                            yield bytes(int(self.segment_pause * fmt.sample_rate) * fmt.block_align)
+                    
+                    if item:
+                        yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _synthesize_segments(self, segments: List[str], character: Optional[str],
+                                   save_file: bool, kwargs: Dict[str, Any]) -> Union[str, bytes]:
+        """分段并行合成并拼接为一个完整的WAV"""
+        audio_data = bytearray()
+        async with aclosing(self._stream_segments(segments, character, kwargs)) as stream:
+            async for chunk in stream:
+                audio_data += chunk
+        finalize_wav(audio_data)
+        
+        self.logger.info(f"TTS synthesis completed in {len(segments)} segments, {len(audio_data)} bytes")
+        if not save_file:
+            return bytes(audio_data)
+        
+        return await self._save_output(audio_data)
+    
+    async def _stream_single(self, text: str, character: Optional[str],
+                             kwargs: Dict[str, Any]) -> AsyncGenerator[bytes, None]:
+        """单个请求的流式合成（经音频缓存）"""
+        kwargs = {**kwargs, "streaming_mode": True}
+        character, character_config, params = self._build_params(text, character, **kwargs)
+        media_type = params["media_type"]
+        
+        key = None
+        if self.audio_cache.enabled and kwargs.get("use_cache", True):
+            key = self.audio_cache.make_key(params, character, self._weights_version(character_config))
+            cached_path = await self.audio_cache.lookup(key, pin=True)
+            if cached_path is not None:
+                self.logger.info(f"TTS stream cache hit: {cached_path}")
+                try:
+                    async with aiofiles.open(cached_path, 'rb') as f:
+                        while chunk := await f.read(self.stream_chunk_size):
+                            yield chunk
+                finally:
+                    self.audio_cache.release(key)
+                return
+        
+        # 同时收集完整音频，结束后写入缓存
+        collected = bytearray() if key is not None else None
+        async with aclosing(self._stream_upstream(params, self._weights_key(character_config))) as stream:
+            async for chunk in stream:
+                if collected is not None:
+                    collected += chunk
+                yield chunk
+        
+        if collected is not None and key is not None:
+            if media_type == "wav":
+                finalize_wav(collected)
+            await self.audio_cache.put_bytes(key, media_type, bytes(collected))
+    
+    async def _stream_upstream(self, params: Dict[str, Any],
+                               weights: Optional[WeightsKey] = None) -> AsyncGenerator[bytes, None]:
+        """
+        从上游流式读取音频，wav 格式时把上游的WAV头替换为流式WAV头
+        
+        只在尚未产出任何数据时重试。
+        """
         if not self.service_client:
             raise RuntimeError("TTS service not initialized")
-            
-        # 生成唯一文件名
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d-%H-%M-%S%f")
-        filename = os.path.join(self.save_dir, f"{timestamp}_tts_output.wav")
         
-        max_retries = self.config.get("max_retries", 3)
-        retry_delay = self.config.get("retry_delay", 2.0)
+        rewrite_header = params.get("media_type") == "wav"
+        retry = self.retry_policy.start()
         
-        for attempt in range(max_retries):
+        while True:
+            started = False
             try:
-                # 发起请求
-                response = await self.service_client.get(
-                    path="/tts",
+                async with self._client_slot(weights) as client, client.stream(
+                    "GET",
+                    "/tts",
                     params=params,
-                    timeout=self.request_timeout
-                )
+                    timeout=retry.timeout(self.request_timeout)
+                ) as response:
+                    response.raise_for_status()
+                    
+                    header = bytearray() if rewrite_header else None
+                    async for chunk in response.aiter_bytes():
+                        if not chunk:
+                            continue
+                        if header is not None:
+                            header += chunk
+                            chunk = self._rewrite_stream_header(header)
+                            if chunk is None:
+                                continue
+                            header = None
+                        started = True
+                        yield chunk
+                    
+                    if header:
+                        # 上游数据不足一个完整的WAV头
+                        raise ValueError("Incomplete WAV header from TTS service")
+                return
+                
+            except Exception as e:
+                if started:
+                    self.logger.error(f"TTS stream interrupted: {e}")
+                    raise
+                delay = retry.next_delay(e)
+                if delay is None:
+                    self.logger.error(f"TTS stream failed (attempt {retry.attempt}): {e}")
+                    raise
+                self.logger.warning(f"TTS stream attempt {retry.attempt} failed, retrying in {delay:.2f}s: {e}")
+                await asyncio.sleep(delay)
+    
+    def _rewrite_stream_header(self, head: bytearray) -> Optional[bytes]:
+        """把上游WAV头替换为流式WAV头；数据不足以解析时返回None"""
+        try:
+            parsed = parse_wav_header(head)
+        except ValueError:
+            # 上游直接返回PCM，按配置的格式补上WAV头
+            return build_wav_header(self.stream_format) + bytes(head)
+        if parsed is None:
+            return None
+        fmt, offset = parsed
+        return build_wav_header(fmt) + bytes(head[offset:])
+    
+    async def _synthesize_cached(self, params: Dict[str, Any], character: str,
+                                 character_config: Dict[str, Any], save_file: bool) -> Union[str, bytes]:
+        """经缓存合成：命中时直接返回缓存文件，未命中时合成到缓存目录"""
+        key = self.audio_cache.make_key(params, character, self._weights_version(character_config))
+        
+        media_type = params.get("media_type", "wav")
+        file_path, hit = await self.audio_cache.get_or_create(
+            key,
+            media_type,
+            lambda path: self._synthesize_to_file(params, path, self._weights_key(character_config)),
+            pin=True
+        )
+        self.logger.info(f"TTS synthesis {'cache hit' if hit else 'completed'}: {file_path}")
+        
+        try:
+            if save_file:
+                # 缓存文件可能随时被淘汰，返回输出目录中的副本
+                output_path = self._output_path(media_type)
+                await asyncio.to_thread(self._link_or_copy, file_path, output_path)
+                self.artifacts.add(output_path)
+                return output_path
+            
+            async with aiofiles.open(file_path, 'rb') as f:
+                return await f.read()
+        finally:
+            self.audio_cache.release(key)
+    
+    @staticmethod
+    def _link_or_copy(src: str, dst: str):
+        """优先创建硬链接（不复制数据），跨文件系统时复制"""
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copyfile(src, dst)
+    
+    @staticmethod
+    def _weights_version(character_config: Dict[str, Any]) -> str:
+        """角色权重与参考音频的版本标识，任一变化都会使旧缓存失效"""
+        parts = [str(character_config.get(name, "")) for name in ("gpt_path", "sovits_path", "ref_audio", "ref_audio_text")]
+        return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()[:16]
+    
+    @staticmethod
+    def _weights_key(character_config: Dict[str, Any]) -> Optional[WeightsKey]:
+        """角色所需的后端权重，未配置权重时为None"""
+        gpt_path = character_config.get("gpt_path", "")
+        sovits_path = character_config.get("sovits_path", "")
+        if not gpt_path and not sovits_path:
+            return None
+        return gpt_path, sovits_path
+    
+    async def _switch_weights(self, client: ServiceClient, key: WeightsKey,
+                              previous: Optional[WeightsKey] = None):
+        """在指定实例上加载权重，跳过与已加载权重相同的部分"""
+        gpt_path, sovits_path = key
+        previous_gpt, previous_sovits = previous or (None, None)
+        
+        if gpt_path and gpt_path != previous_gpt:
+            response = await client.get("/set_gpt_weights", params={"weights_path": gpt_path})
+            response.raise_for_status()
+        if sovits_path and sovits_path != previous_sovits:
+            response = await client.get("/set_sovits_weights", params={"weights_path": sovits_path})
+            response.raise_for_status()
+    
+    def _output_path(self, extension: str = "wav") -> str:
+        """为输出文件分配路径（产物目录的分片子目录中）"""
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d-%H-%M-%S%f")
+        return self.artifacts.new_path(f"{timestamp}_tts_output.{extension}")
+    
+    async def _save_output(self, audio_data: Union[bytes, bytearray], extension: str = "wav") -> str:
+        """把完整音频写入输出文件"""
+        filename = self._output_path(extension)
+        async with aiofiles.open(filename, 'wb') as f:
+            await f.write(audio_data)
+        self.artifacts.add(filename)
+        return filename
+    
+    async def _synthesize_and_save(self, params: Dict[str, Any], weights: Optional[WeightsKey] = None) -> str:
+        """合成语音并保存文件"""
+        filename = await self._synthesize_to_file(params, self._output_path(), weights)
+        self.artifacts.add(filename)
+        return filename
+    
+    async def _synthesize_to_file(self, params: Dict[str, Any], filename: str,
+                                  weights: Optional[WeightsKey] = None) -> str:
+        """合成语音并写入指定文件"""
+        if not self.service_client:
+            raise RuntimeError("TTS service not initialized")
+        
+        async def _attempt(timeout: float) -> str:
+            # 流式读取响应，边接收边写入文件
+            async with self._client_slot(weights) as client, client.stream(
+                "GET",
+                "/tts",
+                params=params,
+                timeout=timeout
+            ) as response:
                 response.raise_for_status()
                 
-                # 异步保存文件
                 async with aiofiles.open(filename, 'wb') as f:
-                    async for chunk in response.aiter_bytes(chunk_size=8192):
+                    async for chunk in response.aiter_bytes():
                         if chunk:
                             await f.write(chunk)
-                
-                return filename
-                
-            except Exception as e:
-                self.logger.warning(f"TTS synthesis attempt {attempt + 1} failed: {e}")
-                
-                if attempt == max_retries - 1:
-                    raise
-                
-                # 重试延迟
-                await asyncio.sleep(retry_delay * (attempt + 1))
+            
+            if params.get("media_type") == "wav":
+                # 流式模式下上游WAV头中的长度为0，按实际大小回填
+                await asyncio.to_thread(finalize_wav_file, filename)
+            return filename
         
-        # 如果所有重试都失败，抛出异常
-        raise RuntimeError("TTS synthesis failed after all retries")
+        return await self.retry_policy.run(_attempt, self.request_timeout, label="TTS synthesis")
     
     
-    async def _synthesize_raw(self, params: Dict[str, Any]) -> bytes:
+    async def _synthesize_raw(self, params: Dict[str, Any], weights: Optional[WeightsKey] = None) -> bytes:
         """合成语音并返回原始数据"""
         if not self.service_client:
             raise RuntimeError("TTS service not initialized")
             
-        max_retries = self.config.get("max_retries", 3)
-        retry_delay = self.config.get("retry_delay", 2.0)
-        
-        for attempt in range(max_retries):
-            try:
-                response = await self.service_client.get(
-                    "/tts",
-                    params=params,
-                    timeout=self.request_timeout
-                )
+        async def _attempt(timeout: float) -> bytes:
+            async with self._client_slot(weights) as client, client.stream(
+                "GET",
+                "/tts",
+                params=params,
+                timeout=timeout
+            ) as response:
                 response.raise_for_status()
                 
-                # 收集所有数据
-                audio_data = b""
-                async for chunk in response.aiter_bytes(chunk_size=8192):
+                # 收集所有数据（bytearray 追加为均摊O(1)，避免 bytes 拼接的重复拷贝）
+                audio_data = bytearray()
+                async for chunk in response.aiter_bytes():
                     if chunk:
                         audio_data += chunk
-                
-                return audio_data
-                
-            except Exception as e:
-                self.logger.warning(f"TTS synthesis attempt {attempt + 1} failed: {e}")
-                
-                if attempt == max_retries - 1:
-                    raise
-                
-                # 重试延迟
-                await asyncio.sleep(retry_delay * (attempt + 1))
+            
+            if params.get("media_type") == "wav":
+                finalize_wav(audio_data)
+            return bytes(audio_data)
         
-        # 如果所有重试都失败，抛出异常
-        raise RuntimeError("TTS synthesis failed after all retries")
+        return await self.retry_policy.run(_attempt, self.request_timeout, label="TTS synthesis")
     
     
     async def set_character_weights(self, character: str, gpt_path: str, sovits_path: str) -> bool:
@@ -288,19 +748,12 @@ class TTSProxy:
             raise RuntimeError("TTS service not available")
         
         try:
-            # 设置GPT权重
-            gpt_response = await self.service_client.get(
-                "/set_gpt_weights",
-                params={"weights_path": gpt_path}
-            )
-            gpt_response.raise_for_status()
-            
-            # 设置SoVits权重
-            sovits_response = await self.service_client.get(
-                "/set_sovits_weights", 
-                params={"weights_path": sovits_path}
-            )
-            sovits_response.raise_for_status()
+            if self.scheduler.enabled and self.scheduler.has_backends:
+                # 经调度器在空闲实例上加载，不打断正在合成的其他角色请求
+                async with self._client_slot((gpt_path, sovits_path)):
+                    pass
+            else:
+                await self._switch_weights(self.service_client, (gpt_path, sovits_path))
             
             # 更新本地配置
             if character not in self.characters:
@@ -341,6 +794,16 @@ class TTSProxy:
         return self.characters.get(character)
     
     
+    def get_scheduler_metrics(self) -> Dict[str, Any]:
+        """
+        获取角色感知调度统计
+        
+        Returns:
+            Dict[str, Any]: 权重切换次数、等待时间与各实例加载的权重
+        """
+        return self.scheduler.get_metrics()
+    
+    
     async def check_health(self) -> bool:
         """
         检查TTS服务健康状态
@@ -367,6 +830,7 @@ class TTSProxy:
         try:
             if self.service_connector:
                 self.service_client = await self.service_connector.reconnect_service("tts_service")
+                await self._discover_instances()
                 self.logger.info("✅ TTS服务重连成功")
             else:
                 await self.initialize()
@@ -381,6 +845,9 @@ class TTSProxy:
         self.logger.info("清理TTS代理资源...")
         
         try:
+            await self._close_owned_clients()
+            self.instances = []
+            
             if self.service_connector:
                 await self.service_connector.cleanup()
                 
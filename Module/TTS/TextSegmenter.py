@@ -0,0 +1,89 @@
+"""
+TTS文本分段
+
+按标点把长文本切分为适合单次合成的句子段：
+- 在句末标点（。！？!?；;… 以及换行）处切分，标点保留在句尾
+- 英文句点只在后面是空白或文本结尾时视为句末，避免切开小数与缩写
+- 过短的句子与相邻句合并，减少请求数
+- 过长的句子先在逗号等次级标点处切分，仍然过长时按长度硬切
+"""
+
+import re
+from typing import List
+
+
+# 句末标点（含连续的结束引号/括号）
+_SENTENCE_END = re.compile(r"""(?:[。！？!?；;…]+|\.(?=\s|$)|\n+)[”’"'」』）)\]]*""")
+# 次级标点
+_CLAUSE_END = re.compile(r"[，,、：:]")
+
+
+def split_sentences(text: str, min_chars: int = 8, max_chars: int = 80) -> List[str]:
+    """
+    把文本切分为句子段
+
+    Args:
+        text: 原始文本
+        min_chars: 短于此长度的句子与后一句合并
+        max_chars: 单段最大长度
+
+    Returns:
+        List[str]: 按原顺序排列的非空句子段
+    """
+    sentences = []
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        sentences.append(text[start:match.end()])
+        start = match.end()
+    sentences.append(text[start:])
+
+    pieces = []
+    for sentence in sentences:
+        sentence = sentence.strip()
+        if sentence:
+            pieces.extend(_split_long(sentence, max_chars))
+
+    # 合并过短的句子
+    segments: List[str] = []
+    for piece in pieces:
+        if segments and (len(segments[-1]) < min_chars or len(piece) < min_chars) \
+                and len(segments[-1]) + len(piece) <= max_chars:
+            segments[-1] = _join(segments[-1], piece)
+        else:
+            segments.append(piece)
+    return segments
+
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    """把超长句子在次级标点处切分，仍超长时按长度硬切"""
+    if len(sentence) <= max_chars:
+        return [sentence]
+
+    parts = []
+    current = ""
+    start = 0
+    clauses = []
+    for match in _CLAUSE_END.finditer(sentence):
+        clauses.append(sentence[start:match.end()])
+        start = match.end()
+    clauses.append(sentence[start:])
+
+    for clause in clauses:
+        if current and len(current) + len(clause) > max_chars:
+            parts.append(current)
+            current = ""
+        current += clause
+        while len(current) > max_chars:
+            parts.append(current[:max_chars])
+            current = current[max_chars:]
+    if current:
+        parts.append(current)
+
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _join(left: str, right: str) -> str:
+    """拼接两段文本，英文之间保留空格"""
+    if left[-1].isascii() and right[0].isascii():
+        return f"{left} {right}"
+    return left + right
@@ -0,0 +1,285 @@
+"""
+产物目录管理
+
+TTS输出、用户上传文件、视觉服务的临时文件都写入本地目录且从不删除，
+磁盘会被逐渐占满，单个目录文件过多也会拖慢目录操作。ArtifactStore 提供：
+- 分片子目录：文件按名称哈希放入 ``<root>/<xx>/``，单个目录保持较小
+- 唯一文件名：同名上传不会互相覆盖，文件名中的路径成分被去除
+- 配额：按目录限制总字节数与文件数，超出时从最旧的文件开始删除
+- 过期：超过 max_age 的文件在清理时删除（清理在登记新文件时按需触发）
+- 引用计数：正在使用的文件（以及刚写入不久的文件）不会被删除
+"""
+
+import os
+import time
+import uuid
+import hashlib
+import asyncio
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Tuple, Iterator, Set
+from logging import Logger
+
+
+class ArtifactStore:
+    """
+    带配额的产物目录
+
+    同一目录在进程内应共享一个实例（见 get_artifact_store），引用计数才能生效。
+    """
+
+    def __init__(self, root: str, logger: Optional[Logger] = None, config: Optional[Dict[str, Any]] = None):
+        """
+        初始化产物目录
+
+        Args:
+            root: 目录路径，支持环境变量
+            logger: 日志记录器
+            config: 配额配置
+        """
+        config = config or {}
+        self.root = os.path.abspath(os.path.expandvars(root))
+        self.logger = logger
+
+        self.max_bytes: Optional[int] = config.get("max_bytes", 1024 * 1024 * 1024)
+        self.max_files: Optional[int] = config.get("max_files", 10000)
+        self.max_age: Optional[float] = config.get("max_age", 7 * 24 * 3600)
+        # 刚写入的文件可能正被其他进程读取（如返回给客户端的路径），宽限期内不删除
+        self.min_age: float = config.get("min_age", 600)
+        self.shard_chars: int = config.get("shard_chars", 2)
+        self.cleanup_interval: float = config.get("cleanup_interval", 300)
+
+        self._refs: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._cleanup_lock = threading.Lock()
+
+        # 两次清理之间新增的字节数与文件数（按最近一次扫描的结果估算当前占用）
+        self._bytes = 0
+        self._files = 0
+        self._last_cleanup = 0.0
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.removed_files = 0
+        self.removed_bytes = 0
+
+        os.makedirs(self.root, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # 路径
+    # ------------------------------------------------------------------
+    def new_path(self, filename: str) -> str:
+        """
+        为新文件分配路径（分片子目录 + 唯一前缀）
+
+        Args:
+            filename: 原始文件名，可包含客户端传来的路径成分
+
+        Returns:
+            str: 可写入的绝对路径
+        """
+        name = os.path.basename(filename.replace("\\", "/")) or "file"
+        unique = f"{uuid.uuid4().hex[:12]}_{name}"
+        shard = hashlib.sha1(unique.encode("utf-8")).hexdigest()[:self.shard_chars]
+        directory = os.path.join(self.root, shard) if self.shard_chars > 0 else self.root
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, unique)
+
+    def add(self, path: str):
+        """
+        登记已写入的文件，超出配额或到达清理间隔时触发清理
+
+        Args:
+            path: new_path 返回并已写入完成的路径
+        """
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+
+        with self._lock:
+            self._bytes += size
+            self._files += 1
+            over_quota = (self.max_bytes is not None and self._bytes > self.max_bytes) or \
+                         (self.max_files is not None and self._files > self.max_files)
+            due = time.monotonic() - self._last_cleanup >= self.cleanup_interval
+
+        if not (over_quota or due):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.cleanup()
+            return
+        # 在事件循环中调用时放到线程里清理，不阻塞调用方
+        task = loop.create_task(self.cleanup_async())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    # ------------------------------------------------------------------
+    # 引用
+    # ------------------------------------------------------------------
+    def acquire(self, path: str):
+        """标记文件正在使用，使用期间不会被清理"""
+        path = os.path.abspath(path)
+        with self._lock:
+            self._refs[path] = self._refs.get(path, 0) + 1
+
+    def release(self, path: str):
+        """释放 acquire 的引用"""
+        path = os.path.abspath(path)
+        with self._lock:
+            count = self._refs.get(path, 0) - 1
+            if count > 0:
+                self._refs[path] = count
+            else:
+                self._refs.pop(path, None)
+
+    @contextmanager
+    def ref(self, path: str) -> Iterator[str]:
+        """
+        在 with 块内持有文件引用
+
+        Yields:
+            str: 文件路径
+        """
+        self.acquire(path)
+        try:
+            yield path
+        finally:
+            self.release(path)
+
+    def in_use(self, path: str) -> bool:
+        with self._lock:
+            return self._refs.get(os.path.abspath(path), 0) > 0
+
+    # ------------------------------------------------------------------
+    # 清理
+    # ------------------------------------------------------------------
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        """列出目录下的所有文件 (mtime, size, path)"""
+        entries = []
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as iterator:
+                    for entry in iterator:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                stat = entry.stat(follow_symlinks=False)
+                                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+        return entries
+
+    def cleanup(self) -> Dict[str, int]:
+        """
+        按过期时间与配额删除文件（同步IO，异步代码中请用 cleanup_async）
+
+        Returns:
+            Dict[str, int]: 本次删除的文件数与字节数
+        """
+        if not self._cleanup_lock.acquire(blocking=False):
+            # 其他线程正在清理
+            return {"removed_files": 0, "removed_bytes": 0}
+
+        try:
+            now = time.time()
+            entries = sorted(self._scan())
+            total_bytes = sum(size for _, size, _ in entries)
+            total_files = len(entries)
+            removed_files = removed_bytes = 0
+
+            for mtime, size, path in entries:
+                age = now - mtime
+                expired = self.max_age is not None and age > self.max_age
+                over_quota = (self.max_bytes is not None and total_bytes > self.max_bytes) or \
+                             (self.max_files is not None and total_files > self.max_files)
+                if not expired and not over_quota:
+                    # 按修改时间从旧到新遍历，之后的文件既未过期也无需为配额删除
+                    break
+                if age < self.min_age or self.in_use(path):
+                    continue
+
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    self._log("warning", f"删除文件失败 {path}: {e}")
+                    continue
+
+                total_bytes -= size
+                total_files -= 1
+                removed_files += 1
+                removed_bytes += size
+
+            with self._lock:
+                self._bytes = total_bytes
+                self._files = total_files
+                self._last_cleanup = time.monotonic()
+                self.removed_files += removed_files
+                self.removed_bytes += removed_bytes
+
+            if removed_files:
+                self._log("info", f"清理 {self.root}: 删除 {removed_files} 个文件, {removed_bytes} 字节")
+            return {"removed_files": removed_files, "removed_bytes": removed_bytes}
+        finally:
+            self._cleanup_lock.release()
+
+    async def cleanup_async(self) -> Dict[str, int]:
+        """在线程中执行 cleanup"""
+        return await asyncio.to_thread(self.cleanup)
+
+    def _log(self, level: str, message: str):
+        if self.logger:
+            getattr(self.logger, level)(message)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        获取目录占用与清理统计
+
+        Returns:
+            Dict[str, Any]: 最近一次估算的占用、配额与累计删除量
+        """
+        with self._lock:
+            return {
+                "root": self.root,
+                "bytes": self._bytes,
+                "files": self._files,
+                "max_bytes": self.max_bytes,
+                "max_files": self.max_files,
+                "in_use": len(self._refs),
+                "removed_files": self.removed_files,
+                "removed_bytes": self.removed_bytes
+            }
+
+
+# 进程级的目录实例，同一目录共享引用计数与配额
+_stores: Dict[str, ArtifactStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_artifact_store(root: str, logger: Optional[Logger] = None,
+                       config: Optional[Dict[str, Any]] = None) -> ArtifactStore:
+    """
+    获取（或创建）指定目录的 ArtifactStore
+
+    Args:
+        root: 目录路径
+        logger: 日志记录器（仅在首次创建时使用）
+        config: 配额配置（仅在首次创建时使用）
+
+    Returns:
+        ArtifactStore: 该目录共享的实例
+    """
+    key = os.path.abspath(os.path.expandvars(root))
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = ArtifactStore(key, logger, config)
+        return store
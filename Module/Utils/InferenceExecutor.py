@@ -0,0 +1,230 @@
+"""
+模型服务的推理执行器
+
+SenseVoice / YOLO / SAM2 / CoTracker3 等服务在 async 路由中直接调用模型，
+一次推理会阻塞整个事件循环，连 /health 都无法响应，Consul 随之把服务标记为故障。
+InferenceExecutor 把推理放到专用工作线程中执行：
+- 有界队列：排队数超过上限时立即拒绝（InferenceQueueFull），由调用方返回503，背压显式可见
+- 单次请求超时：超时后返回 InferenceTimeout；尚未开始执行的任务直接跳过
+- 统计排队深度、排队耗时与执行耗时
+
+默认只有一个工作线程：GPU模型通常不能安全地并发调用（如 SAM2 的 set_image/predict），
+推理本身在 PyTorch 中会释放GIL，线程足以让事件循环保持响应。
+"""
+
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable, TypeVar
+from logging import Logger
+
+
+T = TypeVar("T")
+
+# 请求放弃后未执行的任务的返回值
+_SKIPPED = object()
+
+
+class InferenceQueueFull(RuntimeError):
+    """推理队列已满"""
+
+
+class InferenceTimeout(TimeoutError):
+    """推理在超时时间内未完成"""
+
+
+class _Job:
+    """一次推理任务的执行状态（在工作线程与事件循环之间共享）"""
+
+    def __init__(self):
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.abandoned = False
+        self.lock = threading.Lock()
+
+
+class InferenceExecutor:
+    """
+    推理执行器
+
+    用法::
+
+        executor = InferenceExecutor("yolo", max_queue=16, timeout=30)
+        results = await executor.run(model, frame)
+    """
+
+    def __init__(self, name: str = "inference", max_queue: int = 32, timeout: Optional[float] = 60.0,
+                 workers: int = 1, logger: Optional[Logger] = None):
+        """
+        初始化推理执行器
+
+        Args:
+            name: 名称，用作工作线程名前缀与日志标识
+            max_queue: 最多排队（不含正在执行）的任务数
+            timeout: 默认的单次请求超时（秒，含排队时间），None 表示不限
+            workers: 工作线程数
+            logger: 日志记录器
+        """
+        self.name = name
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.workers = max(1, workers)
+        self.logger = logger
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=name)
+
+        # 仅在事件循环线程中修改
+        self._pending = 0
+        self._running = 0
+
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.skipped = 0
+        self.total_queue_time = 0.0
+        self.total_run_time = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """等待执行的任务数"""
+        return max(0, self._pending - self._running)
+
+    async def run(self, func: Callable[..., T], *args, timeout: Optional[float] = ...,
+                  on_done: Optional[Callable[[], Any]] = None, reserved: bool = False, **kwargs) -> T:
+        """
+        在工作线程中执行推理
+
+        Args:
+            func: 同步推理函数
+            *args: 位置参数
+            timeout: 本次请求的超时（秒），不传时使用默认值，None 表示不限
+            on_done: 任务真正结束（执行完毕、被跳过或被拒绝）后在事件循环中调用，只调用一次。
+                请求超时后工作线程可能仍在执行，func 使用的资源应在这里释放
+            reserved: 调用方已通过专用名额限制了自身的并发（如视频任务），不受队列上限限制，
+                但仍计入队列深度，其他请求照常按上限拒绝
+            **kwargs: 关键字参数
+
+        Returns:
+            T: func 的返回值
+
+        Raises:
+            InferenceQueueFull: 排队任务数已达上限
+            InferenceTimeout: 超时
+        """
+        # 已提交但未完成的任务（含已超时但仍在执行的）占满工作线程与队列时拒绝
+        if not reserved and self._pending >= self.max_queue + self.workers:
+            self.rejected += 1
+            self._call_done(on_done)
+            raise InferenceQueueFull(f"{self.name} inference queue is full ({self.max_queue})")
+
+        if timeout is ...:
+            timeout = self.timeout
+
+        loop = asyncio.get_running_loop()
+        job = _Job()
+
+        def _execute():
+            with job.lock:
+                if job.abandoned:
+                    # 请求已超时或被取消，不再执行
+                    return _SKIPPED
+                job.started_at = time.monotonic()
+            loop.call_soon_threadsafe(self._on_started)
+            return func(*args, **kwargs)
+
+        self._pending += 1
+        future = loop.run_in_executor(self._executor, _execute)
+        future.add_done_callback(lambda f: self._on_done(job, f, on_done))
+
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self._abandon(job)
+            self.timeouts += 1
+            raise InferenceTimeout(f"{self.name} inference timed out after {timeout}s")
+        except asyncio.CancelledError:
+            self._abandon(job)
+            raise
+        return result
+
+    @staticmethod
+    def _abandon(job: _Job):
+        with job.lock:
+            job.abandoned = True
+
+    def _on_started(self):
+        self._running += 1
+
+    def _call_done(self, on_done: Optional[Callable[[], Any]]):
+        if on_done is None:
+            return
+        try:
+            on_done()
+        except Exception as e:
+            if self.logger:
+                self.logger.warning(f"{self.name} on_done 回调失败: {e}")
+
+    def _on_done(self, job: _Job, future: asyncio.Future, on_done: Optional[Callable[[], Any]] = None):
+        self._pending -= 1
+        self._call_done(on_done)
+        if job.started_at is None:
+            self.skipped += 1
+            return
+
+        self._running -= 1
+        finished = time.monotonic()
+        self.total_queue_time += job.started_at - job.enqueued_at
+        self.total_run_time += finished - job.started_at
+        if future.cancelled() or future.exception() is not None:
+            self.failed += 1
+            if job.abandoned and self.logger and not future.cancelled():
+                self.logger.warning(f"{self.name} 已超时的推理执行失败: {future.exception()}")
+        else:
+            self.completed += 1
+
+    def shutdown(self, wait: bool = False):
+        """关闭工作线程，未开始的任务被取消"""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        获取执行器统计
+
+        Returns:
+            Dict[str, Any]: 队列深度、拒绝/超时次数与平均排队、执行耗时
+        """
+        executed = self.completed + self.failed
+        return {
+            "name": self.name,
+            "queue_depth": self.queue_depth,
+            "running": self._running,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "skipped": self.skipped,
+            "avg_queue_time": self.total_queue_time / executed if executed else None,
+            "avg_run_time": self.total_run_time / executed if executed else None
+        }
+
+
+def add_inference_exception_handlers(app, retry_after: int = 1):
+    """
+    为 FastAPI 应用注册执行器异常的响应：队列满返回503（带 Retry-After），超时返回504
+
+    Args:
+        app: FastAPI 应用
+        retry_after: 503 响应建议的重试间隔（秒）
+    """
+    from fastapi import Request
+    from fastapi.responses import JSONResponse
+
+    @app.exception_handler(InferenceQueueFull)
+    async def _queue_full(request: Request, exc: InferenceQueueFull):
+        return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": str(retry_after)})
+
+    @app.exception_handler(InferenceTimeout)
+    async def _timeout(request: Request, exc: InferenceTimeout):
+        return JSONResponse({"detail": str(exc)}, status_code=504)
@@ -0,0 +1,226 @@
+"""
+模型服务端的动态微批处理
+
+并发到达的单个推理请求在服务端排队，由批处理工作协程合并后调用一次批量推理，
+再把结果按顺序分发回各请求：
+- 最早的请求等待满 max_wait 或凑满 max_batch_size 个条目后立即执行
+- 推理执行期间到达的请求自动进入下一批，负载越高批越大
+- 按分组键（如语言、采样率）分别成批，参数不同的请求不会混在一批
+"""
+
+import asyncio
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, List, Callable, Awaitable, Hashable, Deque, Generic, TypeVar
+from logging import Logger
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# (分组键, 条目列表) -> 与条目一一对应的结果
+BatchRunner = Callable[[Hashable, List[T]], Awaitable[List[R]]]
+
+_IDLE = object()
+
+
+@dataclass
+class _Pending(Generic[T]):
+    item: T
+    enqueued_at: float
+    future: asyncio.Future
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    动态微批处理器
+
+    runner 必须返回与输入条目数量相同、顺序一致的结果列表；
+    runner 抛出的异常会传给该批次的所有请求。
+    """
+
+    def __init__(self, runner: BatchRunner, config: Optional[Dict[str, Any]] = None,
+                 logger: Optional[Logger] = None):
+        """
+        初始化微批处理器
+
+        Args:
+            runner: 执行一批推理的协程函数
+            config: max_batch_size、max_wait_ms、max_concurrent_batches
+            logger: 日志记录器
+        """
+        config = config or {}
+        self.runner = runner
+        self.logger = logger
+
+        self.max_batch_size: int = max(1, config.get("max_batch_size", 16))
+        self.max_wait: float = config.get("max_wait_ms", 10) / 1000
+        # 同时执行的批次数；单卡推理通常为1，执行期间的请求留给下一批
+        self.max_concurrent_batches: int = max(1, config.get("max_concurrent_batches", 1))
+
+        # 分组键 -> 排队条目，按分组首次出现的顺序排列
+        self._queues: "OrderedDict[Hashable, Deque[_Pending]]" = OrderedDict()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._workers: List[asyncio.Task] = []
+
+        self.batches = 0
+        self.items = 0
+        self.max_observed_batch = 0
+        self.total_wait = 0.0
+
+    # ------------------------------------------------------------------
+    # 提交
+    # ------------------------------------------------------------------
+    async def submit(self, item: T, group: Hashable = None) -> R:
+        """
+        提交单个条目并等待结果
+
+        Args:
+            item: 推理输入
+            group: 分组键，只有相同分组的条目会合并为一批
+
+        Returns:
+            R: 该条目的推理结果
+        """
+        return (await self.submit_many([item], group))[0]
+
+    async def submit_many(self, items: List[T], group: Hashable = None) -> List[R]:
+        """
+        提交多个条目并等待全部结果（条目可能被分到不同批次）
+
+        Args:
+            items: 推理输入列表
+            group: 分组键
+
+        Returns:
+            List[R]: 与 items 一一对应的结果
+        """
+        if not items:
+            return []
+        self._ensure_workers()
+
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        pendings = [_Pending(item, now, loop.create_future()) for item in items]
+        self._queues.setdefault(group, deque()).extend(pendings)
+        self._wakeup.set()
+
+        try:
+            return list(await asyncio.gather(*(p.future for p in pendings)))
+        except asyncio.CancelledError:
+            # 调用方取消：尚未执行的条目不再推理
+            for pending in pendings:
+                pending.future.cancel()
+            raise
+
+    def _ensure_workers(self):
+        if self._workers and not all(worker.done() for worker in self._workers):
+            return
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrent_batches)]
+
+    # ------------------------------------------------------------------
+    # 成批与执行
+    # ------------------------------------------------------------------
+    def _drop_cancelled(self):
+        for group in list(self._queues):
+            queue = self._queues[group]
+            while queue and queue[0].future.done():
+                queue.popleft()
+            if not queue:
+                del self._queues[group]
+
+    def _oldest_group(self) -> Hashable:
+        """排队最久的分组；没有排队条目时返回 _IDLE（分组键本身可以是None）"""
+        self._drop_cancelled()
+        if not self._queues:
+            return _IDLE
+        return min(self._queues, key=lambda g: self._queues[g][0].enqueued_at)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            group = self._oldest_group()
+            if group is _IDLE:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            # 等待凑批：最早的条目等满 max_wait，或该分组已凑满一批
+            deadline = self._queues[group][0].enqueued_at + self.max_wait
+            while len(self._queues.get(group, ())) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            queue = self._queues.get(group)
+            if not queue:
+                continue
+            batch: List[_Pending] = []
+            while queue and len(batch) < self.max_batch_size:
+                pending = queue.popleft()
+                if not pending.future.done():
+                    batch.append(pending)
+            if not queue:
+                self._queues.pop(group, None)
+            if not batch:
+                continue
+
+            # 其他工作协程可能在等待新条目
+            if self._queues:
+                self._wakeup.set()
+            await self._run_batch(group, batch, loop.time())
+
+    async def _run_batch(self, group: Hashable, batch: List[_Pending], started: float):
+        self.batches += 1
+        self.items += len(batch)
+        self.max_observed_batch = max(self.max_observed_batch, len(batch))
+        self.total_wait += sum(started - p.enqueued_at for p in batch)
+
+        try:
+            results = await self.runner(group, [p.item for p in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"Batch runner returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"批量推理失败（{len(batch)} 条）: {e}")
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+
+        for pending, result in zip(batch, results):
+            if not pending.future.done():
+                pending.future.set_result(result)
+
+    async def close(self):
+        """停止工作协程，排队中的请求以取消结束"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for queue in self._queues.values():
+            for pending in queue:
+                pending.future.cancel()
+        self._queues.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        获取合批统计
+
+        Returns:
+            Dict[str, Any]: 批次数、平均批大小、平均排队时间与当前排队条目数
+        """
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else None,
+            "max_batch_size": self.max_observed_batch,
+            "avg_queue_wait": self.total_wait / self.items if self.items else None,
+            "queued": sum(len(queue) for queue in self._queues.values())
+        }
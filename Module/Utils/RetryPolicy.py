@@ -0,0 +1,265 @@
+"""
+重试策略
+
+LLMProxy / TTSProxy / STTProxy 共用的重试逻辑：
+- 错误分类：只重试连接错误、超时、429 与 5xx；4xx（如模型不存在、参数错误）直接失败
+- 带抖动的指数退避（full jitter），避免大量请求在同一时刻重试
+- 进程级重试预算：一个时间窗口内重试次数不超过请求数的一定比例，
+  后端故障时不会因为重试而成倍放大负载
+- 单次调用的截止时间：重试与每次尝试的超时都不会超过截止时间
+"""
+
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, Callable, Awaitable, TypeVar, Deque
+from logging import Logger
+
+import httpx
+
+
+T = TypeVar("T")
+
+# 可重试的HTTP状态码：请求超时、过早、限流、网关与服务端暂时性错误
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class RetryDeadlineExceeded(TimeoutError):
+    """调用已超过截止时间"""
+
+
+def is_retryable(e: BaseException) -> bool:
+    """
+    判断错误是否值得重试
+
+    Args:
+        e: 异常
+
+    Returns:
+        bool: 连接错误、超时、429 与 5xx（501除外）返回True
+    """
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code in RETRYABLE_STATUS_CODES
+    if isinstance(e, (httpx.UnsupportedProtocol, RetryDeadlineExceeded)):
+        return False
+    return isinstance(e, (httpx.TransportError, asyncio.TimeoutError))
+
+
+class RetryBudget:
+    """
+    重试预算
+
+    在滑动窗口内统计请求数与重试数，允许的重试数为
+    ``min_retries + ratio * 请求数``。
+    """
+
+    def __init__(self, ratio: float = 0.1, min_retries: int = 10, window: float = 10.0):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+
+        self._requests: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _trim(self, now: float):
+        for history in (self._requests, self._retries):
+            while history and now - history[0] > self.window:
+                history.popleft()
+
+    def record_request(self):
+        """记录一次新的调用（不含重试）"""
+        now = time.monotonic()
+        with self._lock:
+            self._requests.append(now)
+            self._trim(now)
+
+    def try_acquire(self) -> bool:
+        """申请一次重试，预算不足时返回False"""
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            if len(self._retries) >= self.min_retries + self.ratio * len(self._requests):
+                self.rejected += 1
+                return False
+            self._retries.append(now)
+            return True
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            self._trim(time.monotonic())
+            return {
+                "requests": len(self._requests),
+                "retries": len(self._retries),
+                "rejected": self.rejected
+            }
+
+
+_budgets: Dict[str, RetryBudget] = {}
+_budgets_lock = threading.Lock()
+
+
+def get_retry_budget(name: str, ratio: float = 0.1, min_retries: int = 10, window: float = 10.0) -> RetryBudget:
+    """
+    获取进程内共享的重试预算，同名预算只创建一次
+
+    Args:
+        name: 预算名称，通常为后端服务名
+        ratio: 允许的重试比例
+        min_retries: 窗口内至少允许的重试数（低流量时不至于完全不能重试）
+        window: 统计窗口（秒）
+
+    Returns:
+        RetryBudget: 重试预算
+    """
+    with _budgets_lock:
+        budget = _budgets.get(name)
+        if budget is None:
+            budget = _budgets[name] = RetryBudget(ratio, min_retries, window)
+        return budget
+
+
+class RetryState:
+    """单次调用的重试状态"""
+
+    def __init__(self, policy: "RetryPolicy", deadline: Optional[float]):
+        self.policy = policy
+        self.deadline = deadline
+        self.attempt = 0
+
+    def remaining(self) -> Optional[float]:
+        """距截止时间的剩余秒数，无截止时间时为None"""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def timeout(self, default: float) -> float:
+        """本次尝试的超时：不超过剩余时间"""
+        remaining = self.remaining()
+        if remaining is None:
+            return default
+        if remaining <= 0:
+            raise RetryDeadlineExceeded("调用已超过截止时间")
+        return min(default, remaining)
+
+    def next_delay(self, e: BaseException, failover: bool = False) -> Optional[float]:
+        """
+        判断是否重试，并给出重试前的等待时间
+
+        Args:
+            e: 本次尝试的异常
+            failover: 是否转移到另一个后端（转移时不等待）
+
+        Returns:
+            Optional[float]: 等待秒数；不应重试时返回None
+        """
+        policy = self.policy
+        self.attempt += 1
+
+        if not is_retryable(e):
+            return None
+        if self.attempt >= policy.max_attempts:
+            return None
+
+        delay = 0.0 if failover else policy.backoff(self.attempt)
+        remaining = self.remaining()
+        if remaining is not None and delay >= remaining:
+            return None
+
+        if not policy.budget.try_acquire():
+            policy.logger.warning(f"{policy.name} 重试预算已耗尽，放弃重试: {e}")
+            return None
+        return delay
+
+
+class RetryPolicy:
+    """
+    重试策略
+
+    由各服务代理持有，配置项（均可省略）::
+
+        retry:
+          max_attempts: 3        # 总尝试次数（含首次）
+          base_delay: 0.5        # 退避基数（秒）
+          max_delay: 8.0         # 单次退避上限（秒）
+          deadline: null         # 单次调用默认截止时间（秒），null 表示不限制
+          budget_ratio: 0.1      # 重试数不超过请求数的比例
+          budget_min_retries: 10 # 窗口内至少允许的重试数
+          budget_window: 10.0    # 预算统计窗口（秒）
+    """
+
+    def __init__(self, logger: Logger, name: str, config: Optional[Dict[str, Any]] = None):
+        """
+        初始化重试策略
+
+        Args:
+            logger: 日志记录器
+            name: 策略名称，同名策略共享重试预算
+            config: 重试配置
+        """
+        self.logger = logger
+        self.name = name
+        config = config or {}
+
+        self.max_attempts: int = max(1, config.get("max_attempts", 3))
+        self.base_delay: float = config.get("base_delay", 0.5)
+        self.max_delay: float = config.get("max_delay", 8.0)
+        self.default_deadline: Optional[float] = config.get("deadline")
+
+        self.budget = get_retry_budget(
+            name,
+            ratio=config.get("budget_ratio", 0.1),
+            min_retries=config.get("budget_min_retries", 10),
+            window=config.get("budget_window", 10.0)
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次重试前的等待时间（full jitter 指数退避）"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def start(self, deadline: Optional[float] = None) -> RetryState:
+        """
+        开始一次调用
+
+        Args:
+            deadline: 本次调用的截止时间（秒），为空时使用默认值
+
+        Returns:
+            RetryState: 重试状态
+        """
+        self.budget.record_request()
+        timeout = deadline if deadline is not None else self.default_deadline
+        return RetryState(self, time.monotonic() + timeout if timeout is not None else None)
+
+    async def run(self, func: Callable[[float], Awaitable[T]], request_timeout: float,
+                  deadline: Optional[float] = None, label: str = "request") -> T:
+        """
+        按策略执行请求
+
+        Args:
+            func: 接收本次尝试超时时间的协程函数
+            request_timeout: 单次尝试的默认超时
+            deadline: 本次调用的截止时间（秒）
+            label: 日志中的请求描述
+
+        Returns:
+            T: func 的返回值
+        """
+        state = self.start(deadline)
+        while True:
+            try:
+                return await func(state.timeout(request_timeout))
+            except Exception as e:
+                delay = state.next_delay(e)
+                if delay is None:
+                    self.logger.error(f"{label} failed (attempt {state.attempt}): {e}")
+                    raise
+                self.logger.warning(f"{label} attempt {state.attempt} failed, retrying in {delay:.2f}s: {e}")
+                await asyncio.sleep(delay)
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取重试预算使用情况"""
+        return {"name": self.name, **self.budget.get_status()}
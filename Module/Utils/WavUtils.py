@@ -0,0 +1,138 @@
+"""
+WAV头处理
+
+GPT-SoVITS 在 streaming_mode 下先返回一个数据长度为0的WAV头，之后是原始PCM。
+这里提供：
+- 解析（可能不完整的）WAV头，得到音频格式与PCM数据起始位置
+- 生成流式WAV头（长度字段为 0xFFFFFFFF，播放器按"长度未知"处理）
+- 数据接收完毕后回填RIFF与data块的长度
+
+TTS（流式输出、转码）与 STT（上传音频解码、静音裁剪）共用，放在 Module.Utils 中，STT 不依赖 TTS 模块。
+"""
+
+import struct
+from dataclasses import dataclass
+from typing import Optional, Tuple, Union
+
+
+# 流式WAV头的长度占位值
+STREAMING_SIZE = 0xFFFFFFFF
+
+
+@dataclass
+class WavFormat:
+    """PCM音频格式"""
+    sample_rate: int = 32000
+    channels: int = 1
+    bits_per_sample: int = 16
+    audio_format: int = 1  # 1 = PCM
+
+    @property
+    def block_align(self) -> int:
+        return self.channels * self.bits_per_sample // 8
+
+    @property
+    def byte_rate(self) -> int:
+        return self.sample_rate * self.block_align
+
+
+def build_wav_header(fmt: WavFormat, data_size: Optional[int] = None) -> bytes:
+    """
+    生成44字节的标准WAV头
+
+    Args:
+        fmt: 音频格式
+        data_size: PCM数据字节数，为空时生成流式WAV头
+
+    Returns:
+        bytes: WAV头
+    """
+    if data_size is None:
+        riff_size = data_field = STREAMING_SIZE
+    else:
+        riff_size = 36 + data_size
+        data_field = data_size
+
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", riff_size, b"WAVE",
+        b"fmt ", 16, fmt.audio_format, fmt.channels, fmt.sample_rate,
+        fmt.byte_rate, fmt.block_align, fmt.bits_per_sample,
+        b"data", data_field
+    )
+
+
+def parse_wav_header(buf: Union[bytes, bytearray]) -> Optional[Tuple[WavFormat, int]]:
+    """
+    解析WAV头
+
+    Args:
+        buf: 音频数据的开头部分
+
+    Returns:
+        Optional[Tuple[WavFormat, int]]: (音频格式, PCM数据起始偏移)；数据不足以解析时返回None
+
+    Raises:
+        ValueError: 不是 RIFF/WAVE 数据
+    """
+    if len(buf) < 12:
+        return None
+    if buf[:4] != b"RIFF" or buf[8:12] != b"WAVE":
+        raise ValueError("Not a RIFF/WAVE stream")
+
+    pos = 12
+    fmt: Optional[WavFormat] = None
+    while True:
+        if len(buf) < pos + 8:
+            return None
+        chunk_id, size = struct.unpack_from("<4sI", buf, pos)
+        if chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV data chunk found before fmt chunk")
+            return fmt, pos + 8
+        if len(buf) < pos + 8 + size:
+            return None
+        if chunk_id == b"fmt ":
+            audio_format, channels, sample_rate, _, _, bits = struct.unpack_from("<HHIIHH", buf, pos + 8)
+            fmt = WavFormat(sample_rate, channels, bits, audio_format)
+        # 块长度为奇数时有1字节填充
+        pos += 8 + size + (size & 1)
+
+
+def finalize_wav(data: bytearray) -> bytearray:
+    """
+    按实际长度回填完整WAV数据的RIFF与data块长度（原地修改）
+
+    非WAV数据原样返回。
+    """
+    try:
+        parsed = parse_wav_header(data)
+    except ValueError:
+        return data
+    if parsed is None:
+        return data
+
+    _, offset = parsed
+    struct.pack_into("<I", data, 4, len(data) - 8)
+    struct.pack_into("<I", data, offset - 4, len(data) - offset)
+    return data
+
+
+def finalize_wav_file(path: str):
+    """按文件实际大小回填WAV文件头的长度字段（同步IO）"""
+    with open(path, "r+b") as f:
+        head = bytearray(f.read(4096))
+        try:
+            parsed = parse_wav_header(head)
+        except ValueError:
+            return
+        if parsed is None:
+            return
+
+        _, offset = parsed
+        f.seek(0, 2)
+        file_size = f.tell()
+        f.seek(4)
+        f.write(struct.pack("<I", file_size - 8))
+        f.seek(offset - 4)
+        f.write(struct.pack("<I", file_size - offset))
@@ -0,0 +1,305 @@
+"""
+YOLO视频推理流水线
+
+原来的视频处理逐帧读取、逐帧推理，写完整个输出文件后才开始响应，解码、推理、编码串行执行。
+这里把三个阶段拆开并行：
+- 解码线程读取视频帧（可按 stride 抽帧），放入有界队列
+- 推理阶段每次取出已解码的帧（最多 batch_size 帧）合并为一次模型调用
+- 编码线程绘制预测结果，写入 ffmpeg（输出分片MP4，边编码边发送）或本地视频文件
+阶段之间的队列都有上限，下游变慢时上游等待，内存占用不随视频长度增长。
+"""
+
+import queue
+import shutil
+import asyncio
+import threading
+import subprocess
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import Any, Optional, List, Tuple, Callable, Awaitable, AsyncIterator, AsyncGenerator
+
+import cv2
+
+
+# 队列中表示数据结束的标记
+_END = object()
+
+
+@dataclass
+class VideoInfo:
+    """视频基本信息"""
+    fps: float
+    width: int
+    height: int
+    frame_count: int
+
+
+def probe_video(path: str) -> Optional[VideoInfo]:
+    """
+    读取视频信息（同步IO）
+
+    Returns:
+        Optional[VideoInfo]: 无法打开时返回None
+    """
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return None
+        return VideoInfo(
+            fps=cap.get(cv2.CAP_PROP_FPS) or 25.0,
+            width=int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            height=int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            frame_count=int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        )
+    finally:
+        cap.release()
+
+
+def _put(q: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    """在 stop 被设置前把 item 放入有界队列，返回是否放入"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: queue.Queue, stop: threading.Event) -> Any:
+    """从队列取出一项；stop 被设置时返回 _END"""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _END
+
+
+class VideoPipeline:
+    """
+    解码与批量推理
+
+    infer(frames) 为执行一批推理的协程函数，返回与 frames 一一对应的结果。
+    """
+
+    def __init__(self, infer: Callable[[List[Any]], Awaitable[List[Any]]],
+                 batch_size: int = 8, queue_size: int = 32, stride: int = 1):
+        """
+        初始化流水线
+
+        Args:
+            infer: 批量推理协程函数
+            batch_size: 单次推理的最大帧数
+            queue_size: 已解码帧队列的上限
+            stride: 抽帧间隔，每 stride 帧推理一帧
+        """
+        self.infer = infer
+        self.batch_size = max(1, batch_size)
+        self.queue_size = max(self.batch_size, queue_size)
+        self.stride = max(1, stride)
+
+        self.frames = 0
+        self.batches = 0
+
+    async def detect(self, path: str) -> AsyncGenerator[Tuple[int, Any], None]:
+        """
+        按帧顺序产出推理结果
+
+        Args:
+            path: 视频文件路径
+
+        Yields:
+            Tuple[int, Any]: (原视频中的帧序号, 该帧的推理结果)
+        """
+        decoded: queue.Queue = queue.Queue(self.queue_size)
+        stop = threading.Event()
+        decoder = threading.Thread(target=self._decode, args=(path, decoded, stop), name="video-decode", daemon=True)
+        decoder.start()
+
+        try:
+            ended = False
+            while not ended:
+                # 等到至少一帧，再取出队列中已就绪的帧组成一批：解码快于推理时批次自然变大
+                batch: List[Tuple[int, Any]] = []
+                item = await asyncio.to_thread(_get, decoded, stop)
+                while True:
+                    if item is _END:
+                        ended = True
+                        break
+                    if isinstance(item, BaseException):
+                        raise item
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = decoded.get_nowait()
+                    except queue.Empty:
+                        break
+
+                if batch:
+                    results = await self.infer([frame for _, frame in batch])
+                    self.frames += len(batch)
+                    self.batches += 1
+                    for (index, _), result in zip(batch, results):
+                        yield index, result
+        finally:
+            stop.set()
+            await asyncio.to_thread(decoder.join)
+
+    def _decode(self, path: str, decoded: queue.Queue, stop: threading.Event):
+        """解码线程"""
+        cap = cv2.VideoCapture(path)
+        try:
+            index = 0
+            while not stop.is_set():
+                if index % self.stride == 0:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    if not _put(decoded, (index, frame), stop):
+                        return
+                elif not cap.grab():
+                    # 跳过的帧只抓取，不做颜色转换
+                    break
+                index += 1
+            _put(decoded, _END, stop)
+        except Exception as e:
+            _put(decoded, e, stop)
+        finally:
+            cap.release()
+
+
+class AnnotatedVideoEncoder:
+    """
+    把推理结果绘制为视频
+
+    ``stream`` 通过 ffmpeg 输出分片MP4（fragmented MP4），每编码完一个分片即可发送；
+    找不到 ffmpeg 时用 ``write_file`` 以 OpenCV 写入本地文件。
+    """
+
+    def __init__(self, ffmpeg: str = "ffmpeg", codec: str = "libx264", queue_size: int = 32,
+                 chunk_size: int = 64 * 1024):
+        """
+        初始化编码器
+
+        Args:
+            ffmpeg: ffmpeg 可执行文件
+            codec: 视频编码器
+            queue_size: 待绘制帧队列的上限
+            chunk_size: 输出数据块大小
+        """
+        self.ffmpeg = ffmpeg
+        self.codec = codec
+        self.queue_size = queue_size
+        self.chunk_size = chunk_size
+        self.available = shutil.which(ffmpeg) is not None
+
+    def _ffmpeg_args(self, width: int, height: int, fps: float) -> List[str]:
+        return [
+            self.ffmpeg, "-hide_banner", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", f"{fps:.3f}",
+            "-i", "pipe:0",
+            # yuv420p 要求宽高为偶数
+            "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+            "-c:v", self.codec, "-preset", "veryfast", "-pix_fmt", "yuv420p",
+            "-movflags", "frag_keyframe+empty_moov+default_base_moof",
+            "-f", "mp4", "pipe:1"
+        ]
+
+    async def stream(self, items: AsyncIterator[Tuple[int, Any]], width: int, height: int,
+                     fps: float) -> AsyncGenerator[bytes, None]:
+        """
+        边推理边编码
+
+        Args:
+            items: VideoPipeline.detect 的输出
+            width: 帧宽度
+            height: 帧高度
+            fps: 输出帧率
+
+        Yields:
+            bytes: 分片MP4数据
+        """
+        process = subprocess.Popen(self._ffmpeg_args(width, height, fps),
+                                   stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        encoder = asyncio.create_task(self._encode(
+            items,
+            lambda frame: process.stdin.write(frame.tobytes()),
+            process.stdin.close
+        ))
+        try:
+            while chunk := await asyncio.to_thread(process.stdout.read1, self.chunk_size):
+                yield chunk
+
+            # 推理或绘制阶段的异常在这里抛出
+            await encoder
+            stderr = await asyncio.to_thread(process.stderr.read)
+            if await asyncio.to_thread(process.wait) != 0:
+                raise RuntimeError(f"ffmpeg exited with {process.returncode}: {stderr.decode(errors='replace')[-500:]}")
+        finally:
+            if not encoder.done():
+                encoder.cancel()
+                await asyncio.gather(encoder, return_exceptions=True)
+            if process.poll() is None:
+                process.kill()
+                await asyncio.to_thread(process.wait)
+
+    async def write_file(self, items: AsyncIterator[Tuple[int, Any]], path: str, width: int, height: int, fps: float):
+        """
+        绘制并写入本地视频文件
+
+        Args:
+            items: VideoPipeline.detect 的输出
+            path: 输出文件路径
+            width: 帧宽度
+            height: 帧高度
+            fps: 输出帧率
+        """
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+        try:
+            await self._encode(items, writer.write, lambda: None)
+        finally:
+            writer.release()
+
+    async def _encode(self, items: AsyncIterator[Tuple[int, Any]], write: Callable[[Any], Any], close: Callable[[], Any]):
+        """把推理结果送入编码线程绘制并写出"""
+        pending: queue.Queue = queue.Queue(self.queue_size)
+        stop = threading.Event()
+        errors: List[BaseException] = []
+
+        def _worker():
+            try:
+                while (item := _get(pending, stop)) is not _END:
+                    _, result = item
+                    write(result.plot())  # 绘制预测结果
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                try:
+                    close()
+                except (BrokenPipeError, OSError):
+                    pass
+
+        worker = threading.Thread(target=_worker, name="video-encode", daemon=True)
+        worker.start()
+        try:
+            async with aclosing(items):
+                async for item in items:
+                    if stop.is_set():
+                        break
+                    try:
+                        pending.put_nowait(item)
+                    except queue.Full:
+                        # 编码跟不上时等待，推理随之放慢
+                        await asyncio.to_thread(_put, pending, item, stop)
+            await asyncio.to_thread(_put, pending, _END, stop)
+            await asyncio.to_thread(worker.join)
+        finally:
+            stop.set()
+            if worker.is_alive():
+                await asyncio.to_thread(worker.join)
+
+        if errors and not isinstance(errors[0], BrokenPipeError):
+            raise errors[0]
@@ -100,6 +100,28 @@ class YOLO11Agent:
         self._send_image_for_prediction(file_path,
                                         output_filename=datetime.now().strftime('%Y-%m-%d_%H-%M-%S') + '.jpg')
 
+    def detect_objects(self, file_paths: list):
+        """
+        检测多张图像中的物体，只返回检测结果（不生成绘制后的图像）
+
+        Returns:
+            list: 与 file_paths 一一对应的 {"filename", "width", "height", "detections"}，请求失败时为None
+        """
+        files = []
+        try:
+            for file_path in file_paths:
+                files.append(("files", (os.path.basename(file_path), open(file_path, "rb"))))
+            response = requests.post(self.image_server_url + "s", files=files, params={"format": "json"}, timeout=100)
+            if response.status_code == 200:
+                return response.json()["results"]
+            logging.error("请求失败，状态码: %s", response.status_code)
+        except (OSError, requests.exceptions.RequestException) as e:
+            logging.error("请求过程中出现异常: %s", e)
+        finally:
+            for _, (_, f) in files:
+                f.close()
+        return None
+
     def _send_video_for_prediction(self, file_path:str, output_filename=None):
         """发送视频文件进行预测"""
         if output_filename is None:
@@ -1,15 +1,31 @@
-from fastapi import FastAPI, UploadFile, File, WebSocket, WebSocketDisconnect
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, UploadFile, File, Query, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, Response
 from ultralytics import YOLO
 import uvicorn
 import shutil
+import sys
 import os
+import json
+import time
+import weakref
+import logging
+import asyncio
+import zipfile
 from io import BytesIO
-from PIL import Image
+from collections import deque
+from typing import List, Dict, Any, Optional, Tuple
 import cv2
 import numpy as np
 import argparse
 
+# 可以在任意工作目录中单独启动，Module.* 从 agent 仓库根目录（AGENT_HOME，未设置时按本文件位置推算）导入
+sys.path.append(os.environ.get("AGENT_HOME") or os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+from Module.Utils.ArtifactStore import get_artifact_store
+from Module.Utils.InferenceExecutor import InferenceExecutor, InferenceQueueFull, InferenceTimeout, add_inference_exception_handlers
+from Module.Utils.MicroBatcher import MicroBatcher
+from Module.Utils.yolo11.VideoPipeline import VideoPipeline, AnnotatedVideoEncoder, probe_video
+
 """
     YOLO11的fastapi服务端，封装在一个类中
         默认监听0.0.0.0
@@ -19,120 +35,430 @@ import argparse
         该文件应在agent启动时一并启动或者在需要时才启动！！！
 """
 
+logger = logging.getLogger("yolo_server")
+
+
+
+class _StreamSession:
+    """单个视频流连接的状态：只保留最新一帧，并统计处理帧率与延迟"""
+
+    def __init__(self, session_id: int, fps_window: int = 30):
+        self.session_id = session_id
+        self.latest: Optional[Tuple[bytes, float, int]] = None  # (帧数据, 接收时间, 帧序号)
+        self.ready = asyncio.Event()
+        self.closed = False
+
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.lag: Optional[float] = None    # 接收到发送结果的延迟（秒，指数平均）
+        self._sent_at = deque(maxlen=fps_window)
+
+    def push(self, frame: bytes):
+        """收到新帧；尚未处理的旧帧直接丢弃"""
+        if self.latest is not None:
+            self.dropped += 1
+        self.received += 1
+        self.latest = (frame, time.monotonic(), self.received)
+        self.ready.set()
+
+    def take(self) -> Optional[Tuple[bytes, float, int]]:
+        latest, self.latest = self.latest, None
+        self.ready.clear()
+        return latest
+
+    def record(self, received_at: float):
+        now = time.monotonic()
+        self.processed += 1
+        self._sent_at.append(now)
+        lag = now - received_at
+        self.lag = lag if self.lag is None else 0.8 * self.lag + 0.2 * lag
+
+    @property
+    def fps(self) -> Optional[float]:
+        if len(self._sent_at) < 2:
+            return None
+        elapsed = self._sent_at[-1] - self._sent_at[0]
+        return (len(self._sent_at) - 1) / elapsed if elapsed > 0 else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "fps": round(self.fps, 2) if self.fps is not None else None,
+            "lag_ms": round(self.lag * 1000, 1) if self.lag is not None else None,
+            "received": self.received,
+            "processed": self.processed,
+            "dropped": self.dropped
+        }
 
 
 class YOLOServer:
     def __init__(self, 
                  model_path: str = "home/yomu/agent/Module/Utils/yolo11/models/yolo11n.pt",
                  host: str = "127.0.0.1",
-                 port: int = 8300):
+                 port: int = 8300,
+                 temp_dir: str = "temp",
+                 temp_quota: dict = None,
+                 max_queue: int = 16,
+                 inference_timeout: float = 30.0,
+                 max_batch_images: int = 16,
+                 video_batch_size: int = 8,
+                 video_queue_size: int = 32,
+                 max_concurrent_videos: int = 2,
+                 stream_batch_size: int = 8,
+                 stream_batch_wait_ms: float = 5):
         """
         初始化 YOLO 服务器。
 
         :param model_path: YOLO 模型的路径
         :param port: 服务器运行的端口
+        :param temp_dir: 上传文件与输出视频的临时目录
+        :param temp_quota: 临时目录的配额（max_bytes/max_files/max_age），超出时清理最旧的文件
+        :param max_queue: 推理队列上限，超出时返回503
+        :param inference_timeout: 单张图像/单帧推理的超时（秒），超时返回504
+        :param max_batch_images: 多图请求单次模型调用的最大图像数
+        :param video_batch_size: 视频单次推理的最大帧数
+        :param video_queue_size: 视频流水线各阶段之间队列的上限（帧）
+        :param max_concurrent_videos: 同时处理的视频数，超出时返回503
+        :param stream_batch_size: 多个视频流连接的帧合并推理的最大帧数
+        :param stream_batch_wait_ms: 视频流凑批的最长等待时间（毫秒）
         """
         self.app = FastAPI()  # 创建 FastAPI 应用实例
         self.model = YOLO(model_path)  # 加载 YOLO 模型
         self.host = host    
         self.port = port  # 设置服务器端口
+        self.temp_store = get_artifact_store(temp_dir, config=temp_quota or {"max_bytes": 2 * 1024 ** 3, "max_age": 3600, "min_age": 60})
+        # 推理在专用线程中执行，事件循环（含 /health 与 WebSocket）保持响应
+        self.executor = InferenceExecutor("yolo", max_queue=max_queue, timeout=inference_timeout, logger=logger)
+        self.max_batch_images = max_batch_images
+        # 视频按 解码 -> 批量推理 -> 绘制编码 流水线处理，找不到 ffmpeg 时输出到临时文件后再发送
+        self.video_batch_size = video_batch_size
+        self.video_queue_size = video_queue_size
+        self.video_encoder = AnnotatedVideoEncoder(queue_size=video_queue_size)
+        # 每个视频同一时刻只有一批帧在推理队列中，按视频数限制后视频最多占用 max_concurrent_videos 个队列位置
+        self.max_concurrent_videos = max_concurrent_videos
+        self.active_videos = 0
+        # 视频流：每个连接只处理最新一帧，不同连接的帧合并为一次模型调用
+        self.stream_batcher = MicroBatcher(self._infer_stream_batch, {
+            "max_batch_size": stream_batch_size,
+            "max_wait_ms": stream_batch_wait_ms
+        })
+        self.stream_sessions: Dict[int, _StreamSession] = {}
+        self._next_session_id = 0
+        add_inference_exception_handlers(self.app)
         self.setup_routes()  # 设置路由
 
     def setup_routes(self):
         """设置 API 路由"""
+        @self.app.get("/health")
+        async def health_check():
+            return {"status": "healthy", "inference": self.executor.get_metrics(),
+                    "videos": {"active": self.active_videos, "max": self.max_concurrent_videos}}
+
+        @self.app.get("/metrics/stream")
+        async def stream_metrics():
+            return {
+                "batching": self.stream_batcher.get_metrics(),
+                "sessions": {session_id: session.stats() for session_id, session in self.stream_sessions.items()}
+            }
+
         @self.app.post("/predict/image")
-        async def predict_image(file: UploadFile = File(...)):
-            """处理图像预测请求"""
-            return await self._predict_image(file)
+        async def predict_image(file: UploadFile = File(...), format: str = Query("jpeg")):
+            """处理图像预测请求，format=json 时只返回检测结果"""
+            return await self._predict_image(file, format)
+
+        @self.app.post("/predict/images")
+        async def predict_images(files: List[UploadFile] = File(...), format: str = Query("json")):
+            """处理多图预测请求，所有图像合并为一次模型调用"""
+            return await self._predict_images(files, format)
 
         @self.app.post("/predict/video")
-        async def predict_video(file: UploadFile = File(...)):
-            """处理视频预测请求"""
-            return await self._predict_video(file)
+        async def predict_video(file: UploadFile = File(...), format: str = Query("mp4"), stride: int = Query(1, ge=1)):
+            """处理视频预测请求，format=json 时逐帧返回检测结果（NDJSON），stride 为抽帧间隔"""
+            return await self._predict_video(file, format, stride)
 
         @self.app.websocket("/predict/stream")
         async def predict_stream(websocket: WebSocket):
             """处理视频流预测请求"""
             await self._predict_stream(websocket)
 
-    async def _predict_image(self, file: UploadFile):
+    async def _predict_image(self, file: UploadFile, format: str = "jpeg"):
         """
-        处理图像文件的预测。
+        处理图像文件的预测（在内存中解码，不写入磁盘）。
 
         :param file: 上传的图像文件
-        :return: 带有预测结果的图像
+        :param format: jpeg 返回带有预测结果的图像，json 只返回检测框、类别与置信度
+        :return: 带有预测结果的图像或检测结果
+        """
+        self._check_format(format)
+        image_bytes = await file.read()
+        result = (await self.executor.run(self._detect_images, [image_bytes], format == "json"))[0]
+        if result is None:
+            raise HTTPException(status_code=400, detail=f"Cannot decode image: {file.filename}")
+
+        if format == "json":
+            return result
+        return Response(content=result, media_type="image/jpeg", headers={"Content-Disposition": f"attachment; filename=predicted_{file.filename}"})
+
+    async def _predict_images(self, files: List[UploadFile], format: str = "json"):
+        """
+        处理多张图像的预测，全部图像在一次推理任务中完成。
+
+        :param files: 上传的图像文件列表
+        :param format: json 返回每张图像的检测结果，jpeg 返回带有预测结果的图像的 zip
+        :return: 检测结果列表（与上传顺序一致）或 zip 文件
         """
-        os.makedirs("temp", exist_ok=True)  # 创建临时目录
-        file_location = f"temp/{file.filename}"  # 保存上传文件的位置
-        with open(file_location, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)  # 将上传的文件保存到本地
+        self._check_format(format)
+        images = [await file.read() for file in files]
+        results = await self.executor.run(self._detect_images, images, format == "json")
+
+        if format == "json":
+            return {"results": [
+                {"filename": file.filename, **result} if result is not None
+                else {"filename": file.filename, "error": "Cannot decode image"}
+                for file, result in zip(files, results)
+            ]}
 
-        results = self.model(file_location)  # 使用 YOLO 模型进行预测
-        output_image = BytesIO()  # 创建内存缓冲区
-        annotated_image = results[0].plot()  # 绘制预测结果
-        image = Image.fromarray(annotated_image[:, :, ::-1])  # 将 BGR 转换为 RGB
-        image.save(output_image, format="JPEG")  # 保存图像到缓冲区
-        output_image.seek(0)
+        zip_buffer = BytesIO()
+        with zipfile.ZipFile(zip_buffer, "w") as zip_file:
+            for i, (file, result) in enumerate(zip(files, results)):
+                if result is not None:
+                    zip_file.writestr(f"{i}_predicted_{os.path.basename(file.filename or 'image')}.jpg", result)
+        return Response(content=zip_buffer.getvalue(), media_type="application/zip", headers={"Content-Disposition": "attachment; filename=predicted.zip"})
 
-        return StreamingResponse(output_image, media_type="image/jpeg", headers={"Content-Disposition": f"attachment; filename=predicted_{file.filename}"})
+    @staticmethod
+    def _check_format(format: str):
+        if format not in ("jpeg", "json"):
+            raise HTTPException(status_code=400, detail=f"Unsupported format: {format}, expected jpeg or json")
 
-    async def _predict_video(self, file: UploadFile):
+    async def _predict_video(self, file: UploadFile, format: str = "mp4", stride: int = 1):
         """
-        处理视频文件的预测。
+        处理视频文件的预测，结果边处理边发送。
 
         :param file: 上传的视频文件
-        :return: 带有预测结果的视频
+        :param format: mp4 返回带有预测结果的视频（分片MP4），json 逐帧返回检测结果（NDJSON）
+        :param stride: 抽帧间隔，每 stride 帧预测一帧
+        :return: 带有预测结果的视频或检测结果流
         """
-        os.makedirs("temp", exist_ok=True)  # 创建临时目录
-        file_location = f"temp/{file.filename}"  # 保存上传文件的位置
-        with open(file_location, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)  # 将上传的视频文件保存到本地
+        if format not in ("mp4", "json"):
+            raise HTTPException(status_code=400, detail=f"Unsupported format: {format}, expected mp4 or json")
+        if self.active_videos >= self.max_concurrent_videos:
+            # 在响应开始前拒绝，而不是让视频在推理队列中与图像请求争抢
+            raise InferenceQueueFull(f"yolo video slots are full ({self.max_concurrent_videos})")
+        self.active_videos += 1
+        try:
+            return await self._start_video(file, format, stride)
+        except BaseException:
+            self.active_videos -= 1
+            raise
 
-        output_video_location = f"temp/predicted_{file.filename}"  # 输出视频文件的位置
-        fourcc = cv2.VideoWriter_fourcc(*"mp4v")  # 设置视频编码格式
-        cap = cv2.VideoCapture(file_location)  # 打开视频文件
-        out = cv2.VideoWriter(output_video_location, fourcc, cap.get(cv2.CAP_PROP_FPS), (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))))  # 创建视频写入器
+    async def _start_video(self, file: UploadFile, format: str, stride: int):
+        """保存上传视频并构建响应；视频名额在响应发送完毕时释放，构建失败时由 _predict_video 释放"""
+        # OpenCV 只能从文件读取视频，上传内容仍写入临时目录
+        file_location = self.temp_store.new_path(file.filename)  # 保存上传文件的位置
 
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
+        def _save_upload():
+            with open(file_location, "wb") as buffer:
+                shutil.copyfileobj(file.file, buffer)  # 将上传的视频文件保存到本地
+
+        await asyncio.to_thread(_save_upload)
+        self.temp_store.add(file_location)
+
+        self.temp_store.acquire(file_location)
+        try:
+            info = await asyncio.to_thread(probe_video, file_location)
+            if info is None:
+                raise HTTPException(status_code=400, detail=f"Cannot open video: {file.filename}")
 
-            results = self.model(frame)  # 使用 YOLO 模型对帧进行预测
-            annotated_frame = results[0].plot()  # 绘制预测结果到帧上
-            out.write(annotated_frame)  # 将带有预测结果的帧写入输出视频
+            pipeline = VideoPipeline(self._infer_frames, batch_size=self.video_batch_size,
+                                     queue_size=self.video_queue_size, stride=stride)
+            fps = info.fps / stride
+            name = os.path.splitext(os.path.basename(file.filename or "video"))[0]
 
-        cap.release()  # 释放视频读取器
-        out.release()  # 释放视频写入器
+            if format == "json":
+                body = self._video_detections(pipeline.detect(file_location), info, stride)
+                media_type, filename = "application/x-ndjson", f"predicted_{name}.ndjson"
+            elif self.video_encoder.available:
+                body = self.video_encoder.stream(pipeline.detect(file_location), info.width, info.height, fps)
+                media_type, filename = "video/mp4", f"predicted_{name}.mp4"
+            else:
+                output_video_location = self.temp_store.new_path(f"predicted_{name}.mp4")  # 输出视频文件的位置
+                with self.temp_store.ref(output_video_location):
+                    await self.video_encoder.write_file(pipeline.detect(file_location), output_video_location,
+                                                        info.width, info.height, fps)
+                    self.temp_store.add(output_video_location)
+                self.temp_store.acquire(output_video_location)
+                body = self._read_file(output_video_location)
+                media_type, filename = "video/mp4", f"predicted_{name}.mp4"
+        except BaseException:
+            self.temp_store.release(file_location)
+            raise
 
-        return StreamingResponse(open(output_video_location, "rb"), media_type="video/mp4", headers={"Content-Disposition": f"attachment; filename=predicted_{file.filename}"})
+        released = False
+
+        def _release():
+            nonlocal released
+            if not released:
+                released = True
+                self.temp_store.release(file_location)
+                self.active_videos -= 1
+
+        async def _body():
+            # 输入视频与视频名额在处理与发送完毕前保持
+            try:
+                async for chunk in body:
+                    yield chunk
+            finally:
+                await body.aclose()
+                _release()
+
+        stream = _body()
+        # 响应开始发送前连接就断开时，生成器从未启动，不会执行 finally，回收时释放
+        weakref.finalize(stream, _release)
+        return StreamingResponse(stream, media_type=media_type, headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+    async def _infer_frames(self, frames: List[np.ndarray]) -> List[Any]:
+        """视频帧批量推理；视频已占用专用名额，推理队列已满时照常排队，不中断整段视频"""
+        return await self.executor.run(self.model, frames, verbose=False, reserved=True)
+
+    async def _video_detections(self, results, info, stride: int):
+        """把逐帧推理结果转换为 NDJSON，第一行为视频信息"""
+        fps = info.fps
+        yield json.dumps({"type": "video", "fps": fps, "width": info.width, "height": info.height,
+                          "frame_count": info.frame_count, "stride": stride}) + "\n"
+        try:
+            async for index, result in results:
+                yield json.dumps({"type": "frame", "frame": index, "time": round(index / fps, 3),
+                                  "detections": self._detections(result)["detections"]}, ensure_ascii=False) + "\n"
+        finally:
+            await results.aclose()
+
+    async def _read_file(self, path: str):
+        """分块读取文件，读取完毕后释放引用"""
+        try:
+            with open(path, "rb") as f:
+                while chunk := await asyncio.to_thread(f.read, 1024 * 1024):
+                    yield chunk
+        finally:
+            self.temp_store.release(path)
+
+    def _detect_images(self, images: List[bytes], as_json: bool) -> List[Optional[Any]]:
+        """
+        解码并预测多张图像（在推理线程中执行）
+
+        :param images: 图像文件数据
+        :param as_json: True 时返回检测结果，False 时返回绘制了预测结果的 JPEG 数据
+        :return: 与 images 一一对应的结果，无法解码的图像为 None
+        """
+        frames = [cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR) for data in images]
+        valid = [i for i, frame in enumerate(frames) if frame is not None]
+
+        outputs: List[Optional[Any]] = [None] * len(images)
+        for start in range(0, len(valid), self.max_batch_images):
+            indices = valid[start:start + self.max_batch_images]
+            results = self.model([frames[i] for i in indices], verbose=False)  # 一次模型调用预测一批图像
+            for i, result in zip(indices, results):
+                if as_json:
+                    outputs[i] = self._detections(result)
+                else:
+                    _, buffer = cv2.imencode('.jpg', result.plot())  # 绘制预测结果并编码为 JPEG
+                    outputs[i] = buffer.tobytes()
+        return outputs
+
+    @staticmethod
+    def _detections(result) -> Dict[str, Any]:
+        """把单张图像的预测结果转换为可序列化的检测框列表"""
+        height, width = result.orig_shape
+        detections = []
+        if result.boxes is not None and len(result.boxes):
+            boxes = result.boxes.xyxy.cpu().numpy().tolist()
+            classes = result.boxes.cls.cpu().numpy().astype(int).tolist()
+            scores = result.boxes.conf.cpu().numpy().tolist()
+            for box, class_id, score in zip(boxes, classes, scores):
+                detections.append({
+                    "box": [round(v, 1) for v in box],  # x1, y1, x2, y2（像素）
+                    "class_id": class_id,
+                    "class_name": result.names[class_id],
+                    "score": round(score, 4)
+                })
+        return {"width": width, "height": height, "detections": detections}
 
     async def _predict_stream(self, websocket: WebSocket):
         """
         处理视频流的预测。
 
+        接收与推理分开进行：推理期间到达的帧只保留最新一帧，旧帧被丢弃，延迟不会随时间累积。
+        查询参数：
+            format=jpeg（默认）返回绘制了预测结果的 JPEG；format=json 返回检测结果与统计信息
+            stats=1 时 jpeg 模式每秒额外发送一条统计信息（文本消息）
+
         :param websocket: WebSocket 连接
         """
         await websocket.accept()  # 接受 WebSocket 连接
+        as_json = websocket.query_params.get("format", "jpeg") == "json"
+        send_stats = websocket.query_params.get("stats") in ("1", "true")
+
+        session = _StreamSession(self._next_session_id)
+        self._next_session_id += 1
+        self.stream_sessions[session.session_id] = session
+        receiver = asyncio.create_task(self._receive_frames(websocket, session))
         try:
+            last_stats = time.monotonic()
             while True:
-                frame_bytes = await websocket.receive_bytes()  # 接收客户端发送的帧数据
-                nparr = np.frombuffer(frame_bytes, np.uint8)  # 将字节数据转换为 NumPy 数组
-                frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)  # 解码为图像
+                await session.ready.wait()
+                if session.closed:
+                    break
+                latest = session.take()
+                if latest is None:
+                    continue
+                frame_bytes, received_at, seq = latest
 
-                results = self.model(frame)  # 使用 YOLO 模型进行预测
-                annotated_frame = results[0].plot()  # 绘制预测结果
-                _, buffer = cv2.imencode('.jpg', annotated_frame)  # 将帧编码为 JPEG 格式
+                try:
+                    result = await self.stream_batcher.submit(frame_bytes, group=as_json)
+                except (InferenceQueueFull, InferenceTimeout):
+                    # 推理繁忙：丢弃这一帧，等待下一帧
+                    session.dropped += 1
+                    continue
+                session.record(received_at)
 
-                await websocket.send_bytes(buffer.tobytes())  # 通过 WebSocket 发送预测后的帧
+                if as_json:
+                    message = {"type": "detections", "frame": seq, **(result or {"error": "Cannot decode image"}),
+                               **session.stats()}
+                    await websocket.send_text(json.dumps(message, ensure_ascii=False))
+                elif result is not None:
+                    await websocket.send_bytes(result)  # 通过 WebSocket 发送预测后的帧
+
+                if send_stats and not as_json and time.monotonic() - last_stats >= 1.0:
+                    last_stats = time.monotonic()
+                    await websocket.send_text(json.dumps({"type": "stats", **session.stats()}))
         except WebSocketDisconnect:
-            print("客户端断开了连接")
+            logger.info(f"视频流连接 {session.session_id} 已断开")
         except Exception as e:
-            print(f"WebSocket连接出错: {e}")
+            logger.exception(f"视频流连接 {session.session_id} 出错: {e}")
         finally:
+            receiver.cancel()
+            await asyncio.gather(receiver, return_exceptions=True)
+            self.stream_sessions.pop(session.session_id, None)
             if not websocket.client_state.name == "DISCONNECTED":
                 await websocket.close()  # 关闭 WebSocket 连接
 
+    @staticmethod
+    async def _receive_frames(websocket: WebSocket, session: _StreamSession):
+        """持续接收客户端发送的帧，只保留最新一帧"""
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes") is not None:
+                    session.push(message["bytes"])
+        finally:
+            session.closed = True
+            session.ready.set()
+
+    async def _infer_stream_batch(self, as_json: bool, frames: List[bytes]) -> List[Optional[Any]]:
+        """把多个连接的帧合并为一次推理"""
+        return await self.executor.run(self._detect_images, frames, as_json)
+
     def run(self):
         """运行 YOLO 服务器"""
         uvicorn.run(self.app, host=self.host, port=self.port, ws='auto')
@@ -142,7 +468,14 @@ if __name__ == "__main__":
     parser.add_argument("--port","-p", type=int, default=8300, help="运行服务器的端口")
     parser.add_argument("--host","-h",type=str,default="127.0.0.1",help="host")
     parser.add_argument("--model","-m", type=str, default="./models/yolo11n.pt", help="YOLO 模型路径")
+    parser.add_argument("--max-batch-images", type=int, default=16, help="多图请求单次模型调用的最大图像数")
+    parser.add_argument("--video-batch-size", type=int, default=8, help="视频单次推理的最大帧数")
+    parser.add_argument("--max-concurrent-videos", type=int, default=2, help="同时处理的视频数，超出时返回503")
+    parser.add_argument("--stream-batch-size", type=int, default=8, help="视频流合并推理的最大帧数")
     args = parser.parse_args()
 
-    yoloserver = YOLOServer(model_path=args.model,host=args.host, port=args.port)  # 创建 YOLO 服务器实例
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    yoloserver = YOLOServer(model_path=args.model,host=args.host, port=args.port, max_batch_images=args.max_batch_images,
+                            video_batch_size=args.video_batch_size, max_concurrent_videos=args.max_concurrent_videos,
+                            stream_batch_size=args.stream_batch_size)  # 创建 YOLO 服务器实例
     yoloserver.run()  # 运行服务器
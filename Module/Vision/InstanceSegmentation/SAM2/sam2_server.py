@@ -7,6 +7,7 @@ from PIL import Image
 from sam2.build_sam import build_sam2
 from sam2.sam2_image_predictor import SAM2ImagePredictor
 import io
+import sys
 import os
 import argparse
 import random
@@ -15,15 +16,27 @@ import matplotlib.pyplot as plt
 import zipfile
 import cv2
 
+# 在 SAM2 目录中启动（./checkpoints、./configs 为相对路径），Module.* 从 agent 仓库导入：
+# AGENT_HOME 设为仓库根目录，或把仓库根目录加入 PYTHONPATH；未设置时按本文件在仓库中的位置推算
+sys.path.append(os.environ.get("AGENT_HOME") or os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "..")))
+
+from Module.Utils.InferenceExecutor import InferenceExecutor, add_inference_exception_handlers
+
 # 解析命令行参数
 parser = argparse.ArgumentParser(description="Start SAM2 FastAPI server with specified model checkpoint and config.")
 parser.add_argument('--checkpoint', '-m', type=str, default='./checkpoints/sam2.1_hiera_large.pt', help="Path to the SAM2 checkpoint file.")
 parser.add_argument('--config', '-c', type=str, default='./configs/sam2.1/sam2.1_hiera_l.yaml', help="Path to the model config file.")
+parser.add_argument('--max-queue', type=int, default=8, help="推理队列上限，超出时返回503")
+parser.add_argument('--inference-timeout', type=float, default=120.0, help="单次推理超时（秒），超时返回504")
 args = parser.parse_args()
 
 # 创建FastAPI应用
 app = FastAPI()
 
+# set_image/predict 共享 predictor 状态，推理在单个专用线程中串行执行，事件循环保持响应
+executor = InferenceExecutor("sam2", max_queue=args.max_queue, timeout=args.inference_timeout)
+add_inference_exception_handlers(app)
+
 # 选择用于计算的设备
 if torch.cuda.is_available():
     device = torch.device("cuda")
@@ -69,10 +82,21 @@ def show_points(coords, labels, ax, marker_size=375):
     ax.scatter(pos_points[:, 0], pos_points[:, 1], color='green', marker='*', s=marker_size, edgecolor='white', linewidth=1.25)
     ax.scatter(neg_points[:, 0], neg_points[:, 1], color='red', marker='*', s=marker_size, edgecolor='white', linewidth=1.25)
 
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy", "inference": executor.get_metrics()}
+
 @app.post("/predict/image")
 async def predict_mask(file: UploadFile = File(...), points: str = Form(...)):
     # 读取上传的图片文件
     image_bytes = await file.read()
+    zip_data = await executor.run(render_masks, image_bytes, points)
+
+    # 返回包含所有掩码渲染的zip文件
+    return Response(content=zip_data, media_type="application/zip", headers={"Content-Disposition": "attachment; filename=masks.zip"})
+
+def render_masks(image_bytes: bytes, points: str) -> bytes:
+    """预测掩码并渲染为zip（在推理线程中执行）"""
     image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
     image = np.array(image)
 
@@ -117,10 +141,7 @@ async def predict_mask(file: UploadFile = File(...), points: str = Form(...)):
             # 将每个渲染结果保存到zip文件中
             zip_file.writestr(f'mask_{i+1}.png', buf.getvalue())
 
-    zip_buffer.seek(0)
-
-    # 返回包含所有掩码渲染的zip文件
-    return Response(content=zip_buffer.getvalue(), media_type="application/zip", headers={"Content-Disposition": "attachment; filename=masks.zip"})
+    return zip_buffer.getvalue()
 
 if __name__ == "__main__":
     # 启动FastAPI服务器
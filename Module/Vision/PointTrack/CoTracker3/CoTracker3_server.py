@@ -16,22 +16,56 @@ import imageio.v3 as iio
 from cotracker.utils.visualizer import Visualizer
 from fastapi import FastAPI, UploadFile, File, Response
 import uvicorn
+import sys
 import os
 
+# 在 ~/Cotracker3 中启动，Module.* 从 agent 仓库导入：
+# AGENT_HOME 设为仓库根目录，或把仓库根目录加入 PYTHONPATH；未设置时按本文件在仓库中的位置推算
+sys.path.append(os.environ.get("AGENT_HOME") or os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "..")))
+
+from Module.Utils.ArtifactStore import get_artifact_store
+from Module.Utils.InferenceExecutor import InferenceExecutor, add_inference_exception_handlers
+
 app = FastAPI()
 
+# 跟踪与可视化在专用线程中串行执行（可视化输出到固定路径），事件循环保持响应
+executor = InferenceExecutor("cotracker3", max_queue=4, timeout=1800)
+add_inference_exception_handlers(app)
+
+# 上传视频的临时目录，超出配额或过期的文件会被清理
+temp_store = get_artifact_store("./temp", config={"max_bytes": 2 * 1024 ** 3, "max_age": 3600, "min_age": 60})
+
 device = 'cuda' if torch.cuda.is_available() else 'cpu'
 cotracker = torch.hub.load("facebookresearch/co-tracker", "cotracker3_offline", source='github').to(device)
 
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy", "inference": executor.get_metrics()}
+
 @app.post("/upload_video/")
 async def upload_video(file: UploadFile = File(...)):
     # 临时保存上传的视频
-    video_path = f"./temp/{file.filename}"
-    os.makedirs("./temp", exist_ok=True)
+    video_path = temp_store.new_path(file.filename)
     
     with open(video_path, "wb") as f:
         f.write(await file.read())
+    temp_store.add(video_path)
+
+    def _finish():
+        # 推理超时后工作线程可能仍在读取视频，引用保持到任务真正结束
+        temp_store.release(video_path)
+        try:
+            os.remove(video_path)
+        except OSError:
+            pass
 
+    temp_store.acquire(video_path)
+    video_data = await executor.run(track_video, video_path, on_done=_finish)
+
+    return Response(content=video_data, media_type="video/mp4")
+
+def track_video(video_path: str) -> bytes:
+    """读取视频、运行跟踪并返回可视化结果（在推理线程中执行）"""
     # 读取视频帧
     frames = iio.imread(video_path, plugin="FFMPEG")
     grid_size = 10
@@ -51,11 +85,7 @@ async def upload_video(file: UploadFile = File(...)):
     vis.visualize(video, pred_tracks, pred_visibility)
     
     with open("./saved_videos/video.mp4", "rb") as f:
-        video_data = f.read()
-
-    os.remove(video_path)
-
-    return Response(content=video_data, media_type="video/mp4")
+        return f.read()
 
 if __name__ == "__main__":
     uvicorn.run(app, host="127.0.0.1", port=8300)
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Ollama兼容的本地替身服务
+
+在没有GPU的机器上模拟 Ollama 的接口与时延特性，用于对 LLMProxy / ChatModule 做压测：
+- /api/chat、/api/generate（支持 NDJSON 流式）、/api/embed、/api/tags、/api/ps
+- 可配置的首token延迟、生成速度（tokens/s）、模型加载耗时
+- 模拟 Ollama 的模型常驻行为：keep_alive 到期卸载、num_ctx 变化时重新加载、
+  同时加载的模型数上限、每个模型的并行请求数上限
+
+使用方法：
+python Tools/Benchmark/fake_ollama_server.py --port 11435 --tokens-per-second 40 --load-delay 3
+"""
+
+import re
+import json
+import time
+import random
+import asyncio
+import argparse
+import hashlib
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List, AsyncIterator
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+WORDS = ["好的", "我", "明白", "了", "，", "这个", "问题", "可以", "这样", "理解", "。",
+         "the", "model", "is", "simulated", "and", "responds", "quickly", "."]
+
+
+@dataclass
+class FakeServerConfig:
+    models: List[str] = field(default_factory=lambda: ["qwen2.5:3b", "nomic-embed-text:latest"])
+    first_token_latency: float = 0.15   # 提示词处理耗时（秒），不含模型加载
+    prompt_tokens_per_second: float = 2000.0
+    tokens_per_second: float = 40.0     # 生成速度
+    load_delay: float = 2.0             # 模型加载耗时（秒）
+    jitter: float = 0.1                 # 时延随机抖动比例
+    num_parallel: int = 2               # 每个模型的并行请求数（对应 OLLAMA_NUM_PARALLEL）
+    max_loaded_models: int = 2          # 同时常驻的模型数（对应 OLLAMA_MAX_LOADED_MODELS）
+    default_keep_alive: float = 300.0   # 默认 keep_alive（秒）
+    embedding_dim: int = 768
+    error_rate: float = 0.0             # 随机返回503的比例，用于测试重试与故障转移
+
+
+@dataclass
+class LoadedModel:
+    name: str
+    num_ctx: Optional[int]
+    expires_at: float
+    loaded_at: float
+    semaphore: asyncio.Semaphore
+
+
+def normalize_model_name(name: str) -> str:
+    return name if ":" in name else f"{name}:latest"
+
+
+def parse_keep_alive(value: Any, default: float) -> float:
+    """把 Ollama 的 keep_alive（秒数或 "5m" 等时长字符串）转为秒，负数表示永久"""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.fullmatch(r"\s*(-?\d+(?:\.\d+)?)\s*(ms|s|m|h)?\s*", str(value))
+    if not match:
+        return default
+    number = float(match.group(1))
+    unit = match.group(2) or "s"
+    return number * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+
+
+def approximate_tokens(text: str) -> int:
+    cjk = sum(1 for ch in text if '\u3000' <= ch <= '\u9fff')
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class FakeOllamaServer:
+    """Ollama 替身服务"""
+
+    def __init__(self, config: FakeServerConfig):
+        self.config = config
+        self.models = [normalize_model_name(m) for m in config.models]
+        self.loaded: Dict[str, LoadedModel] = {}
+        self._load_lock = asyncio.Lock()
+        self.stats = {"requests": 0, "loads": 0, "errors": 0}
+
+        self.app = FastAPI(title="Fake Ollama")
+        self._setup_routes()
+
+    def _sleep_time(self, seconds: float) -> float:
+        return max(0.0, seconds * (1 + random.uniform(-self.config.jitter, self.config.jitter)))
+
+    # ------------------------------------------------------------------
+    # 模型常驻模拟
+    # ------------------------------------------------------------------
+    def _evict_expired(self):
+        now = time.monotonic()
+        for name in [n for n, m in self.loaded.items() if 0 <= m.expires_at < now]:
+            del self.loaded[name]
+
+    async def _acquire_model(self, name: str, options: Dict[str, Any], keep_alive: Any) -> LoadedModel:
+        """确保模型已加载；未加载或 num_ctx 变化时模拟加载耗时"""
+        name = normalize_model_name(name)
+        num_ctx = options.get("num_ctx")
+        keep_seconds = parse_keep_alive(keep_alive, self.config.default_keep_alive)
+
+        async with self._load_lock:
+            self._evict_expired()
+            model = self.loaded.get(name)
+            if model is None or (num_ctx is not None and model.num_ctx != num_ctx):
+                if model is None and len(self.loaded) >= self.config.max_loaded_models:
+                    # 挤出最早加载的模型
+                    oldest = min(self.loaded.values(), key=lambda m: m.loaded_at)
+                    del self.loaded[oldest.name]
+                await asyncio.sleep(self._sleep_time(self.config.load_delay))
+                self.stats["loads"] += 1
+                model = LoadedModel(
+                    name=name,
+                    num_ctx=num_ctx,
+                    expires_at=0.0,
+                    loaded_at=time.monotonic(),
+                    semaphore=model.semaphore if model else asyncio.Semaphore(self.config.num_parallel)
+                )
+                self.loaded[name] = model
+
+            model.expires_at = -1 if keep_seconds < 0 else time.monotonic() + keep_seconds
+        return model
+
+    # ------------------------------------------------------------------
+    # 生成模拟
+    # ------------------------------------------------------------------
+    def _check_model(self, name: Optional[str]) -> Optional[JSONResponse]:
+        if not name or normalize_model_name(name) not in self.models:
+            return JSONResponse({"error": f"model '{name}' not found"}, status_code=404)
+        if random.random() < self.config.error_rate:
+            self.stats["errors"] += 1
+            return JSONResponse({"error": "simulated overload"}, status_code=503)
+        return None
+
+    async def _generate_tokens(self, body: Dict[str, Any], prompt_text: str) -> AsyncIterator[str]:
+        options = body.get("options") or {}
+        model = await self._acquire_model(body["model"], options, body.get("keep_alive"))
+
+        async with model.semaphore:
+            prompt_tokens = approximate_tokens(prompt_text)
+            await asyncio.sleep(self._sleep_time(
+                self.config.first_token_latency + prompt_tokens / self.config.prompt_tokens_per_second
+            ))
+            num_predict = options.get("num_predict", 128)
+            if num_predict is None or num_predict < 0:
+                num_predict = 128
+            interval = 1.0 / self.config.tokens_per_second
+            for _ in range(num_predict):
+                yield random.choice(WORDS)
+                await asyncio.sleep(self._sleep_time(interval))
+
+    def _final_stats(self, started: float, eval_count: int, prompt_text: str) -> Dict[str, Any]:
+        total = int((time.perf_counter() - started) * 1e9)
+        return {
+            "done": True,
+            "done_reason": "length",
+            "total_duration": total,
+            "prompt_eval_count": approximate_tokens(prompt_text),
+            "eval_count": eval_count,
+            "eval_duration": int(eval_count / self.config.tokens_per_second * 1e9)
+        }
+
+    async def _respond(self, body: Dict[str, Any], prompt_text: str, chat: bool):
+        model_name = body["model"]
+        started = time.perf_counter()
+
+        def _chunk(token: str) -> Dict[str, Any]:
+            chunk: Dict[str, Any] = {"model": model_name, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"), "done": False}
+            if chat:
+                chunk["message"] = {"role": "assistant", "content": token}
+            else:
+                chunk["response"] = token
+            return chunk
+
+        # 空提示词的 generate 请求只加载模型（Ollama 的预加载方式）
+        if not chat and not prompt_text:
+            await self._acquire_model(model_name, body.get("options") or {}, body.get("keep_alive"))
+            return JSONResponse({"model": model_name, "response": "", "done": True, "done_reason": "load"})
+
+        if body.get("stream", True):
+            async def _stream():
+                count = 0
+                async for token in self._generate_tokens(body, prompt_text):
+                    count += 1
+                    yield json.dumps(_chunk(token), ensure_ascii=False) + "\n"
+                final = _chunk("")
+                final.update(self._final_stats(started, count, prompt_text))
+                yield json.dumps(final, ensure_ascii=False) + "\n"
+            return StreamingResponse(_stream(), media_type="application/x-ndjson")
+
+        tokens = [t async for t in self._generate_tokens(body, prompt_text)]
+        result = _chunk("".join(tokens))
+        result.update(self._final_stats(started, len(tokens), prompt_text))
+        return JSONResponse(result)
+
+    def _embed(self, text: str) -> List[float]:
+        """按文本哈希生成确定性的单位向量"""
+        rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+        vector = [rng.gauss(0, 1) for _ in range(self.config.embedding_dim)]
+        norm = sum(v * v for v in vector) ** 0.5 or 1.0
+        return [v / norm for v in vector]
+
+    # ------------------------------------------------------------------
+    # 路由
+    # ------------------------------------------------------------------
+    def _setup_routes(self):
+        app = self.app
+
+        @app.get("/api/tags")
+        async def tags():
+            return {"models": [{"name": m, "model": m, "size": 0, "details": {}} for m in self.models]}
+
+        @app.get("/api/ps")
+        async def ps():
+            self._evict_expired()
+            return {"models": [
+                {"name": m.name, "model": m.name, "context_length": m.num_ctx}
+                for m in self.loaded.values()
+            ]}
+
+        @app.post("/api/chat")
+        async def chat(request: Request):
+            body = await request.json()
+            self.stats["requests"] += 1
+            error = self._check_model(body.get("model"))
+            if error:
+                return error
+            prompt_text = "".join(m.get("content", "") for m in body.get("messages", []))
+            return await self._respond(body, prompt_text, chat=True)
+
+        @app.post("/api/generate")
+        async def generate(request: Request):
+            body = await request.json()
+            self.stats["requests"] += 1
+            error = self._check_model(body.get("model"))
+            if error:
+                return error
+            return await self._respond(body, body.get("prompt", ""), chat=False)
+
+        @app.post("/api/embed")
+        async def embed(request: Request):
+            body = await request.json()
+            self.stats["requests"] += 1
+            error = self._check_model(body.get("model"))
+            if error:
+                return error
+            texts = body.get("input", [])
+            if isinstance(texts, str):
+                texts = [texts]
+            model = await self._acquire_model(body["model"], body.get("options") or {}, body.get("keep_alive"))
+            async with model.semaphore:
+                tokens = sum(approximate_tokens(t) for t in texts)
+                await asyncio.sleep(self._sleep_time(0.01 + tokens / self.config.prompt_tokens_per_second))
+            return {"model": body["model"], "embeddings": [self._embed(t) for t in texts]}
+
+        @app.get("/stats")
+        async def stats():
+            return {**self.stats, "loaded": sorted(self.loaded)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama兼容的本地替身服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--models", nargs="+", default=FakeServerConfig().models)
+    parser.add_argument("--first-token-latency", type=float, default=0.15)
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--load-delay", type=float, default=2.0)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--num-parallel", type=int, default=2)
+    parser.add_argument("--max-loaded-models", type=int, default=2)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = FakeServerConfig(
+        models=args.models,
+        first_token_latency=args.first_token_latency,
+        tokens_per_second=args.tokens_per_second,
+        load_delay=args.load_delay,
+        jitter=args.jitter,
+        num_parallel=args.num_parallel,
+        max_loaded_models=args.max_loaded_models,
+        error_rate=args.error_rate
+    )
+    server = FakeOllamaServer(config)
+    uvicorn.run(server.app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+LLMProxy 压测工具
+
+直接连接指定的 Ollama（或 fake_ollama_server.py 替身）地址，不依赖 Consul，
+以给定并发驱动 LLMProxy，统计吞吐量、首token延迟（TTFT）与尾延迟。
+
+使用方法：
+python Tools/Benchmark/llm_benchmark.py --url http://127.0.0.1:11435 --mode stream --concurrency 8 --requests 200
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List
+
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from Module.LLM.LLMProxy import LLMProxy, StreamStats
+from Init.ServiceDiscovery.service_discovery_manager import ServiceInfo
+from Init.ServiceDiscovery.service_connector import ServiceClient
+
+
+PROMPTS = [
+    "用一句话介绍一下你自己。",
+    "今天天气怎么样？适合出门散步吗？",
+    "请解释一下什么是向量数据库。",
+    "Summarize the plot of a detective story in two sentences.",
+    "给我讲一个简短的笑话。",
+]
+
+
+@dataclass
+class RequestResult:
+    ok: bool
+    latency: float
+    ttft: Optional[float] = None
+    tokens: int = 0
+    error: str = ""
+
+
+@dataclass
+class BenchmarkReport:
+    mode: str
+    concurrency: int
+    duration: float
+    results: List[RequestResult] = field(default_factory=list)
+
+    @staticmethod
+    def _percentile(values: List[float], q: float) -> Optional[float]:
+        if not values:
+            return None
+        values = sorted(values)
+        index = min(len(values) - 1, max(0, round(q / 100 * (len(values) - 1))))
+        return values[index]
+
+    def summary(self) -> Dict[str, Any]:
+        ok = [r for r in self.results if r.ok]
+        latencies = [r.latency for r in ok]
+        ttfts = [r.ttft for r in ok if r.ttft is not None]
+        tokens = sum(r.tokens for r in ok)
+        errors: Dict[str, int] = {}
+        for r in self.results:
+            if not r.ok:
+                errors[r.error] = errors.get(r.error, 0) + 1
+
+        def _round(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round(value, 4)
+
+        return {
+            "mode": self.mode,
+            "concurrency": self.concurrency,
+            "requests": len(self.results),
+            "succeeded": len(ok),
+            "failed": len(self.results) - len(ok),
+            "duration": round(self.duration, 3),
+            "throughput_rps": round(len(ok) / self.duration, 3) if self.duration else None,
+            "tokens_per_second": round(tokens / self.duration, 1) if self.duration else None,
+            "latency": {f"p{q}": _round(self._percentile(latencies, q)) for q in (50, 90, 95, 99)},
+            "ttft": {f"p{q}": _round(self._percentile(ttfts, q)) for q in (50, 90, 95, 99)},
+            "errors": errors
+        }
+
+
+def create_proxy(url: str, model: Optional[str], disable_cache: bool) -> LLMProxy:
+    """创建直连指定地址的 LLMProxy（跳过服务发现）"""
+    proxy = LLMProxy()
+    if model:
+        proxy.default_model = model
+    if disable_cache:
+        proxy.response_cache.enabled = False
+    # 压测只关注请求本身，不做后台预加载与定期刷新
+    proxy.keep_alive.preload_models = []
+
+    host, _, port = url.removeprefix("http://").rstrip("/").partition(":")
+    info = ServiceInfo(name="ollama_server", address=host, port=int(port or 80))
+    client = httpx.AsyncClient(
+        base_url=info.url,
+        timeout=httpx.Timeout(10.0, read=proxy.request_timeout),
+        limits=httpx.Limits(max_connections=200, max_keepalive_connections=50)
+    )
+    service_client = ServiceClient(info, client)
+    proxy.service_client = service_client
+    proxy.backend_pool.add_client(service_client, owned=True)
+    return proxy
+
+
+async def run_one(proxy: LLMProxy, mode: str, prompt: str, num_predict: int, priority: str,
+                  cache: bool = False) -> RequestResult:
+    start = time.perf_counter()
+    try:
+        if mode == "stream":
+            stats = StreamStats(model="", started_at=start)
+            async for _ in proxy.chat_stream(prompt, stats=stats, priority=priority, num_predict=num_predict):
+                pass
+            return RequestResult(True, time.perf_counter() - start, stats.time_to_first_token, stats.eval_count or stats.chunk_count)
+
+        if mode == "embed":
+            vectors = await proxy.embed([prompt], priority=priority)
+            return RequestResult(True, time.perf_counter() - start, tokens=len(vectors))
+
+        if mode == "generate":
+            response = await proxy.generate(prompt, priority=priority, cache=cache, options={"num_predict": num_predict})
+        else:
+            response = await proxy.chat(prompt, priority=priority, cache=cache, num_predict=num_predict)
+        latency = time.perf_counter() - start
+        return RequestResult(True, latency, tokens=response.get("eval_count", 0))
+
+    except Exception as e:
+        return RequestResult(False, time.perf_counter() - start, error=type(e).__name__)
+
+
+async def run_benchmark(args: argparse.Namespace) -> BenchmarkReport:
+    proxy = create_proxy(args.url, args.model, disable_cache=not args.cache)
+    queue: asyncio.Queue[int] = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(i)
+
+    results: List[RequestResult] = []
+
+    async def _worker():
+        while True:
+            try:
+                i = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            prompt = PROMPTS[i % len(PROMPTS)]
+            if not args.cache:
+                # 避免相同提示词命中响应缓存
+                prompt = f"{prompt} #{i}"
+            priority = "background" if random.random() < args.background_ratio else "interactive"
+            results.append(await run_one(proxy, args.mode, prompt, args.num_predict, priority, args.cache))
+
+    try:
+        if args.warmup:
+            await run_one(proxy, args.mode, PROMPTS[0], args.num_predict, "interactive", args.cache)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(_worker() for _ in range(args.concurrency)))
+        duration = time.perf_counter() - start
+
+        report = BenchmarkReport(args.mode, args.concurrency, duration, results)
+        report_data = report.summary()
+        report_data["proxy"] = {
+            "queue": proxy.get_queue_metrics(),
+            "cache": proxy.get_cache_metrics(),
+            "retry": proxy.retry_policy.get_status()
+        }
+        if args.mode == "embed":
+            report_data["proxy"]["embedding"] = proxy.get_embedding_metrics()
+        print(json.dumps(report_data, ensure_ascii=False, indent=2))
+        return report
+    finally:
+        await proxy.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLMProxy 压测工具")
+    parser.add_argument("--url", default="http://127.0.0.1:11435", help="Ollama 或替身服务地址")
+    parser.add_argument("--model", default=None, help="模型名称，默认使用 LLMProxy 的默认模型")
+    parser.add_argument("--mode", choices=["chat", "stream", "generate", "embed"], default="stream")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--num-predict", type=int, default=64)
+    parser.add_argument("--background-ratio", type=float, default=0.0, help="后台优先级请求的比例")
+    parser.add_argument("--cache", action="store_true", help="启用响应缓存（默认关闭）")
+    parser.add_argument("--warmup", action="store_true", help="正式计时前先发送一次请求")
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args))
+
+
+if __name__ == "__main__":
+    main()